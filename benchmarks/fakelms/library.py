@@ -0,0 +1,712 @@
+"""Scriptable music library and player state for the fake Logitech Media
+   Server.
+
+   The library holds players, tracks, menus and artwork. Commands are run by
+   FakeLibrary.execute which returns the result in a form that can be sent
+   back over either the JSON-RPC or the telnet CLI interface.
+"""
+import random
+import struct
+import zlib
+from collections import OrderedDict
+from threading import RLock
+
+# Tags which can be requested in "status" commands and the track fields they
+# return
+TAG_FIELDS = {"a": "artist",
+              "c": "coverid",
+              "d": "duration",
+              "e": "album_id",
+              "g": "genre",
+              "j": "coverart",
+              "K": "artwork_url",
+              "l": "album",
+              "s": "artist_id",
+              "u": "url",
+              "x": "remote"}
+
+# Commands which browse a menu and take a start index and item count
+MENU_COMMANDS = ["menu", "browselibrary", "myapps"]
+
+
+def _png(width, height, colour):
+    """Returns a solid colour PNG image without needing PIL."""
+    def chunk(tag, data):
+        body = tag + data
+        return (struct.pack(">I", len(data)) + body +
+                struct.pack(">I", zlib.crc32(body) & 0xffffffff))
+
+    row = b"\x00" + struct.pack("BBB", *colour) * width
+    raw = zlib.compress(row * height)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+            chunk(b"IDAT", raw) + chunk(b"IEND", b""))
+
+
+class FakePlayer(object):
+    """State of a single player on the fake server."""
+
+    def __init__(self, ref, name, volume=50):
+        self.ref = ref
+        self.name = name
+        self.volume = volume
+        self.muting = 0
+        self.mode = "stop"
+        self.power = 1
+        self.playlist = []
+        self.index = 0
+        self.time = 0.0
+        self.connected = True
+
+    def __repr__(self):
+        return "FakePlayer: {}".format(self.ref)
+
+    @property
+    def current(self):
+        try:
+            return self.playlist[self.index]
+        except IndexError:
+            return {}
+
+
+class CommandResult(object):
+    """Result of a command.
+
+       'data' is the dict returned by the JSON-RPC interface. 'echo' and
+       'values' are the tokens sent back on the CLI and 'notification' is
+       the event (if any) which should be sent to listening clients.
+    """
+
+    def __init__(self, data=None, echo=None, values=None, notification=None):
+        self.data = data if data is not None else {}
+        self.echo = echo if echo is not None else []
+        self.values = values if values is not None else []
+        self.notification = notification
+
+
+class FakeLibrary(object):
+    """In-memory library used by the fake server.
+
+       Players, tracks and menus can be added directly or a complete library
+       can be generated with populate().
+    """
+
+    def __init__(self, seed=0):
+        self.lock = RLock()
+        self.random = random.Random(seed)
+        self.players = OrderedDict()
+        self.tracks = OrderedDict()
+        self.menus = {}
+        self.sync_groups = []
+        self.artwork_size = (500, 500)
+        self.version = "7.9.2"
+
+        # Callable receiving notifications generated by commands
+        self.notify = None
+
+    ############ SETUP #########################################################
+
+    def add_player(self, ref, name, volume=50):
+        with self.lock:
+            player = FakePlayer(ref, name, volume=volume)
+            self.players[ref] = player
+            return player
+
+    def remove_player(self, ref):
+        with self.lock:
+            self.unsync(ref)
+            return self.players.pop(ref, None)
+
+    def add_track(self, track_id, title, artist="Unknown Artist",
+                  album="Unknown Album", duration=180.0, coverid=None,
+                  remote=0, artwork_url=None, **kwargs):
+        track = {"id": track_id,
+                 "title": title,
+                 "artist": artist,
+                 "album": album,
+                 "duration": duration,
+                 "coverid": coverid if coverid is not None else track_id,
+                 "coverart": 1,
+                 "remote": remote,
+                 "url": "file:///music/{}.flac".format(track_id)}
+        if artwork_url:
+            track["artwork_url"] = artwork_url
+        track.update(kwargs)
+
+        with self.lock:
+            self.tracks[track_id] = track
+        return track
+
+    def add_menu(self, cmd, items, base=None):
+        """Adds a menu which is returned for 'cmd'.
+
+           'cmd' is a list of command tokens without the start and count
+           arguments e.g. ["browselibrary", "items", "mode:albums"].
+        """
+        with self.lock:
+            self.menus[self.menu_key(cmd)] = {"item_loop": list(items),
+                                              "base": base}
+
+    def set_playlist(self, ref, track_ids, index=0):
+        with self.lock:
+            player = self.players[ref]
+            player.playlist = [self.tracks[t] for t in track_ids]
+            player.index = index
+            player.time = 0.0
+
+    def sync(self, master, slave):
+        with self.lock:
+            self.unsync(slave)
+            for group in self.sync_groups:
+                if master in group:
+                    group.append(slave)
+                    return
+            self.sync_groups.append([master, slave])
+
+    def unsync(self, ref):
+        with self.lock:
+            for group in self.sync_groups:
+                if ref in group:
+                    group.remove(ref)
+            self.sync_groups = [g for g in self.sync_groups if len(g) > 1]
+
+    def artwork(self, coverid=None, size=None):
+        """Returns PNG data for a cover."""
+        width, height = size or self.artwork_size
+        seed = hash(str(coverid)) & 0xffffff
+        colour = ((seed >> 16) & 0xff, (seed >> 8) & 0xff, seed & 0xff)
+        return _png(width, height, colour)
+
+    def populate(self, players=2, artists=10, albums_per_artist=3,
+                 tracks_per_album=10, queue_length=20):
+        """Builds a library with generated artists, albums and tracks along
+           with the browse menus used by the script.
+        """
+        with self.lock:
+            artist_items = []
+            track_id = 1
+
+            for a in range(1, artists + 1):
+                artist = "Artist {}".format(a)
+                artist_items.append(self._menu_item(
+                    artist, {"mode": "albums", "artist_id": a}))
+
+                album_items = []
+                for b in range(1, albums_per_artist + 1):
+                    album_id = a * 1000 + b
+                    album = "Album {} by {}".format(b, artist)
+                    album_items.append(self._menu_item(
+                        album, {"mode": "tracks", "album_id": album_id},
+                        playable={"album_id": album_id}))
+
+                    track_items = []
+                    for t in range(1, tracks_per_album + 1):
+                        title = "Track {} of {}".format(t, album)
+                        self.add_track(track_id, title, artist=artist,
+                                       album=album,
+                                       duration=120.0 + (track_id % 180),
+                                       coverid=album_id)
+                        track_items.append({"text": title,
+                                            "type": "audio",
+                                            "params": {"track_id": track_id}})
+                        track_id += 1
+
+                    self.add_menu(["browselibrary", "items", "menu:1",
+                                   "mode:tracks",
+                                   "album_id:{}".format(album_id)],
+                                  track_items, base=self._base())
+
+                self.add_menu(["browselibrary", "items", "menu:1",
+                               "mode:albums", "artist_id:{}".format(a)],
+                              album_items, base=self._base())
+
+            self.add_menu(["browselibrary", "items", "menu:1", "mode:artists",
+                           "role_id:ALBUMARTIST,ARTIST,BAND,COMPOSER,"
+                           "CONDUCTOR,TRACKARTIST"],
+                          artist_items, base=self._base())
+
+            track_ids = list(self.tracks)
+            for p in range(players):
+                ref = "00:04:20:00:00:{:02x}".format(p + 1)
+                self.add_player(ref, "Room {}".format(p + 1))
+                queue = self.random.sample(track_ids,
+                                           min(queue_length, len(track_ids)))
+                self.set_playlist(ref, queue)
+
+            return self
+
+    def _base(self):
+        return {"actions": {
+            "play": {"cmd": ["playlistcontrol"],
+                     "params": {"cmd": "load"},
+                     "itemsParams": "params"},
+            "add": {"cmd": ["playlistcontrol"],
+                    "params": {"cmd": "add"},
+                    "itemsParams": "params"},
+            "add-hold": {"cmd": ["playlistcontrol"],
+                         "params": {"cmd": "insert"},
+                         "itemsParams": "params"}}}
+
+    def _menu_item(self, text, params, playable=None):
+        item = {"text": text,
+                "actions": {"go": {"cmd": ["browselibrary", "items"],
+                                   "params": dict(params, menu=1)}}}
+        if playable:
+            item["type"] = "playlist"
+            item["params"] = playable
+        return item
+
+    ############ COMMANDS ######################################################
+
+    def menu_key(self, cmd):
+        """Key for a menu command, ignoring the range and parameter order."""
+        cmd = [str(x) for x in cmd]
+        try:
+            idx = cmd.index("items")
+        except ValueError:
+            idx = len(cmd) - 1
+
+        # Drop the start and count
+        rest = [x for x in cmd[idx+1:] if not x.isdigit()]
+        return (tuple(cmd[:idx+1]),
+                frozenset(x for x in rest if ":" in x))
+
+    def execute(self, ref, cmd):
+        """Runs a command for a player (or the server if 'ref' is None) and
+           returns a CommandResult.
+        """
+        cmd = [str(x) for x in cmd]
+
+        with self.lock:
+            if ref is None:
+                result = self._server_command(cmd)
+            else:
+                player = self.players.get(ref)
+                if player is None:
+                    result = CommandResult(echo=cmd)
+                else:
+                    result = self._player_command(player, cmd)
+
+        if result.notification and self.notify:
+            self.notify(result.notification)
+
+        return result
+
+    def _query(self, cmd, key, value):
+        """Result of a command ending with '?'."""
+        return CommandResult(data={"_" + key: value},
+                             echo=cmd[:-1],
+                             values=[value])
+
+    def _server_command(self, cmd):
+        name = cmd[0] if cmd else ""
+
+        if name == "login":
+            return CommandResult(echo=cmd[:2] + ["******"])
+
+        if name == "version":
+            return self._query(cmd, "version", self.version)
+
+        if name == "ping":
+            return CommandResult(echo=cmd)
+
+        if name == "player" and len(cmd) > 2:
+            return self._player_query(cmd)
+
+        if name == "syncgroups":
+            return self._syncgroups(cmd)
+
+        if name == "serverstatus":
+            return self._serverstatus(cmd)
+
+        if name in ["songs", "albums", "artists"]:
+            return self._database(cmd)
+
+        if name in MENU_COMMANDS:
+            return self._menu(cmd)
+
+        return CommandResult(echo=cmd)
+
+    def _player_query(self, cmd):
+        field = cmd[1]
+        players = list(self.players.values())
+
+        if field == "count":
+            return self._query(cmd, "count", len(players))
+
+        try:
+            player = players[int(cmd[2])]
+        except (ValueError, IndexError):
+            return CommandResult(echo=cmd)
+
+        values = {"id": player.ref,
+                  "name": player.name,
+                  "uuid": player.ref.replace(":", ""),
+                  "ip": "127.0.0.1:3483",
+                  "model": "squeezelite",
+                  "displaytype": "none",
+                  "canpoweroff": 1,
+                  "isplayer": 1,
+                  "connected": int(player.connected)}
+
+        return self._query(cmd, field, values.get(field, ""))
+
+    def _syncgroups(self, cmd):
+        loop = []
+        values = []
+        for group in self.sync_groups:
+            names = ",".join(self.players[r].name for r in group
+                             if r in self.players)
+            loop.append({"sync_members": ",".join(group),
+                         "sync_member_names": names})
+            values += ["sync_members:" + ",".join(group),
+                       "sync_member_names:" + names]
+
+        data = {"syncgroups_loop": loop} if loop else {}
+        return CommandResult(data=data, echo=cmd[:-1], values=values)
+
+    def _serverstatus(self, cmd):
+        start, count = self._range(cmd, 1)
+        players = list(self.players.values())
+
+        data = OrderedDict()
+        data["version"] = self.version
+        data["player count"] = len(players)
+
+        values = ["{}:{}".format(k, v) for k, v in data.items()]
+
+        loop = []
+        for i, player in enumerate(players[start:start + count]):
+            item = OrderedDict()
+            item["playerindex"] = start + i
+            item["playerid"] = player.ref
+            item["name"] = player.name
+            item["model"] = "squeezelite"
+            item["power"] = player.power
+            item["isplaying"] = int(player.mode == "play")
+            item["connected"] = int(player.connected)
+            loop.append(item)
+            values += ["{}:{}".format(k, v) for k, v in item.items()]
+
+        data["players_loop"] = loop
+        return CommandResult(data=data, echo=cmd[:3], values=values)
+
+    def _range(self, cmd, idx):
+        try:
+            start = int(cmd[idx])
+        except (ValueError, IndexError):
+            start = 0
+        try:
+            count = int(cmd[idx + 1])
+        except (ValueError, IndexError):
+            count = 0
+        return start, count
+
+    def _tags(self, cmd):
+        for token in cmd:
+            if token.startswith("tags:"):
+                return token[5:].replace(",", "")
+        return ""
+
+    def _database(self, cmd):
+        start, count = self._range(cmd, 1)
+        tracks = list(self.tracks.values())
+        tags = self._tags(cmd)
+        loop = []
+        values = []
+
+        for track in tracks[start:start + count]:
+            item = self._track_fields(track, tags)
+            loop.append(item)
+            values += ["{}:{}".format(k, v) for k, v in item.items()]
+
+        values.append("count:{}".format(len(tracks)))
+        return CommandResult(data={"titles_loop": loop,
+                                   "count": len(tracks)},
+                             echo=cmd, values=values)
+
+    def _menu(self, cmd):
+        try:
+            idx = cmd.index("items")
+        except ValueError:
+            return CommandResult(echo=cmd)
+
+        start, count = self._range(cmd, idx + 1)
+        menu = self.menus.get(self.menu_key(cmd),
+                              {"item_loop": [], "base": None})
+        items = menu["item_loop"]
+
+        data = {"count": len(items),
+                "offset": start,
+                "item_loop": items[start:start + count]}
+        if menu.get("base"):
+            data["base"] = menu["base"]
+
+        return CommandResult(data=data, echo=cmd)
+
+    def _track_fields(self, track, tags):
+        item = OrderedDict()
+        item["id"] = track["id"]
+        item["title"] = track["title"]
+        for tag in tags:
+            field = TAG_FIELDS.get(tag)
+            if field and field in track:
+                item[field] = track[field]
+        return item
+
+    def _status(self, player, cmd):
+        try:
+            start = int(cmd[1])
+        except (ValueError, IndexError):
+            start = player.index
+        try:
+            count = int(cmd[2])
+        except (ValueError, IndexError):
+            count = 1
+
+        tags = self._tags(cmd)
+        current = player.current
+
+        data = OrderedDict()
+        data["player_name"] = player.name
+        data["player_connected"] = int(player.connected)
+        data["power"] = player.power
+        data["mode"] = player.mode
+        if current:
+            data["time"] = player.time
+            data["duration"] = current.get("duration", 0)
+        data["mixer volume"] = player.volume
+
+        for group in self.sync_groups:
+            if player.ref in group:
+                data["sync_master"] = group[0]
+                data["sync_slaves"] = ",".join(group[1:])
+        data["playlist_cur_index"] = player.index
+        data["playlist_tracks"] = len(player.playlist)
+
+        values = ["{}:{}".format(k, v) for k, v in data.items()]
+
+        loop = []
+        for i, track in enumerate(player.playlist[start:start + count]):
+            item = OrderedDict()
+            item["playlist index"] = start + i
+            item.update(self._track_fields(track, tags))
+            loop.append(item)
+            values += ["{}:{}".format(k, v) for k, v in item.items()]
+
+        data["playlist_loop"] = loop
+        return CommandResult(data=data, echo=cmd, values=values)
+
+    def _notice(self, player, *tokens):
+        return [player.ref] + [str(t) for t in tokens]
+
+    def _set_index(self, player, index):
+        if not player.playlist:
+            return None
+        player.index = index % len(player.playlist)
+        player.time = 0.0
+        player.mode = "play"
+        return self._notice(player, "playlist", "newsong",
+                            player.current.get("title", ""), player.index)
+
+    def _player_command(self, player, cmd):
+        name = cmd[0] if cmd else ""
+        arg = cmd[1] if len(cmd) > 1 else None
+        current = player.current
+
+        simple = {"name": player.name,
+                  "mode": player.mode,
+                  "time": player.time,
+                  "duration": current.get("duration", 0),
+                  "artist": current.get("artist", ""),
+                  "album": current.get("album", ""),
+                  "title": current.get("title", ""),
+                  "genre": current.get("genre", ""),
+                  "remote": current.get("remote", 0),
+                  "path": current.get("url", ""),
+                  "current_title": current.get("title", ""),
+                  "power": player.power,
+                  "signalstrength": 80,
+                  "connected": int(player.connected)}
+
+        if name in simple and arg == "?":
+            return self._query(cmd, name, simple[name])
+
+        if name == "status":
+            return self._status(player, cmd)
+
+        if name == "name":
+            player.name = " ".join(cmd[1:])
+            return CommandResult(echo=cmd)
+
+        if name == "mixer":
+            return self._mixer(player, cmd)
+
+        if name == "play":
+            player.mode = "play"
+            return CommandResult(echo=cmd, notification=self._notice(
+                player, "playlist", "pause", 0))
+
+        if name == "stop":
+            player.mode = "stop"
+            return CommandResult(echo=cmd, notification=self._notice(
+                player, "playlist", "stop"))
+
+        if name == "pause":
+            if arg in ["0", "1"]:
+                paused = arg == "1"
+            else:
+                paused = player.mode == "play"
+            player.mode = "pause" if paused else "play"
+            return CommandResult(echo=cmd, notification=self._notice(
+                player, "playlist", "pause", int(paused)))
+
+        if name == "time" and arg is not None:
+            try:
+                if arg[0] in "+-":
+                    player.time = max(0.0, player.time + float(arg))
+                else:
+                    player.time = float(arg)
+            except ValueError:
+                pass
+            return CommandResult(echo=cmd)
+
+        if name == "playlist":
+            return self._playlist(player, cmd)
+
+        if name == "playlistcontrol":
+            return self._playlistcontrol(player, cmd)
+
+        if name == "sync":
+            if arg == "?":
+                group = [g for g in self.sync_groups if player.ref in g]
+                others = [r for r in (group[0] if group else [])
+                          if r != player.ref]
+                return self._query(cmd, "sync", ",".join(others) or "-")
+            if arg == "-":
+                self.unsync(player.ref)
+            elif arg in self.players:
+                self.sync(player.ref, arg)
+            return CommandResult(echo=cmd,
+                                 notification=self._notice(player, *cmd))
+
+        if name in MENU_COMMANDS:
+            return self._menu(cmd)
+
+        return CommandResult(echo=cmd)
+
+    def _mixer(self, player, cmd):
+        field = cmd[1] if len(cmd) > 1 else ""
+        arg = cmd[2] if len(cmd) > 2 else "?"
+
+        if field == "volume":
+            if arg == "?":
+                return self._query(cmd, "volume", player.volume)
+            try:
+                if arg[0] in "+-":
+                    volume = player.volume + int(arg)
+                else:
+                    volume = int(arg)
+            except ValueError:
+                return CommandResult(echo=cmd)
+            player.volume = max(0, min(100, volume))
+            return CommandResult(echo=cmd, notification=self._notice(
+                player, "mixer", "volume", arg))
+
+        if field == "muting":
+            if arg == "?":
+                return self._query(cmd, "muting", player.muting)
+            player.muting = int(arg == "1")
+            return CommandResult(echo=cmd,
+                                 notification=self._notice(player, *cmd))
+
+        return CommandResult(echo=cmd)
+
+    def _playlist(self, player, cmd):
+        action = cmd[1] if len(cmd) > 1 else ""
+        arg = cmd[2] if len(cmd) > 2 else None
+
+        if action == "tracks" and arg == "?":
+            return self._query(cmd, "tracks", len(player.playlist))
+
+        if action == "index" and arg == "?":
+            return self._query(cmd, "index", player.index)
+
+        if action in ["index", "jump"] and arg is not None:
+            try:
+                if arg[0] in "+-":
+                    index = player.index + int(arg)
+                else:
+                    index = int(arg)
+            except ValueError:
+                return CommandResult(echo=cmd)
+            return CommandResult(echo=cmd,
+                                 notification=self._set_index(player, index))
+
+        if action == "clear":
+            player.playlist = []
+            player.index = 0
+            player.mode = "stop"
+            return CommandResult(echo=cmd,
+                                 notification=self._notice(player, *cmd))
+
+        if action == "delete" and arg is not None:
+            try:
+                del player.playlist[int(arg)]
+            except (ValueError, IndexError):
+                pass
+            return CommandResult(echo=cmd,
+                                 notification=self._notice(player, *cmd))
+
+        return CommandResult(echo=cmd)
+
+    def _playlistcontrol(self, player, cmd):
+        params = dict(x.split(":", 1) for x in cmd[1:] if ":" in x)
+        mode = params.get("cmd", "load")
+
+        if "track_id" in params:
+            ids = [int(params["track_id"])]
+        elif "album_id" in params:
+            album = int(params["album_id"])
+            ids = [t["id"] for t in self.tracks.values()
+                   if t.get("coverid") == album]
+        else:
+            ids = []
+
+        tracks = [self.tracks[i] for i in ids if i in self.tracks]
+        count = len(tracks)
+
+        if mode == "load":
+            player.playlist = tracks
+            self._set_index(player, 0)
+            event = "loadtracks"
+        elif mode == "insert":
+            pos = player.index + 1
+            player.playlist[pos:pos] = tracks
+            event = "inserttracks"
+        else:
+            player.playlist += tracks
+            event = "addtracks"
+
+        return CommandResult(data={"count": count}, echo=cmd,
+                             values=["count:{}".format(count)],
+                             notification=self._notice(player, "playlist",
+                                                       event, count))
+
+    def advance(self, seconds):
+        """Moves time on for all playing players, starting the next track
+           when the current one finishes.
+        """
+        with self.lock:
+            events = []
+            for player in self.players.values():
+                if player.mode != "play" or not player.current:
+                    continue
+                player.time += seconds
+                if player.time >= player.current.get("duration", 0):
+                    events.append(self._set_index(player, player.index + 1))
+
+        if self.notify:
+            for event in events:
+                if event:
+                    self.notify(event)
@@ -0,0 +1,513 @@
+"""A stand-in for Logitech Media Server which runs locally.
+
+   The server speaks the telnet CLI (default port 9090) and JSON-RPC,
+   cometd and artwork over HTTP (default port 9000) using the data in a
+   FakeLibrary. Response latency can be configured and notifications can be
+   sent to listening CLI clients (and pushed to cometd subscribers) with a
+   NotificationGenerator.
+
+   It can be started from the root of the repository with:
+
+       python -m benchmarks.fakelms.server --players 3
+"""
+import json
+import random
+import re
+from itertools import count
+from threading import Condition, Lock, Thread
+from time import sleep, time
+
+try:
+    from urllib import quote, unquote
+    from SocketServer import StreamRequestHandler, ThreadingTCPServer
+    from BaseHTTPServer import BaseHTTPRequestHandler
+except ImportError:
+    from urllib.parse import quote, unquote
+    from socketserver import StreamRequestHandler, ThreadingTCPServer
+    from http.server import BaseHTTPRequestHandler
+
+from .library import FakeLibrary
+
+# Characters which LMS leaves unescaped in CLI responses
+SAFE_CHARS = "-_.!~*'()"
+
+COVER_PATH = re.compile(r"/music/([^/]+)/cover(?:_(\d+)x(\d+))?")
+
+
+def cli_quote(text):
+    if not isinstance(text, str):
+        text = text.encode("utf-8")
+    return quote(text, safe=SAFE_CHARS)
+
+
+def format_reply(library, tokens):
+    """Runs an unquoted CLI command and returns the quoted reply line."""
+    if tokens[0] in library.players:
+        ref, cmd = tokens[0], tokens[1:]
+        prefix = [ref]
+    else:
+        ref, cmd = None, tokens
+        prefix = []
+
+    result = library.execute(ref, cmd)
+    return " ".join(cli_quote(x) for x in
+                    prefix + result.echo + [str(v) for v in result.values])
+
+
+class _TCPServer(ThreadingTCPServer):
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, handler, owner):
+        self.owner = owner
+        ThreadingTCPServer.__init__(self, address, handler)
+
+
+class CLIHandler(StreamRequestHandler):
+    """Handles a single telnet CLI connection."""
+
+    def setup(self):
+        StreamRequestHandler.setup(self)
+        self.listen = False
+        self.subscriptions = set()
+        self.write_lock = Lock()
+        self.server.owner.add_client(self)
+
+    def finish(self):
+        self.server.owner.remove_client(self)
+        try:
+            StreamRequestHandler.finish(self)
+        except Exception:
+            pass
+
+    def send_line(self, line):
+        with self.write_lock:
+            try:
+                if not isinstance(line, bytes):
+                    line = line.encode("utf-8")
+                # Write in one go to avoid delays from Nagle's algorithm
+                self.wfile.write(line + b"\n")
+                self.wfile.flush()
+            except Exception:
+                pass
+
+    def wants(self, tokens):
+        """Whether this client should receive the notification."""
+        if self.listen:
+            return True
+        return len(tokens) > 1 and tokens[1] in self.subscriptions
+
+    def handle(self):
+        owner = self.server.owner
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+
+            line = line.decode("utf-8") if isinstance(line, bytes) else line
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+
+            tokens = [unquote(x) for x in line.split(" ")]
+
+            if tokens[0] == "exit":
+                break
+
+            owner.delay()
+            self.send_line(self.respond(tokens))
+
+    def respond(self, tokens):
+        owner = self.server.owner
+
+        if tokens[0] == "subscribe":
+            names = tokens[1].split(",") if len(tokens) > 1 else []
+            self.subscriptions = set(x for x in names if x)
+            return " ".join(cli_quote(x) for x in tokens)
+
+        if tokens[0] == "listen":
+            arg = tokens[1] if len(tokens) > 1 else None
+            if arg == "?":
+                return "listen {}".format(int(self.listen))
+            self.listen = arg != "0"
+            if not self.listen:
+                self.subscriptions = set()
+            return " ".join(cli_quote(x) for x in tokens)
+
+        return format_reply(owner.library, tokens)
+
+
+class CometdSession(object):
+    """A cometd client and the "/slim/subscribe" requests it has made."""
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.subscriptions = {}
+        self.queue = []
+        self.closed = False
+        self.cond = Condition()
+
+    def push(self, channel, data):
+        with self.cond:
+            self.queue.append({"channel": channel, "data": data})
+            self.cond.notify_all()
+
+    def wait(self, timeout):
+        """Returns the queued messages, waiting up to 'timeout' seconds for
+           one to arrive.
+        """
+        deadline = time() + timeout
+        with self.cond:
+            while not self.queue and not self.closed:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            messages, self.queue = self.queue, []
+            return messages
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class HTTPHandler(BaseHTTPRequestHandler):
+    """Handles JSON-RPC requests and artwork downloads."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json", code=200):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    def do_POST(self):
+        owner = self.server.owner
+        owner.delay()
+
+        try:
+            data = json.loads(self._body().decode("utf-8"))
+        except ValueError:
+            self._send(b"", code=400)
+            return
+
+        path = self.path.split("?")[0]
+
+        if path == "/jsonrpc.js":
+            self._send(json.dumps(owner.jsonrpc(data)).encode("utf-8"))
+
+        elif path == "/cometd":
+            self._send(json.dumps(owner.cometd(data)).encode("utf-8"))
+
+        else:
+            self._send(b"", code=404)
+
+    def do_GET(self):
+        owner = self.server.owner
+        owner.delay()
+
+        match = COVER_PATH.match(self.path)
+        if match:
+            coverid, w, h = match.groups()
+            size = (int(w), int(h)) if w else None
+        else:
+            coverid, size = self.path, (64, 64)
+
+        self._send(owner.library.artwork(coverid, size),
+                   content_type="image/png")
+
+
+class FakeLMSServer(object):
+    """Runs the CLI and HTTP interfaces for a FakeLibrary.
+
+       Pass port 0 to use a free port. The ports in use are available as
+       cli_port and web_port once the server has started.
+    """
+
+    def __init__(self, library=None, host="127.0.0.1", cli_port=9090,
+                 web_port=9000, latency=0.0, jitter=0.0, cometd_timeout=60):
+        self.library = library if library is not None else FakeLibrary()
+        self.library.notify = self.broadcast
+        self.host = host
+        self.cli_port = cli_port
+        self.web_port = web_port
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(0)
+        self.clients = []
+        self.clients_lock = Lock()
+        self._servers = []
+
+        # Seconds a cometd "/meta/connect" waits for something to send
+        self.cometd_timeout = cometd_timeout
+        self.sessions = {}
+        self.session_ids = count(1)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        cli = _TCPServer((self.host, self.cli_port), CLIHandler, self)
+        web = _TCPServer((self.host, self.web_port), HTTPHandler, self)
+        self.cli_port = cli.server_address[1]
+        self.web_port = web.server_address[1]
+
+        for server in [cli, web]:
+            thread = Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self._servers.append(server)
+
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+        with self.clients_lock:
+            clients = list(self.clients)
+            sessions = list(self.sessions.values())
+            self.sessions = {}
+        for client in clients:
+            try:
+                client.connection.close()
+            except Exception:
+                pass
+        for session in sessions:
+            session.close()
+
+    def delay(self):
+        """Waits for the configured latency (plus or minus the jitter)."""
+        wait = self.latency
+        if self.jitter:
+            wait += self.random.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            sleep(wait)
+
+    def add_client(self, client):
+        with self.clients_lock:
+            self.clients.append(client)
+
+    def remove_client(self, client):
+        with self.clients_lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def broadcast(self, tokens):
+        """Sends a notification to the CLI clients which are listening for
+           it. 'tokens' can be a list or an unquoted string.
+        """
+        if not isinstance(tokens, list):
+            tokens = tokens.split(" ")
+        tokens = [str(x) for x in tokens]
+        line = " ".join(cli_quote(x) for x in tokens)
+
+        with self.clients_lock:
+            clients = list(self.clients)
+
+        for client in clients:
+            if client.wants(tokens):
+                client.send_line(line)
+
+        self.cometd_notify(tokens)
+
+    def jsonrpc(self, data):
+        """Runs a "slim.request" call and returns the JSON-RPC response."""
+        params = data.get("params", ["-", []])
+        ref = params[0] if params and params[0] not in ["-", "", None] \
+            else None
+        cmd = params[1] if len(params) > 1 else []
+
+        result = self.library.execute(ref, cmd)
+        return {"id": data.get("id"),
+                "method": data.get("method", "slim.request"),
+                "params": params,
+                "result": result.data}
+
+
+    def cometd(self, messages):
+        """Handles a list of cometd (Bayeux) messages and returns the
+           replies. A "/meta/connect" waits until there's something to push
+           to the client.
+        """
+        if isinstance(messages, dict):
+            messages = [messages]
+
+        replies = []
+        session = None
+        connect = None
+
+        for message in messages:
+            channel = message.get("channel")
+            reply = {"channel": channel, "id": message.get("id"),
+                     "successful": True}
+            replies.append(reply)
+
+            if channel == "/meta/handshake":
+                session = CometdSession("{:08x}".format(
+                    next(self.session_ids)))
+                with self.clients_lock:
+                    self.sessions[session.client_id] = session
+                reply.update(clientId=session.client_id, version="1.0",
+                             supportedConnectionTypes=["long-polling"],
+                             advice={"reconnect": "retry", "interval": 0,
+                                     "timeout": self.cometd_timeout * 1000})
+                continue
+
+            with self.clients_lock:
+                session = self.sessions.get(message.get("clientId"))
+
+            if session is None:
+                reply.update(successful=False, error="invalid clientId",
+                             advice={"reconnect": "handshake"})
+
+            elif channel == "/meta/connect":
+                connect = reply
+
+            elif channel == "/meta/disconnect":
+                with self.clients_lock:
+                    self.sessions.pop(session.client_id, None)
+                session.close()
+
+            elif channel == "/slim/subscribe":
+                data = message.get("data", {})
+                ref, cmd = data.get("request", ["", []])
+                response = data.get("response")
+                cmd = [x for x in cmd if not str(x).startswith("subscribe:")]
+                session.subscriptions[response] = (ref or None, cmd)
+                self.cometd_push(session, response)
+
+            elif channel == "/slim/unsubscribe":
+                data = message.get("data", {})
+                session.subscriptions.pop(data.get("unsubscribe"), None)
+
+        if connect is not None:
+            replies += session.wait(self.cometd_timeout)
+            if session.closed:
+                connect.update(successful=False, error="disconnected")
+
+        return replies
+
+    def cometd_push(self, session, channel):
+        """Runs a subscribed request and pushes the result."""
+        subscription = session.subscriptions.get(channel)
+        if subscription is not None:
+            ref, cmd = subscription
+            session.push(channel, self.library.execute(ref, cmd).data)
+
+    def cometd_notify(self, tokens):
+        """Pushes the subscriptions affected by a notification."""
+        ref = tokens[0] if tokens[0] in self.library.players else None
+        event = tokens[1] if ref and len(tokens) > 1 else tokens[0]
+
+        with self.clients_lock:
+            sessions = list(self.sessions.values())
+
+        for session in sessions:
+            for channel, (sub_ref, cmd) in list(session.subscriptions.items()):
+                if sub_ref is None:
+                    changed = event == "client"
+                else:
+                    # Syncing changes the status of the other players too
+                    changed = sub_ref == ref or event == "sync"
+                if changed:
+                    self.cometd_push(session, channel)
+
+
+class NotificationGenerator(object):
+    """Sends scripted notifications from a FakeLMSServer."""
+
+    # Notifications which can be generated by random_events
+    EVENTS = [["playlist", "newsong", "Track", "{index}"],
+              ["playlist", "pause", "{flag}"],
+              ["mixer", "volume", "{volume}"],
+              ["client", "reconnect"],
+              ["playlist", "addtracks", "1"]]
+
+    def __init__(self, server, seed=0):
+        self.server = server
+        self.random = random.Random(seed)
+
+    def send(self, event):
+        self.server.broadcast(event)
+
+    def burst(self, events, repeat=1, interval=0.0):
+        """Sends the events 'repeat' times, waiting 'interval' seconds
+           between each notification.
+        """
+        for _ in range(repeat):
+            for event in events:
+                self.send(event)
+                if interval:
+                    sleep(interval)
+
+    def replay(self, events, repeat=1, interval=0.0):
+        """Runs burst() in a background thread and returns the thread."""
+        thread = Thread(target=self.burst, args=(events, repeat, interval))
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def random_events(self, count, refs=None):
+        """Returns 'count' notifications for the library's players."""
+        refs = refs or list(self.server.library.players)
+        events = []
+        for _ in range(count):
+            template = self.random.choice(self.EVENTS)
+            values = {"index": self.random.randint(0, 20),
+                      "flag": self.random.randint(0, 1),
+                      "volume": self.random.randint(0, 100)}
+            events.append([self.random.choice(refs)] +
+                          [x.format(**values) for x in template])
+        return events
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fake Logitech Media Server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--cli-port", type=int, default=9090)
+    parser.add_argument("--web-port", type=int, default=9000)
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--artists", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    args = parser.parse_args()
+
+    library = FakeLibrary().populate(players=args.players,
+                                     artists=args.artists)
+    server = FakeLMSServer(library, host=args.host, cli_port=args.cli_port,
+                           web_port=args.web_port, latency=args.latency,
+                           jitter=args.jitter).start()
+
+    print("Fake LMS running: CLI {} / web {}".format(server.cli_port,
+                                                     server.web_port))
+    try:
+        while True:
+            sleep(1)
+            library.advance(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
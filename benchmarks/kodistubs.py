@@ -0,0 +1,168 @@
+"""Minimal stand-ins for the Kodi python modules.
+
+   These let the script's modules be imported and timed outside of Kodi.
+   install() must be called before anything from resources.lib is imported
+   as some modules read addon settings at import time.
+"""
+import os
+import sys
+import tempfile
+import types
+
+SETTINGS = {"server_ip": "127.0.0.1",
+            "telnet_port": "9090",
+            "web_port": "9000",
+            "blur_size": "25",
+            "debug_log": "false"}
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+class _Control(object):
+
+    def __init__(self, *args, **kwargs):
+        self.items = []
+        self.selected = 0
+
+    def __getattr__(self, name):
+        # Any other control method is accepted and ignored
+        return lambda *args, **kwargs: None
+
+    def reset(self):
+        self.items = []
+
+    def addItem(self, item):
+        self.items.append(item)
+
+    def addItems(self, items):
+        self.items.extend(items)
+
+    def getSelectedPosition(self):
+        return self.selected
+
+    def getSelectedItem(self):
+        try:
+            return self.items[self.selected]
+        except IndexError:
+            return None
+
+
+class ListItem(object):
+
+    def __init__(self, label="", *args, **kwargs):
+        self.label = label
+        self.properties = {}
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def setProperty(self, key, value):
+        self.properties[key] = value
+
+    def getProperty(self, key):
+        return self.properties.get(key, "")
+
+
+class Window(object):
+
+    def __init__(self, window_id=None):
+        self.properties = {}
+
+    def setProperty(self, key, value):
+        self.properties[key] = value
+
+    def clearProperty(self, key):
+        self.properties.pop(key, None)
+
+    def getProperty(self, key):
+        return self.properties.get(key, "")
+
+
+class WindowXML(Window):
+
+    def __init__(self, *args, **kwargs):
+        Window.__init__(self)
+        self.controls = {}
+
+    def getControl(self, control_id):
+        return self.controls.setdefault(control_id, _Control())
+
+    def getFocusId(self):
+        return 0
+
+    def setFocusId(self, control_id):
+        pass
+
+    def setFocus(self, control):
+        pass
+
+    def close(self):
+        pass
+
+
+class Addon(object):
+
+    profile = None
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def getAddonInfo(self, key):
+        info = {"id": "script.squeezeinfo",
+                "path": os.path.dirname(os.path.dirname(
+                    os.path.abspath(__file__))),
+                "profile": Addon.profile}
+        return info.get(key, "")
+
+    def getSetting(self, key):
+        return SETTINGS.get(key, "")
+
+    def setSetting(self, key, value):
+        SETTINGS[key] = value
+
+
+class ActionHandler(object):
+
+    def action(self, *args, **kwargs):
+        return lambda func: func
+
+    def serve_action(self, *args, **kwargs):
+        pass
+
+
+class _Path(str):
+    """translatePath in Kodi returns a byte string which is decoded."""
+
+    def decode(self, *args):
+        return self
+
+
+def install(profile=None, **settings):
+    """Registers the stub modules. Returns the profile folder in use."""
+    if profile is None:
+        profile = tempfile.mkdtemp(prefix="squeezeinfo-bench-")
+    Addon.profile = profile
+    SETTINGS.update(dict((k, str(v)) for k, v in settings.items()))
+
+    _module("xbmc",
+            LOGDEBUG=0, LOGINFO=1, LOGNOTICE=2, LOGWARNING=3, LOGERROR=4,
+            abortRequested=False,
+            log=lambda *args, **kwargs: None,
+            sleep=lambda ms: None,
+            translatePath=lambda path: _Path(path),
+            getCondVisibility=lambda condition: False)
+    _module("xbmcgui",
+            Window=Window, WindowXML=WindowXML, ListItem=ListItem,
+            Dialog=lambda: _Control(), INPUT_ALPHANUM=0,
+            getCurrentWindowId=lambda: 13000)
+    _module("xbmcaddon", Addon=Addon)
+    kodi65 = _module("kodi65")
+    kodi65.actionhandler = _module("kodi65.actionhandler",
+                                   ActionHandler=ActionHandler)
+
+    return profile
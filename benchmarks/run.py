@@ -0,0 +1,383 @@
+"""Benchmarks for the script's request, parse, dispatch and render paths.
+
+   Everything runs against a local fake LMS server with the Kodi modules
+   stubbed. Results are written as JSON and compared with a stored baseline
+   so that regressions show up before a new version is deployed.
+
+   Run from the root of the repository:
+
+       python -m benchmarks.run
+       python -m benchmarks.run --save       # store results as the baseline
+       python -m benchmarks.run --quick      # smaller sizes, fewer loops
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from time import time
+
+from . import kodistubs
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baseline.json")
+
+# Fractional change from the baseline which is reported as a regression
+THRESHOLD = 0.2
+
+BENCHMARKS = []
+
+
+class Skip(Exception):
+    """Raised when a benchmark can't run in this environment."""
+    pass
+
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+
+def result(name, value, unit, higher_is_better=True):
+    return {"name": name,
+            "value": value,
+            "unit": unit,
+            "higher_is_better": higher_is_better}
+
+
+def rate(func, loops):
+    """Returns the number of calls to 'func' per second."""
+    func()
+    start = time()
+    for _ in range(loops):
+        func()
+    return loops / (time() - start)
+
+
+def per_call(func, loops):
+    """Returns the best time in seconds for a single call to 'func'."""
+    func()
+    best = None
+    for _ in range(loops):
+        start = time()
+        func()
+        elapsed = time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Context(object):
+    """Shared fake server and settings used by the benchmarks."""
+
+    def __init__(self, quick=False):
+        self.quick = quick
+        self.sizes = [10, 1000] if quick else [10, 1000, 50000]
+        self.loops = 20 if quick else 200
+
+    def start(self):
+        from .fakelms.library import FakeLibrary
+        from .fakelms.server import FakeLMSServer
+
+        self.library = FakeLibrary().populate(players=3)
+        self.server = FakeLMSServer(self.library, cli_port=0,
+                                    web_port=0).start()
+        self.profile = kodistubs.install(telnet_port=self.server.cli_port,
+                                         web_port=self.server.web_port)
+
+    def stop(self):
+        self.server.stop()
+
+
+class CannedTelnet(object):
+    """Replaces a telnet connection with replies generated in advance so that
+       only the parsing is timed.
+    """
+
+    def __init__(self, library):
+        self.library = library
+        self.replies = {}
+        self.reply = b""
+
+    def write(self, data):
+        from .fakelms.server import format_reply
+
+        try:
+            from urllib import unquote
+        except ImportError:
+            from urllib.parse import unquote
+
+        command = data.strip()
+        if command not in self.replies:
+            tokens = [unquote(x) for x in command.split(" ")]
+            self.replies[command] = format_reply(self.library, tokens)
+        self.reply = self.replies[command]
+
+    def read_line(self, timeout=None):
+        return self.reply
+
+    def close(self):
+        pass
+
+
+def _canned_server(ctx, size):
+    """Returns a pylms Server reading from canned replies for a library with
+       'size' tracks, all queued on the first player.
+    """
+    from .fakelms.library import FakeLibrary
+    from resources.lib.pylms.server import Server
+
+    library = FakeLibrary()
+    for i in range(size):
+        library.add_track(i, "Track {}".format(i),
+                          artist="Artist {}".format(i % 50),
+                          album="Album {}".format(i % 500))
+    player = library.add_player("00:04:20:00:00:01", "Bench")
+    library.set_playlist(player.ref, list(library.tracks))
+
+    server = Server()
+    server.telnet = server.reader = CannedTelnet(library)
+    server.get_players(update=False)
+    return server
+
+
+@benchmark
+def server_request(ctx):
+    """Round trips of Server.request over the CLI."""
+    from resources.lib.pylms.server import Server
+    from resources.lib.pylms.transport import AsyncServer
+    from resources.lib.simplelms.simplelms import LMSServer
+
+    server = Server(port=ctx.server.cli_port)
+    server.connect(update=False)
+    telnet = rate(lambda: server.request("player count ?"), ctx.loops)
+    server.disconnect()
+
+    shared = AsyncServer(port=ctx.server.cli_port)
+    shared.connect(update=False)
+    transport = rate(lambda: shared.request("player count ?"), ctx.loops)
+    shared.disconnect()
+
+    json_server = LMSServer(port=ctx.server.web_port)
+    jsonrpc = rate(lambda: json_server.request(params="player count ?"),
+                   ctx.loops)
+
+    return [result("server_request.telnet", telnet, "req/s"),
+            result("server_request.transport", transport, "req/s"),
+            result("server_request.jsonrpc", jsonrpc, "req/s")]
+
+
+@benchmark
+def parse_results(ctx):
+    """Parsing of request_with_results and playlist_get_info responses."""
+    from resources.lib.pylms.player import DETAILED_TAGS
+
+    results = []
+
+    for size in ctx.sizes:
+        server = _canned_server(ctx, size)
+        player = server.players[0]
+        loops = max(1, min(ctx.loops, 100000 // size))
+
+        songs = per_call(
+            lambda: server.request_with_results(
+                "songs 0 {} tags:al".format(size)), loops)
+        playlist = per_call(
+            lambda: player.playlist_get_info(start=0, amount=size,
+                                             taglist=DETAILED_TAGS), loops)
+
+        results.append(result("request_with_results.{}".format(size),
+                              size / songs, "items/s"))
+        results.append(result("playlist_get_info.{}".format(size),
+                              size / playlist, "items/s"))
+
+    return results
+
+
+@benchmark
+def playlist_store(ctx):
+    """Build rate and memory per track of a PlaylistStore."""
+    from resources.lib.playliststore import PlaylistStore
+    from resources.lib.pylms.player import DETAILED_TAGS
+
+    results = []
+
+    for size in ctx.sizes:
+        player = _canned_server(ctx, size).players[0]
+        tracks = player.playlist_get_info(start=0, amount=size,
+                                          taglist=DETAILED_TAGS)
+        loops = max(1, min(ctx.loops, 100000 // size))
+
+        def build():
+            store = PlaylistStore()
+            store.extend(tracks)
+            return store
+
+        built = per_call(build, loops)
+        store = build()
+        arrays = [store.ids, store.durations, store.flags]
+        arrays += list(store.columns.values())
+        size_bytes = sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+
+        results.append(result("playlist_store.build.{}".format(size),
+                              size / built, "items/s"))
+        results.append(result("playlist_store.bytes.{}".format(size),
+                              size_bytes / float(size), "bytes/track",
+                              higher_is_better=False))
+
+    return results
+
+
+@benchmark
+def check_event(ctx):
+    """Dispatch rate of CallbackServer.check_event."""
+    from resources.lib.pylms.callbackserver import CallbackServer
+
+    cbserver = CallbackServer(port=ctx.server.cli_port)
+    noop = lambda event: None
+    for event in [CallbackServer.PLAYLIST_CHANGED,
+                  CallbackServer.PLAYLIST_CHANGE_TRACK,
+                  CallbackServer.VOLUME_CHANGE,
+                  CallbackServer.PLAY_PAUSE,
+                  CallbackServer.CLIENT_ALL]:
+        cbserver.add_callback(event, noop)
+
+    events = ["00%3A04%3A20%3A00%3A00%3A01 playlist newsong Title 3",
+              "00%3A04%3A20%3A00%3A00%3A01 mixer volume 45",
+              "00%3A04%3A20%3A00%3A00%3A02 playlist pause 1",
+              "00%3A04%3A20%3A00%3A00%3A03 client reconnect",
+              "00%3A04%3A20%3A00%3A00%3A03 prefset server volume 45"]
+
+    def dispatch():
+        for event in events:
+            cbserver.check_event(event)
+
+    return [result("check_event", rate(dispatch, ctx.loops * 10) *
+                   len(events), "events/s")]
+
+
+@benchmark
+def save_images(ctx):
+    """Time taken by ImageCache.save_images for each cover size."""
+    try:
+        # save_images only imports these when it's called
+        import requests
+        import PIL
+        from resources.lib.image_cache import ImageCache
+    except ImportError as e:
+        raise Skip(str(e))
+
+    cache = ImageCache()
+    results = []
+    for size in [300, 500, 1000]:
+        url = "http://127.0.0.1:{}/music/{}/cover_{}x{}_p.png".format(
+            ctx.server.web_port, size, size, size)
+        elapsed = per_call(lambda: cache.save_images(url, "bench.jpg"), 3)
+        results.append(result("save_images.{}".format(size), elapsed, "s",
+                              higher_is_better=False))
+    return results
+
+
+@benchmark
+def get_info(ctx):
+    """End to end time of SqueezeInfo.get_info."""
+    try:
+        from resources.lib.squeezeinfo import SqueezeInfo
+        from resources.lib.propertystore import PropertyStore
+    except ImportError as e:
+        raise Skip(str(e))
+
+    window = SqueezeInfo("squeeze.xml", "", "Default", "1080i")
+    window.windowID = 13000
+    window.properties = PropertyStore(window.windowID)
+    window.get_server()
+    window.get_squeeze_players()
+
+    elapsed = per_call(window.get_info, ctx.loops // 4 or 1)
+
+    # Write the snapshot now rather than leaving its timer running at exit
+    window.snapshot.save()
+    return [result("get_info", elapsed, "s", higher_is_better=False)]
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Returns a list of messages for results which are worse than the
+       baseline by more than 'threshold'.
+    """
+    regressions = []
+
+    for name, res in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or not base.get("value"):
+            continue
+
+        change = (res["value"] - base["value"]) / float(base["value"])
+        if not res["higher_is_better"]:
+            change = -change
+
+        if change < -threshold:
+            regressions.append("{}: {:.4g} {} (baseline {:.4g})".format(
+                name, res["value"], res["unit"], base["value"]))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--output", help="file to write the results to")
+    parser.add_argument("--save", action="store_true",
+                        help="store the results as the new baseline")
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("names", nargs="*", help="benchmarks to run")
+    args = parser.parse_args()
+
+    ctx = Context(quick=args.quick)
+    ctx.start()
+
+    results = {}
+    skipped = {}
+
+    try:
+        for bench in BENCHMARKS:
+            if args.names and bench.__name__ not in args.names:
+                continue
+            try:
+                for res in bench(ctx):
+                    results[res.pop("name")] = res
+            except Skip as e:
+                skipped[bench.__name__] = str(e)
+    finally:
+        ctx.stop()
+
+    output = {"python": platform.python_version(),
+              "quick": args.quick,
+              "results": results,
+              "skipped": skipped}
+    text = json.dumps(output, indent=2, sort_keys=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            f.write(text)
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+    except (IOError, ValueError):
+        baseline = {}
+
+    regressions = compare(results, baseline, args.threshold)
+    for message in regressions:
+        sys.stderr.write("REGRESSION {}\n".format(message))
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,22 +7,26 @@
 
    See license.txt for licensing information.
 """
+import json
 import os
 import shutil
 import sys
 
-import xbmc, xbmcaddon
+import xbmc, xbmcaddon, xbmcgui
 
-from resources.lib.squeezeinfo import SqueezeInfo
 
 _A_ = xbmcaddon.Addon()
 
 SKIN_PATH = _A_.getAddonInfo("path")
 ADDON_PROFILE = xbmc.translatePath(_A_.getAddonInfo('profile')).decode('utf-8')
 CACHE_PATH = os.path.join(ADDON_PROFILE, "cache")
+STATS_FILE = os.path.join(ADDON_PROFILE, "stats.json")
 
 
 def show_window():
+    # Only imported here so that other actions don't load the LMS clients
+    from resources.lib.squeezeinfo import SqueezeInfo
+
     window = SqueezeInfo("squeeze.xml", SKIN_PATH, "Default", "1080i")
     window.doModal()
     del window
@@ -30,7 +34,27 @@ def show_window():
 def delete_cache():
     shutil.rmtree(CACHE_PATH)
 
+def toggle_profiling():
+    enabled = _A_.getSetting("profiling") != "true"
+    _A_.setSetting("profiling", "true" if enabled else "false")
+    message = ("Profiling on. Open the window to capture data."
+               if enabled else "Profiling off.")
+    xbmcgui.Dialog().notification("Squeeze Info", message)
+
+def show_stats():
+    from resources.lib.stats import format_snapshot
+
+    try:
+        with open(STATS_FILE) as f:
+            text = format_snapshot(json.load(f))
+    except (IOError, ValueError):
+        text = "No statistics have been recorded yet."
+
+    xbmcgui.Dialog().textviewer("Squeeze Info statistics", text)
+
 ACTIONS = {"clearcache": delete_cache,
+           "stats": show_stats,
+           "profile": toggle_profiling,
            "default": show_window}
 
 if len(sys.argv) > 1:
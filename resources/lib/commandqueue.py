@@ -0,0 +1,190 @@
+"""Sends player commands to the server without holding up the window.
+
+   Each player has its own queue and worker thread so its commands are sent
+   in the order they were given, while a slow player doesn't hold up any
+   other. Commands still waiting to be sent are combined with the next one
+   where possible e.g. five presses of "next" while the first is being sent
+   become "playlist jump +1" and "playlist jump +4".
+
+   The caller updates the window straight away and passes a rollback function
+   which is run if the command fails. The commands queued after a failed one
+   are dropped and rolled back too (newest first), so the window ends up as
+   it was before the failed command.
+
+   This module doesn't import any Kodi modules so it can be used by the LMS
+   client libraries too.
+"""
+from collections import deque
+from threading import Lock, Thread
+
+# Commands which do the same thing if they're sent twice in a row
+IDEMPOTENT = frozenset([("play",), ("stop",), ("pause", "0"), ("pause", "1")])
+
+# Commands which undo themselves if they're sent twice in a row
+TOGGLES = frozenset([("pause",)])
+
+# Returned by merge() when two commands cancel each other out
+CANCEL = ()
+
+
+class CommandError(Exception):
+    pass
+
+
+def _jump(tokens):
+    """Returns the offset of a relative "playlist jump" (or "playlist index")
+       command, otherwise None.
+    """
+    if (len(tokens) == 3 and tokens[:2] in [("playlist", "jump"),
+                                            ("playlist", "index")]
+            and tokens[2][:1] in "+-"):
+        try:
+            return int(tokens[2])
+        except ValueError:
+            pass
+    return None
+
+
+def _is_index(tokens):
+    """Returns True for a command which plays a track by its position."""
+    return (len(tokens) == 3 and tokens[:2] in [("playlist", "jump"),
+                                                ("playlist", "index")]
+            and tokens[2].isdigit())
+
+
+def merge(first, second):
+    """Returns the tokens of a single command which does the same as 'first'
+       followed by 'second', CANCEL if the two do nothing or None if they
+       can't be combined.
+    """
+    offset, other = _jump(first), _jump(second)
+    if offset is not None and other is not None:
+        offset += other
+        if not offset:
+            return CANCEL
+        return ("playlist", "jump", "{:+d}".format(offset))
+
+    # Playing a track replaces any change of track before it
+    if _is_index(second) and (offset is not None or _is_index(first)):
+        return second
+
+    if first == second:
+        if first in IDEMPOTENT:
+            return first
+        if first in TOGGLES:
+            return CANCEL
+
+    return None
+
+
+class Command(object):
+    """A command waiting to be sent and the functions which undo its effect
+       on the window, oldest first.
+    """
+
+    __slots__ = ("tokens", "rollbacks")
+
+    def __init__(self, command, rollback=None):
+        if isinstance(command, basestring):
+            command = command.split()
+        self.tokens = tuple(command)
+        self.rollbacks = [rollback] if rollback is not None else []
+
+    def __repr__(self):
+        return "<Command {}>".format(" ".join(self.tokens))
+
+    def rollback(self, error):
+        for rollback in reversed(self.rollbacks):
+            try:
+                rollback(error)
+            except Exception:
+                pass
+
+
+class PlayerQueue(object):
+    """The commands waiting to be sent to a single player."""
+
+    def __init__(self, player):
+        self.player = player
+        self.pending = deque()
+        self.running = False
+
+    def add(self, command):
+        """Adds a command, combining it with the last one waiting if
+           possible.
+        """
+        if self.pending:
+            last = self.pending[-1]
+            tokens = merge(last.tokens, command.tokens)
+
+            if tokens == CANCEL:
+                self.pending.pop()
+                return
+
+            if tokens is not None:
+                last.tokens = tokens
+                last.rollbacks.extend(command.rollbacks)
+                return
+
+        self.pending.append(command)
+
+
+class CommandQueue(object):
+    """Sends commands to each player in order on a background thread."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.queues = {}
+
+    def submit(self, player, command, rollback=None):
+        """Queues a command (a string or list of words) for 'player'.
+           'rollback' is called with the error if the command fails.
+        """
+        ref = str(player.ref)
+
+        with self.lock:
+            queue = self.queues.get(ref)
+            if queue is None:
+                queue = self.queues[ref] = PlayerQueue(player)
+
+            queue.player = player
+            queue.add(Command(command, rollback))
+
+            if queue.running or not queue.pending:
+                return
+            queue.running = True
+
+        worker = Thread(target=self._run, args=(queue,))
+        worker.daemon = True
+        worker.start()
+
+    def pending(self, ref):
+        """Returns the commands waiting to be sent to a player."""
+        with self.lock:
+            queue = self.queues.get(str(ref))
+            return [c.tokens for c in queue.pending] if queue else []
+
+    def _send(self, player, command):
+        if player.request(list(command.tokens)) is None:
+            raise CommandError("No response to {}".format(command))
+
+    def _run(self, queue):
+
+        while True:
+            with self.lock:
+                if not queue.pending:
+                    # Stop here so that the next command starts a new worker
+                    queue.running = False
+                    return
+                command = queue.pending.popleft()
+
+            try:
+                self._send(queue.player, command)
+
+            except Exception as e:
+                with self.lock:
+                    failed = [command] + list(queue.pending)
+                    queue.pending.clear()
+
+                for cmd in reversed(failed):
+                    cmd.rollback(e)
@@ -1,16 +1,15 @@
 import errno
 import hashlib
 import os
-import requests
 from StringIO import StringIO
 
-from PIL import Image
-from PIL import ImageDraw
-from PIL import ImageFont
-from PIL import ImageFilter
-
 import xbmcaddon, xbmc
 
+# PIL and requests are slow to import so they're only loaded when an image
+# needs to be processed. Paths to cached images can be found without them.
+
+from .stats import STATS
+
 
 # Define some constants
 IMG_BACKGROUND = "backgrounds"
@@ -58,6 +57,9 @@ class ImageCache(object):
         """Retrieves the main colour from the image and returns a 5x5 image in
            this colour.
         """
+        from PIL import Image
+        from PIL import ImageDraw
+
         resize = 150
         tmp = img.resize((resize, resize))
         result = tmp.convert('P', palette=Image.ADAPTIVE, colors=1)
@@ -80,21 +82,33 @@ class ImageCache(object):
         icon_path = os.path.join(CACHE_PATH, IMG_ICON, img_name)
         swatch_path = os.path.join(CACHE_PATH, IMG_PROGRESS, img_name)
 
+        import requests
+        from PIL import Image
+        from PIL import ImageDraw
+        from PIL import ImageFilter
+
         # Get the image from the URL
-        raw = requests.get(url)
-        img = Image.open(StringIO(raw.content))
+        with STATS.timer("image download"):
+            raw = requests.get(url)
+
+        with STATS.timer("image decode"):
+            img = Image.open(StringIO(raw.content))
+            img.load()
 
         # The icon file is just the unprocessed image
-        tmp = img.copy()
-        tmp.save(icon_path)
+        with STATS.timer("image save"):
+            tmp = img.copy()
+            tmp.save(icon_path)
 
         # Process the background image...
 
         # 1) Resize
-        bg = img.resize((1920, 1920))
+        with STATS.timer("image resize"):
+            bg = img.resize((1920, 1920))
 
         # 2) Apply blur to hide pixellation
-        bg= bg.filter(ImageFilter.GaussianBlur(radius=BLUR_SIZE))
+        with STATS.timer("image blur"):
+            bg= bg.filter(ImageFilter.GaussianBlur(radius=BLUR_SIZE))
 
         # 4) Create a semi-transparent black layer
         lyr = Image.new('RGBA', (1920, 1920))
@@ -105,12 +119,17 @@ class ImageCache(object):
         bg.paste(lyr, (0,0), mask=lyr)
 
         # 6) Save the image
-        bg.save(bg_path)
+        with STATS.timer("image save"):
+            bg.save(bg_path)
 
         return
 
-    def getCachedImage(self, url, img_type, resize=False):
-        """Returns a path to the locally stored image."""
+    def getCachedImage(self, url, img_type, resize=False, create=True):
+        """Returns a path to the locally stored image.
+
+           If 'create' is False, None is returned when the image hasn't been
+           processed yet.
+        """
 
         if img_type not in CACHE_LOCATIONS:
             return
@@ -129,6 +148,11 @@ class ImageCache(object):
         cached_file = os.path.join(folder, img_name)
 
         if not os.path.exists(cached_file):
+            STATS.miss("image")
+            if not create:
+                return None
             self.save_images(url, img_name)
+        else:
+            STATS.hit("image")
 
         return os.path.join(SPECIAL_CACHE, subfolder, img_name)
@@ -0,0 +1,85 @@
+"""Logging helper for the script.
+
+   Debug messages are only formatted when they are going to be written, so
+   calls are cheap when debug logging is switched off. Arguments which are
+   callables are only evaluated at that point too.
+"""
+from time import time
+
+import xbmc, xbmcaddon
+
+# How often (in seconds) to check whether debug logging has been switched on
+CHECK_INTERVAL = 10
+
+
+class Logger(object):
+    """Writes messages for the addon to the Kodi log.
+
+       Debug output is written if Kodi's own debug logging is enabled or if
+       the addon's "debug_log" setting is on. Both are checked again every
+       CHECK_INTERVAL seconds so logging can be switched on at runtime.
+    """
+
+    def __init__(self, addon_id, level=xbmc.LOGDEBUG):
+        self.addon_id = addon_id
+        self.level = level
+        self.forced = None
+        self._kodi_debug = False
+        self._addon_debug = False
+        self._checked = 0
+
+    def set_enabled(self, enabled):
+        """Forces debug logging on or off. Pass None to follow the settings."""
+        self.forced = enabled
+
+    def _refresh(self):
+        now = time()
+        if now - self._checked > CHECK_INTERVAL:
+            self._checked = now
+            self._kodi_debug = bool(xbmc.getCondVisibility(
+                "System.GetBool(debug.showloginfo)"))
+            self._addon_debug = xbmcaddon.Addon().getSetting(
+                "debug_log") == "true"
+
+    @property
+    def enabled(self):
+        if self.forced is not None:
+            return self.forced
+
+        self._refresh()
+        return self._kodi_debug or self._addon_debug
+
+    def debug(self, message, *args):
+        """Writes a debug message to the log.
+
+           If 'args' are given, 'message' is treated as a format string. Any
+           argument which is callable is called to get the value to display.
+        """
+        if not self.enabled:
+            return
+
+        if args:
+            args = [arg() if callable(arg) else arg for arg in args]
+            message = message.format(*args)
+
+        # Messages would be hidden at LOGDEBUG unless Kodi is logging debug
+        # output itself
+        level = self.level if self._kodi_debug else xbmc.LOGNOTICE
+        self.log(message, level)
+
+    def error(self, message):
+        """Writes an error to the log whatever the debug settings."""
+        self.log(message, xbmc.LOGERROR)
+
+    def log(self, message, level=None):
+        """Basic function for outputting info to the log."""
+        if level is None:
+            level = self.level
+
+        # Make sure encoding is ok for log file
+        if isinstance(message, str):
+            message = message.decode("utf-8")
+
+        # Format the message and send to the logfile
+        message = u"{}: {}".format(self.addon_id, message)
+        xbmc.log(msg=message.encode("utf-8"), level=level)
@@ -0,0 +1,196 @@
+"""Keeps the state of every player on the server so that the window can show
+   a different player without asking the server first.
+
+   Each player's state comes from a single "status" request. Notifications
+   from the callback server update the state directly where they can (e.g.
+   volume and play/pause) and otherwise mark it as stale. Stale players are
+   refreshed in the background.
+"""
+from threading import Event, Lock, Thread
+from time import time
+
+# How often (in seconds) every player is refreshed from the server
+REFRESH_INTERVAL = 30
+
+
+class PlayerState(object):
+    """Now playing, mode, volume and progress of a single player."""
+
+    __slots__ = ("ref", "mode", "volume", "elapsed", "duration", "tracks",
+                 "updated", "stale")
+
+    def __init__(self, ref):
+        self.ref = ref
+        self.mode = None
+        self.volume = None
+        self.elapsed = 0.0
+        self.duration = 0.0
+        self.tracks = []
+        self.updated = 0
+        self.stale = True
+
+    @property
+    def playing(self):
+        return self.mode == "play"
+
+    def update(self, status):
+        """Sets the state from the result of a "status" request."""
+        self.mode = status.get("mode")
+        self.tracks = status.get("playlist_loop", [])
+
+        try:
+            self.volume = abs(int(status.get("mixer volume", 0)))
+        except (TypeError, ValueError):
+            self.volume = 0
+
+        try:
+            self.elapsed = float(status.get("time", 0))
+            self.duration = float(status.get("duration", 0))
+        except (TypeError, ValueError):
+            self.elapsed = self.duration = 0.0
+
+        self.updated = time()
+        self.stale = False
+
+    def set_mode(self, mode):
+        # Keep the progress correct when the player starts or stops
+        self.elapsed = self.progress()[0]
+        self.updated = time()
+        self.mode = mode
+
+    def progress(self):
+        """Returns the current elapsed time and duration of the track."""
+        elapsed = self.elapsed
+        if self.playing and self.updated:
+            elapsed += time() - self.updated
+            if self.duration:
+                elapsed = min(elapsed, self.duration)
+        return elapsed, self.duration
+
+
+class PlayerStateStore(object):
+    """Holds a PlayerState for each player.
+
+       A background thread refreshes stale players and refreshes every player
+       once every 'interval' seconds.
+    """
+
+    def __init__(self, interval=REFRESH_INTERVAL):
+        self.interval = interval
+        self.players = {}
+        self.states = {}
+        self.lock = Lock()
+        self.wake = Event()
+        self.abort = False
+        self.thread = None
+
+    def start(self):
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.abort = True
+        self.wake.set()
+
+    def get(self, ref):
+        """Returns the state of a player or None if it's not known yet."""
+        state = self.states.get(str(ref))
+        if state is None or state.stale:
+            return None
+        return state
+
+    def set_players(self, players):
+        """Sets the players to keep track of. New players are refreshed in
+           the background.
+        """
+        with self.lock:
+            self.players = dict((str(p.ref), p) for p in players)
+            for ref in list(self.states):
+                if ref not in self.players:
+                    del self.states[ref]
+            for ref in self.players:
+                if ref not in self.states:
+                    self.states[ref] = PlayerState(ref)
+
+        self.wake.set()
+
+    def refresh(self, ref):
+        """Gets the state of a player from the server. Returns the state or
+           None if the player isn't known.
+        """
+        ref = str(ref)
+        player = self.players.get(ref)
+        if player is None:
+            return None
+
+        status = player.get_status()
+
+        with self.lock:
+            state = self.states.get(ref)
+            if state is None:
+                return None
+            if status:
+                state.update(status)
+            return state
+
+    def update(self, ref, status):
+        """Sets a player's state from a status pushed by the server. Returns
+           the state or None if the player isn't known.
+        """
+        with self.lock:
+            state = self.states.get(str(ref))
+            if state is None:
+                return None
+            state.update(status)
+            return state
+
+    def invalidate(self, ref):
+        """Marks a player's state as stale so that it's refreshed."""
+        state = self.states.get(str(ref))
+        if state is not None:
+            state.stale = True
+            self.wake.set()
+
+    def set_mode(self, ref, mode):
+        state = self.states.get(str(ref))
+        if state is not None:
+            with self.lock:
+                state.set_mode(mode)
+
+    def set_volume(self, ref, volume):
+        """Sets the volume from a notification. Relative changes (e.g. "+5")
+           mean the state has to be refreshed.
+        """
+        state = self.states.get(str(ref))
+        if state is None:
+            return
+
+        if volume.isdigit():
+            state.volume = int(volume)
+        else:
+            self.invalidate(ref)
+
+    def _run(self):
+        last_full = 0
+
+        while not self.abort:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+
+            if self.abort:
+                break
+
+            full = time() - last_full >= self.interval
+            if full:
+                last_full = time()
+
+            for ref, state in list(self.states.items()):
+                if self.abort:
+                    break
+                if full or state.stale:
+                    try:
+                        self.refresh(ref)
+                    except Exception:
+                        # The server's unavailable. We'll try again later.
+                        pass
@@ -0,0 +1,226 @@
+"""Compact storage for the tracks in a player's playlist.
+
+   Instead of a dict per track, each field is kept in its own array. Text
+   fields (title, artist, album, cover id and artwork url) are stored once in
+   a table and the arrays hold their position in the table, so a queue of
+   tracks from the same few albums only holds each artist and album once.
+
+   A track is only turned back into a dict when it's read, so a playlist of
+   thousands of tracks costs tens of bytes per track plus the unique text.
+
+   This module doesn't import any Kodi modules so it can be used by the LMS
+   client libraries too.
+"""
+from array import array
+
+# Number of tracks requested from the server at a time when filling a store
+PAGE_SIZE = 500
+
+# Text fields which are stored in tables
+TEXT_FIELDS = ("title", "artist", "album", "coverid", "artwork_url")
+
+# Tags which have their own column
+KNOWN_KEYS = frozenset(TEXT_FIELDS + ("id", "duration", "coverart", "remote",
+                                      "playlist index", "position"))
+
+# Bits in the flags array
+HAS_ID = 1
+HAS_DURATION = 2
+HAS_COVERART = 4
+COVERART = 8
+HAS_REMOTE = 16
+REMOTE = 32
+
+
+class StringTable(object):
+    """Stores each distinct value once and numbers them."""
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        """Returns the number of the value (-1 for None)."""
+        if value is None:
+            return -1
+
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+    def get(self, idx):
+        return None if idx < 0 else self.values[idx]
+
+
+def _flag(value, has, flag):
+    try:
+        return has | flag if int(value) else has
+    except (TypeError, ValueError):
+        return 0
+
+
+class PlaylistStore(object):
+    """The tracks in (part of) a player's playlist.
+
+       'start' is the playlist index of the first track. Tracks are read by
+       their position in the store (store[0] is the first track), which is
+       also how durations are looked up.
+    """
+
+    def __init__(self, start=0, tables=None):
+        self.start = start
+
+        # Track ids are stored as doubles as remote tracks have large negative
+        # ids which don't fit in a C long on every platform
+        self.ids = array("d")
+        self.durations = array("d")
+        self.flags = array("B")
+
+        # Slices of a store share its tables
+        if tables is None:
+            tables = dict((field, StringTable()) for field in TEXT_FIELDS)
+        self.tables = tables
+        self.columns = dict((field, array("i")) for field in TEXT_FIELDS)
+
+        # Any other tags, by position in the store
+        self.extra = {}
+
+        # Running totals of the durations, built when first needed
+        self._ends = None
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __repr__(self):
+        return "<PlaylistStore {} tracks from {}>".format(len(self),
+                                                          self.start)
+
+    def append(self, track):
+        """Adds a track (a dict, or anything with a dict-like get method, as
+           returned by the server).
+        """
+        flags = 0
+
+        try:
+            self.ids.append(int(track.get("id")))
+            flags |= HAS_ID
+        except (TypeError, ValueError):
+            self.ids.append(0)
+
+        try:
+            self.durations.append(float(track.get("duration")))
+            flags |= HAS_DURATION
+        except (TypeError, ValueError):
+            self.durations.append(0.0)
+
+        flags |= _flag(track.get("coverart"), HAS_COVERART, COVERART)
+        flags |= _flag(track.get("remote"), HAS_REMOTE, REMOTE)
+        self.flags.append(flags)
+
+        for field in TEXT_FIELDS:
+            idx = self.tables[field].add(track.get(field))
+            self.columns[field].append(idx)
+
+        extra = dict((k, v) for k, v in track.items() if k not in KNOWN_KEYS)
+        if extra:
+            self.extra[len(self.flags) - 1] = extra
+
+        self._ends = None
+
+    def extend(self, tracks):
+        for track in tracks:
+            self.append(track)
+
+    def _track(self, idx):
+        flags = self.flags[idx]
+        track = {"playlist index": self.start + idx}
+
+        if flags & HAS_ID:
+            track["id"] = int(self.ids[idx])
+        if flags & HAS_DURATION:
+            track["duration"] = self.durations[idx]
+        if flags & HAS_COVERART:
+            track["coverart"] = 1 if flags & COVERART else 0
+        if flags & HAS_REMOTE:
+            track["remote"] = 1 if flags & REMOTE else 0
+
+        for field in TEXT_FIELDS:
+            value = self.tables[field].get(self.columns[field][idx])
+            if value is not None:
+                track[field] = value
+
+        extra = self.extra.get(idx)
+        if extra:
+            track.update(extra)
+
+        return track
+
+    def __getitem__(self, idx):
+        """Returns the track at a position as a dict or, for a slice, a
+           PlaylistStore of the tracks in the slice.
+        """
+        if isinstance(idx, slice):
+            return self._slice(idx)
+
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("playlist index out of range")
+        return self._track(idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._track(idx)
+
+    def _slice(self, s):
+        start, stop, step = s.indices(len(self))
+        if step != 1:
+            raise ValueError("PlaylistStore slices can't have a step")
+        stop = max(start, stop)
+
+        store = PlaylistStore(self.start + start, self.tables)
+        store.ids = self.ids[start:stop]
+        store.durations = self.durations[start:stop]
+        store.flags = self.flags[start:stop]
+        store.columns = dict((field, column[start:stop])
+                             for field, column in self.columns.items())
+        store.extra = dict((idx - start, extra)
+                           for idx, extra in self.extra.items()
+                           if start <= idx < stop)
+        return store
+
+    def _prefix(self):
+        """Returns the running totals of the durations. ends[i] is the
+           duration of the tracks before position i.
+        """
+        if self._ends is None:
+            ends = array("d", [0.0])
+            total = 0.0
+            for duration in self.durations:
+                total += duration
+                ends.append(total)
+            self._ends = ends
+        return self._ends
+
+    def duration(self, start=0, end=None):
+        """Total duration (in seconds) of the tracks from position 'start'
+           up to (but not including) 'end'.
+        """
+        start, end, _ = slice(start, end).indices(len(self))
+        ends = self._prefix()
+        return ends[end] - ends[start] if end > start else 0.0
+
+    @property
+    def total_duration(self):
+        return self._prefix()[-1]
+
+    def remaining(self, position, elapsed=0.0):
+        """Time left in the playlist when the track at 'position' has been
+           playing for 'elapsed' seconds.
+        """
+        return max(0.0, self.duration(position) - elapsed)
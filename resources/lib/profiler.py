@@ -0,0 +1,91 @@
+"""Optional profiling of the script's hot paths.
+
+   Functions are wrapped with Profiler.wrap when profiling is switched on.
+   Each wrapped function collects cProfile data for a fixed period after
+   which the data is written to .pstats files. Nothing is wrapped when
+   profiling is off so there is no overhead.
+"""
+import cProfile
+import os
+from threading import Lock, local
+from time import strftime, time
+
+
+class Profiler(object):
+    """Collects cProfile data for wrapped functions.
+
+       Data is captured for 'duration' seconds after start() and then saved
+       to 'folder' as <name>-<timestamp>.pstats.
+    """
+
+    def __init__(self, folder, duration=60):
+        self.folder = folder
+        self.duration = duration
+        self.profiles = {}
+        self.started = None
+        self.active = False
+        self.lock = Lock()
+        self._local = local()
+
+    def start(self):
+        self.started = time()
+        self.active = True
+
+    def wrap(self, name, func):
+        """Returns a version of 'func' which is profiled while active.
+
+           Only the outermost profiled call on a thread is recorded (calls it
+           makes are included in its data). If another thread is already
+           running the same function, the call isn't profiled.
+        """
+        profile = cProfile.Profile()
+        busy = Lock()
+
+        with self.lock:
+            self.profiles[name] = profile
+
+        def profiled(*args, **kwargs):
+            if (not self.active or getattr(self._local, "running", False)
+                    or not busy.acquire(False)):
+                return func(*args, **kwargs)
+
+            self._local.running = True
+            try:
+                return profile.runcall(func, *args, **kwargs)
+            finally:
+                self._local.running = False
+                busy.release()
+                if time() - self.started > self.duration:
+                    self.stop()
+
+        return profiled
+
+    def stop(self):
+        """Stops profiling and writes the collected data. Returns the list
+           of files written.
+        """
+        with self.lock:
+            if not self.active:
+                return []
+            self.active = False
+            profiles = list(self.profiles.items())
+
+        try:
+            os.makedirs(self.folder)
+        except OSError:
+            pass
+
+        stamp = strftime("%Y%m%d-%H%M%S")
+        written = []
+
+        for name, profile in profiles:
+            path = os.path.join(self.folder,
+                                "{}-{}.pstats".format(name, stamp))
+            try:
+                profile.dump_stats(path)
+                written.append(path)
+            except (TypeError, IOError, OSError):
+                # TypeError means the function was never called
+                pass
+
+        return written
@@ -0,0 +1,106 @@
+"""Keeps track of the window properties set by the script so that writes
+   which wouldn't change anything are never sent to Kodi.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock, local
+from time import time
+
+import xbmcgui
+
+
+class PropertyStore(object):
+    """Stores the last value written to each window property.
+
+       Writes can be grouped with the batch() context manager. The values are
+       then collected and only sent to the window when the outermost batch
+       finishes.
+    """
+
+    def __init__(self, window_id):
+        self.window = xbmcgui.Window(window_id)
+        self.values = {}
+        self.lock = Lock()
+
+        # Time the window was last changed
+        self.last_write = 0
+        self._local = local()
+
+    def _pending(self):
+        return getattr(self._local, "pending", None)
+
+    def get(self, propname, default=None):
+        return self.values.get(propname, default)
+
+    def set(self, propname, value):
+        """Sets a window property. Returns True if the property was written
+           (or queued) and False if it already had this value.
+        """
+        pending = self._pending()
+
+        if pending is not None:
+            pending[propname] = value
+            return self.values.get(propname) != value
+
+        return self._write(propname, value)
+
+    def clear(self, propname):
+        pending = self._pending()
+
+        if pending is not None:
+            pending[propname] = None
+        else:
+            self._write(propname, None)
+
+    def _write(self, propname, value):
+        with self.lock:
+            if value is None:
+                if propname not in self.values:
+                    return False
+                del self.values[propname]
+                self.window.clearProperty(propname)
+                self._written()
+                return True
+
+            if self.values.get(propname) == value:
+                return False
+
+            self.values[propname] = value
+            self.window.setProperty(propname, value)
+            self._written()
+            return True
+
+    def _written(self):
+        self.last_write = self._local.last_write = time()
+
+    def thread_last_write(self):
+        """Returns the time this thread last changed a property (0 if it
+           never has).
+        """
+        return getattr(self._local, "last_write", 0)
+
+    @contextmanager
+    def batch(self):
+        """Collects property writes made by this thread and sends them when
+           the block exits.
+        """
+        outer = self._pending() is None
+
+        if outer:
+            self._local.pending = OrderedDict()
+
+        try:
+            yield self
+        finally:
+            if outer:
+                pending = self._local.pending
+                self._local.pending = None
+                for propname, value in pending.iteritems():
+                    self._write(propname, value)
+
+    def reset(self):
+        """Forgets the stored values so that the next write of every property
+           goes to the window.
+        """
+        with self.lock:
+            self.values.clear()
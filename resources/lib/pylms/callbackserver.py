@@ -6,12 +6,16 @@ The client also accepts callback functions.
 The client subclasses python threading so methods are built-in to the class
 object.
 """
-from threading import Thread
+from threading import Lock, Thread
 from telnetlib import IAC, NOP
 import socket
-from time import sleep
+import traceback
+from time import sleep, time
 
+from .linereader import LineTooLong
+from .notification import Notification
 from .server import Server
+from ..syncgroups import SYNC_EVENTS
 
 
 class CallbackServer(Server, Thread):
@@ -24,6 +28,7 @@ class CallbackServer(Server, Thread):
     PLAY = "playlist pause 0"
     PAUSE = "playlist pause 1"
     PLAYLIST_OPEN = "playlist open"
+    PLAYLIST_STOP = "playlist stop"
     PLAYLIST_CHANGE_TRACK = "playlist newsong"
     PLAYLIST_LOAD_TRACKS = "playlist loadtracks"
     PLAYLIST_ADD_TRACKS = "playlist addtracks"
@@ -47,16 +52,42 @@ class CallbackServer(Server, Thread):
 
     SYNC = "sync"
 
+    # Events raised by the client rather than notifications from the server
+    LOCAL_EVENTS = [SERVER_ERROR, SERVER_CONNECT]
+
+    # Start of the server's replies to subscribe and listen commands
+    ECHOES = (b"subscribe ", b"listen ")
+
     def __init__(self, **kwargs):
         super(CallbackServer, self).__init__(**kwargs)
         self.callbacks = {}
-        self.notifications = []
         self.abort = False
         self.ending = "\n".encode(self.charset)
         self._server = self.get_server()
         self.connected = False
         self.daemon = True
 
+        # Time the latest notification was received
+        self.received = 0
+
+        # Number of callbacks for each notification and the notifications
+        # the server was last asked for
+        self.subscriptions = {}
+        self.subscribed = None
+        self.subscription_lock = Lock()
+
+        # Most words in an event with a callback
+        self.key_tokens = 1
+
+        # Exceptions raised by callbacks are written to this logger (if
+        # it's set) so that they don't stop the notifications
+        self.logger = None
+
+    @property
+    def notifications(self):
+        """The notifications which have callbacks."""
+        return sorted(self.subscriptions)
+
     def add_callback(self, event, callback):
         """Add a callback.
 
@@ -71,11 +102,17 @@ class CallbackServer(Server, Thread):
         else:
             self.__add_callback(event, callback)
 
+        self.update_subscription()
+
     def __add_callback(self, event, callback):
-        self.callbacks[event] = callback
-        notification = event.split(" ")[0]
-        if notification not in self.notifications:
-            self.notifications.append(notification)
+        with self.subscription_lock:
+            if (event not in self.callbacks and
+                    event not in CallbackServer.LOCAL_EVENTS):
+                notification = event.split(" ")[0]
+                count = self.subscriptions.get(notification, 0)
+                self.subscriptions[notification] = count + 1
+            self.callbacks[event] = callback
+            self.key_tokens = max(self.key_tokens, len(event.split(" ")))
 
     def remove_callback(self, event):
         """Remove a callback.
@@ -90,22 +127,80 @@ class CallbackServer(Server, Thread):
         else:
             self.__remove_callback(event)
 
+        self.update_subscription()
+
     def __remove_callback(self, event):
-        del self.callbacks[event]
+        with self.subscription_lock:
+            del self.callbacks[event]
+            if event in CallbackServer.LOCAL_EVENTS:
+                return
+
+            notification = event.split(" ")[0]
+            count = self.subscriptions.get(notification, 0) - 1
+            if count > 0:
+                self.subscriptions[notification] = count
+            else:
+                self.subscriptions.pop(notification, None)
+
+    def update_subscription(self):
+        """Asks the server for the notifications which have callbacks if
+           they've changed since it was last asked. With no callbacks, the
+           server is asked not to send anything.
+        """
+        with self.subscription_lock:
+            notifications = ",".join(sorted(self.subscriptions))
+            if not self.connected or notifications == self.subscribed:
+                return
+            self.subscribed = notifications
+
+        if notifications:
+            self.send_subscription("subscribe {}".format(notifications))
+        else:
+            self.send_subscription("listen 0")
+
+    def send_subscription(self, command):
+        """Sends a subscribe or listen command. The reply is skipped by the
+           reading thread (see ECHOES) so this can be called from any thread.
+        """
+        try:
+            self.telnet.write(command.encode(self.charset) + self.ending)
+        except (AttributeError, socket.error):
+            # It's sent again when we reconnect
+            pass
 
     def get_server(self):
         return Server(hostname=self.hostname, port=self.port)
 
-    def check_event(self, event):
-        """Checks whether any of the requested notification types match the
-           received notification. If there's a match, we run the requested
-           callback function passing the notification as the only parameter.
+    def check_event(self, event, received=None):
+        """Decodes the received notification and runs the callback for the
+           most specific match (e.g. "playlist pause 1" before
+           "playlist pause"), passing the Notification as the only
+           parameter. 'received' is the time the line arrived.
+
+           Sync notifications also update the sync index.
         """
-        for cb in self.callbacks:
-            if cb in event:
-                self.callbacks[cb](self.unquote(event))
+        notification = Notification.parse(event, self.charset)
+        notification.received = received
+
+        if notification.ref and notification.command[:1] and \
+                notification.command[0] in SYNC_EVENTS:
+            self.sync_index.handle([notification.ref] + notification.tokens)
+
+        for key in notification.keys(self.key_tokens):
+            callback = self.callbacks.get(key)
+            if callback is not None:
+                self.run_callback(callback, notification)
                 break
 
+    def run_callback(self, callback, notification):
+        try:
+            callback(notification)
+        except Exception:
+            if self.logger is not None:
+                self.logger.error(u"Callback for {} failed:\n{}".format(
+                    notification.name,
+                    traceback.format_exc().decode("utf-8", "replace")))
+
     def check_connection(self):
         """Method to check whether we can still connect to the server.
 
@@ -133,6 +228,7 @@ class CallbackServer(Server, Thread):
         while not self.abort:
             try:
                 self.connect()
+                self.subscribed = None
                 self.connected = True
                 self.check_event(CallbackServer.SERVER_CONNECT)
                 break
@@ -142,28 +238,28 @@ class CallbackServer(Server, Thread):
         if self.abort:
             return
 
-        # If we've already defined callbacks then we know which events we're
-        # listening out for
-        if self.notifications:
-            nots = ",".join(self.notifications)
-            self.request("subscribe {}".format(nots))
-
-        # If not, let's just listen for everything.
-        else:
-            self.request("listen")
+        # Only ask for the notifications which have callbacks. This is
+        # sent again whenever the callbacks change.
+        self.update_subscription()
 
         while not self.abort:
             try:
-                # Include a timeout to stop blocking if no server
-                data = self.telnet.read_until(self.ending, timeout=1)[:-1]
+                # Include a timeout so that we can check whether to stop
+                data = self.reader.read_line(timeout=1)
 
                 # We've got a notification, so let's see if it's one we're
                 # watching.
-                if data:
-                    self.check_event(data)
+                if data and not data.startswith(CallbackServer.ECHOES):
+                    self.received = time()
+                    self.check_event(data, self.received)
+
+            # Ignore notifications which are too long to be useful
+            except LineTooLong:
+                continue
 
             # Server is unavailable so exit gracefully
             except EOFError:
+                self.connected = False
                 self.check_event(CallbackServer.SERVER_ERROR)
                 self.run()
 
@@ -0,0 +1,87 @@
+"""
+Encoding and decoding of CLI commands and responses.
+
+The CLI percent-encodes every token of a response and echoes the command
+before the results. These functions are used for every token of every
+response so the quote/unquote functions are chosen once at import time and
+percent-decoding uses a lookup table.
+"""
+try:
+    from urllib import quote as _quote, unquote as _unquote
+    text_type = unicode
+except ImportError:
+    from urllib.parse import quote as _quote, unquote as _unquote
+    text_type = str
+
+QUOTED_COLON = "%3A"
+
+# Maps the two hex digits after a "%" to the character they encode
+_HEX = "0123456789ABCDEFabcdef"
+HEX_TABLE = dict((a + b, chr(int(a + b, 16))) for a in _HEX for b in _HEX)
+
+
+def quote(text, charset="utf8"):
+    """Percent-encodes a token of a command."""
+    if isinstance(text, text_type) and text_type is not str:
+        text = text.encode(charset)
+    return _quote(text)
+
+
+def unquote(text):
+    """Decodes the percent-encoding of a response. The result is still
+       encoded in the server's charset (see decode).
+    """
+    if "%" not in text:
+        return text
+
+    if isinstance(text, text_type) and text_type is not str:
+        return _unquote(text)
+
+    parts = text.split("%")
+    out = [parts[0]]
+    table = HEX_TABLE
+
+    for part in parts[1:]:
+        char = table.get(part[:2])
+        if char is None:
+            out.append("%")
+            out.append(part)
+        else:
+            out.append(char)
+            out.append(part[2:])
+
+    return "".join(out)
+
+
+def decode(data, charset="utf8"):
+    if isinstance(data, text_type):
+        return data
+    return data.decode(charset)
+
+
+def echo_length(command_string):
+    """Returns the number of tokens the server echoes before the results.
+
+       A query ("player count ?") is echoed with the value in place of the
+       "?". The password in a "login" is replaced with "******".
+    """
+    tokens = command_string.split()
+    if not tokens:
+        return 0
+
+    if tokens[-1] == "?" or (tokens[0] == "login" and len(tokens) > 1):
+        return len(tokens) - 1
+
+    return len(tokens)
+
+
+def strip_echo(command_string, response):
+    """Returns the part of a (still quoted) response after the echo of the
+       command.
+    """
+    n = echo_length(command_string)
+    if not n:
+        return response
+
+    parts = response.split(None, n)
+    return parts[n] if len(parts) > n else response[:0]
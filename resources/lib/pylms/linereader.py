@@ -0,0 +1,141 @@
+"""
+Reads newline terminated lines from a socket.
+
+Data is received into a reusable chunk and appended to a single bytearray.
+Newlines are searched for from where the last search stopped, so a long
+line which arrives in many pieces isn't scanned again for each piece.
+
+The socket is only read when there isn't a complete line in the buffer. If
+lines aren't being read, the server's writes are held up by TCP rather than
+the buffer growing.
+"""
+import select
+import socket
+from time import time
+
+# Longest line (in bytes) that will be returned
+MAX_LINE = 16 * 1024 * 1024
+
+# Size of each read from the socket
+CHUNK_SIZE = 64 * 1024
+
+# Consumed data is removed from the buffer once there's this much of it
+COMPACT_SIZE = 64 * 1024
+
+
+class LineTooLong(Exception):
+    pass
+
+
+class LineReader(object):
+
+    def __init__(self, sock, max_line=MAX_LINE, chunk_size=CHUNK_SIZE):
+        self.sock = sock
+        self.max_line = max_line
+        self.buf = bytearray()
+        self.chunk = bytearray(chunk_size)
+        self.view = memoryview(self.chunk)
+
+        # Start of the unread data and where to look for the next newline
+        self.pos = 0
+        self.scan = 0
+
+        # Number of lines to throw away (e.g. replies to requests which
+        # timed out)
+        self.skip = 0
+        self.discarding = False
+
+    def _next_line(self):
+        """Returns the next complete line in the buffer, False if there isn't
+           one and None if the line was thrown away.
+        """
+        idx = self.buf.find(b"\n", self.scan)
+
+        if idx < 0:
+            self.scan = len(self.buf)
+            return False
+
+        end = idx
+        if end > self.pos and self.buf[end - 1] == 13:
+            end -= 1
+
+        if self.discarding:
+            # The end of a line which was too long
+            line = None
+            self.discarding = False
+        elif self.skip:
+            line = None
+            self.skip -= 1
+        else:
+            # Copy the line out of the buffer once
+            line = memoryview(self.buf)[self.pos:end].tobytes()
+
+        self.pos = self.scan = idx + 1
+
+        if self.pos == len(self.buf):
+            del self.buf[:]
+            self.pos = self.scan = 0
+        elif self.pos > COMPACT_SIZE and self.pos * 2 > len(self.buf):
+            del self.buf[:self.pos]
+            self.scan -= self.pos
+            self.pos = 0
+
+        return line
+
+    def _fill(self, timeout):
+        """Reads from the socket. Returns False if nothing arrived before
+           the timeout.
+        """
+        try:
+            ready = select.select([self.sock], [], [], timeout)[0]
+            if not ready:
+                return False
+            n = self.sock.recv_into(self.chunk)
+        except (socket.error, select.error, ValueError):
+            n = 0
+
+        if not n:
+            raise EOFError("Connection closed")
+
+        self.buf += self.view[:n]
+
+        if (len(self.buf) - self.pos > self.max_line
+                and self.buf.find(b"\n", self.scan) < 0):
+            # Throw away what we have of the line and the rest of it when it
+            # arrives
+            del self.buf[:]
+            self.pos = self.scan = 0
+
+            if not self.discarding:
+                self.discarding = True
+                raise LineTooLong("Line longer than {} bytes".format(
+                    self.max_line))
+
+        return True
+
+    def read_line(self, timeout=None):
+        """Returns the next line (without the line ending) as bytes or None
+           if a complete line doesn't arrive within 'timeout' seconds.
+
+           Raises EOFError if the connection closes and LineTooLong if the
+           line is longer than the maximum line size.
+        """
+        deadline = None if timeout is None else time() + timeout
+
+        while True:
+            line = self._next_line()
+
+            if line is None:
+                continue
+
+            if line is not False:
+                return line
+
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time()
+                if remaining <= 0:
+                    return None
+
+            if not self._fill(remaining):
+                return None
@@ -0,0 +1,129 @@
+"""
+Notifications from the server's CLI.
+
+Each notification line is split and unquoted once into a Notification which
+is passed to the callbacks, e.g.
+
+    00%3A04%3A20%3A12%3A34%3A56 mixer volume 45
+
+has ref "00:04:20:12:34:56", command ["mixer", "volume"] and args ["45"].
+"""
+from . import codec
+
+# Number of tokens after the first which are part of the command rather than
+# its arguments (e.g. "playlist newsong <title> <index>"). Anything else is a
+# single word command.
+SUBCOMMANDS = {"playlist": 1,
+               "mixer": 1,
+               "client": 1,
+               "prefset": 2,
+               "playerpref": 1,
+               "rescan": 1}
+
+# Commands whose "name:value" arguments are tagged parameters. Any other
+# argument is positional, even if it contains a ":" (e.g. the title in
+# "playlist newsong live: 1999 3").
+TAGGED_COMMANDS = frozenset(["status",
+                             "playlistcontrol",
+                             "displaystatus",
+                             "menustatus",
+                             "serverstatus"])
+
+# Most words in a callback's event string (e.g. "playlist pause 1")
+MAX_KEY_TOKENS = 4
+
+# Decoded player refs. Every player notification starts with one so they're
+# only decoded the first time.
+_REFS = {}
+MAX_REFS = 256
+
+
+class Notification(object):
+    """A decoded notification.
+
+       ref:     player the notification is about (None for the server)
+       command: list of the command's words e.g. ["playlist", "newsong"]
+       args:    list of the positional arguments
+       tags:    dict of the "name:value" arguments (only for the commands in
+                TAGGED_COMMANDS)
+       received: time the line was received, if known
+    """
+
+    __slots__ = ("ref", "command", "args", "tags", "tokens", "received")
+
+    def __init__(self, ref, tokens, received=None):
+        self.ref = ref
+        self.tokens = tokens
+        self.received = received
+
+        depth = 1 + SUBCOMMANDS.get(tokens[0], 0) if tokens else 0
+        self.command = tokens[:depth]
+        self.args = []
+        self.tags = {}
+
+        if self.command and self.command[0] not in TAGGED_COMMANDS:
+            self.args = tokens[depth:]
+            return
+
+        for token in tokens[depth:]:
+            name, sep, value = token.partition(":")
+            if sep and name and name.islower() and " " not in name:
+                self.tags[name] = value
+            else:
+                self.args.append(token)
+
+    @classmethod
+    def parse(cls, line, charset="utf8"):
+        """Decodes a (quoted) notification line."""
+        first, _, rest = line.partition(" ")
+
+        ref = _REFS.get(first)
+        if ref is None:
+            ref = codec.decode(codec.unquote(first), charset)
+
+            # Player notifications start with the player's MAC address
+            if ":" in ref:
+                if len(_REFS) >= MAX_REFS:
+                    _REFS.clear()
+                _REFS[first] = ref
+            else:
+                rest = line
+                ref = None
+
+        # Tokens without a "%" are plain ASCII so only the others need
+        # decoding
+        tokens = [codec.decode(codec.unquote(t), charset) if "%" in t else t
+                  for t in rest.split(" ") if t]
+
+        return cls(ref, tokens)
+
+    @property
+    def name(self):
+        """The command as a string e.g. "playlist newsong"."""
+        return " ".join(self.command)
+
+    def arg(self, index, default=None):
+        try:
+            return self.args[index]
+        except IndexError:
+            return default
+
+    def keys(self, max_tokens=MAX_KEY_TOKENS):
+        """Returns the strings a callback can be registered for, from the
+           most specific to the least e.g. "playlist pause 1",
+           "playlist pause" and "playlist".
+        """
+        tokens = self.tokens[:max_tokens]
+        return [" ".join(tokens[:n]) for n in range(len(tokens), 0, -1)]
+
+    def __unicode__(self):
+        tokens = [self.ref] + self.tokens if self.ref else self.tokens
+        return u" ".join(tokens)
+
+    def __str__(self):
+        text = self.__unicode__()
+        return text if isinstance(text, str) else text.encode("utf8")
+
+    def __repr__(self):
+        return "<Notification {} {} {} {}>".format(self.ref, self.name,
+                                                   self.args, self.tags)
@@ -19,6 +19,10 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
+from . import codec
+from .playlist import iter_tracks
+from ..playliststore import PlaylistStore, PAGE_SIZE
+
 DETAILED_TAGS = ["a", "c", "d", "j", "K", "l", "x"]
 
 class Player(object):
@@ -90,25 +94,25 @@ class Player(object):
         self.ref = self.server.request("player id %i ?" % index)
         self.name = self.server.request("player name %i ?" % index)
         if update:
-            self.uuid = str(self.__unquote(
+            self.uuid = str(codec.unquote(
                 self.server.request("player uuid %i ?" % index)
             ))
-            self.ip_address = str(self.__unquote(
+            self.ip_address = str(codec.unquote(
                 self.server.request("player ip %i ?" % index)
             ))
-            self.model = str(self.__unquote(
+            self.model = str(codec.unquote(
                 self.server.request("player model %i ?" % index)
             ))
-            self.display_type = str(self.__unquote(
+            self.display_type = str(codec.unquote(
                 self.server.request("player displaytype %i ?" % index)
             ))
-            self.can_power_off = bool(self.__unquote(
+            self.can_power_off = bool(codec.unquote(
                 self.server.request("player canpoweroff %i ?" % index)
             ))
-            self.is_player = bool(self.__unquote(
+            self.is_player = bool(codec.unquote(
                 self.server.request("player isplayer %i ?" % index)
             ))
-            self.is_connected = bool(self.__unquote(
+            self.is_connected = bool(codec.unquote(
                 self.server.request("player connected %i ?" % index)
             ))
 
@@ -150,7 +154,7 @@ class Player(object):
 
     def has_permission(self, request_terms):
         """Check Player User Permissions"""
-        request_terms = self.__quote(request_terms)
+        request_terms = codec.quote(request_terms)
         granted = int(self.request("can %s ?" % (request_terms)))
         return (granted == 1)
 
@@ -169,7 +173,7 @@ class Player(object):
         if namespace:
             pref_string += namespace + ":"
         pref_string += name
-        value = self.__quote(value)
+        value = codec.quote(value)
         valid = self.request(
             "playerpref validate %s %s" % (pref_string, value))
         if "valid:1" in valid:
@@ -328,22 +332,22 @@ class Player(object):
 
     def playlist_play(self, item):
         """Play Item Immediately"""
-        item = self.__quote(item)
+        item = codec.quote(item)
         self.request("playlist play %s" % (item))
 
     def playlist_add(self, item):
         """Add Item To Playlist"""
-        item = self.__quote(item)
+        item = codec.quote(item)
         self.request("playlist add %s" % (item))
 
     def playlist_insert(self, item):
         """Insert Item Into Playlist (After Current Track)"""
-        item = self.__quote(item)
+        item = codec.quote(item)
         self.request("playlist insert %s" % (item))
 
     def playlist_delete(self, item):
         """Delete Item From Playlist By Name"""
-        item = self.__quote(item)
+        item = codec.quote(item)
         self.request("playlist deleteitem %s" % (item))
 
     def playlist_clear(self):
@@ -390,42 +394,50 @@ class Player(object):
 
     def playlist_get_info(self, taglist=None, start=None, amount=None):
         """Get info about the tracks in the current playlist"""
+        return list(self.playlist_iter_info(taglist=taglist, start=start,
+                                            amount=amount))
+
+    def playlist_iter_info(self, taglist=None, start=None, amount=None,
+                           page_size=None):
+        """Generator of PlaylistTrack records for the tracks in the current
+        playlist. If page_size is set, the tracks are requested in pages so
+        the first tracks are available before the rest have been sent"""
         if amount is None:
             amount = self.playlist_track_count()
 
         if start is None:
             start = 0
 
+        page_size = page_size or amount
         tags = " tags:{}".format(",".join(taglist)) if taglist else ""
-        response = self.request('status %i %i %s' % (start, amount, tags), True)
-        encoded_list = response.split('playlist%20index')[1:]
-        playlist = []
-        for encoded in encoded_list:
-            data = [self.__unquote(x) for x in
-                    ('position' + encoded).split(' ')]
-            item = {}
-            for info in data:
-                info = info.split(':')
-                key = info.pop(0)
-                if key:
-                    item[key] = ':'.join(info)
-            try:
-                item['position'] = int(item['position'])
-            except KeyError:
-                pass
-
-            try:
-                item['id'] = int(item['id'])
-            except KeyError:
-                pass
-
-            try:
-                item['duration'] = float(item['duration'])
-            except KeyError:
-                pass
-
-            playlist.append(item)
-        return playlist
+        end = start + amount
+
+        while start < end:
+            count = min(page_size, end - start)
+            response = self.request(
+                'status %i %i %s' % (start, count, tags), True)
+
+            received = 0
+            for track in iter_tracks(response):
+                received += 1
+                yield track
+
+            # Stop at the end of the playlist
+            if received < count:
+                break
+
+            start += count
+
+    def playlist_get_store(self, taglist=DETAILED_TAGS, start=None,
+                           amount=None, page_size=PAGE_SIZE):
+        """Get the tracks in the current playlist as a PlaylistStore. The
+        tracks are requested in pages and added to the store as they're
+        parsed"""
+        store = PlaylistStore(start or 0)
+        store.extend(self.playlist_iter_info(taglist=taglist, start=start,
+                                             amount=amount,
+                                             page_size=page_size))
+        return store
 
     # actions
 
@@ -440,7 +452,7 @@ class Player(object):
         """Displays text on Player display"""
         if font == "huge":
             line1 = ""
-        line1, line2 = self.__quote(line1), self.__quote(line2)
+        line1, line2 = codec.quote(line1), codec.quote(line2)
         req_string = "show line1:%s line2:%s duration:%s "
         req_string += "brightness:%s font:%s centered:%i"
         self.request(
@@ -451,7 +463,7 @@ class Player(object):
                 line1="",
                 line2="",
                 duration=3):
-        line1, line2 = self.__quote(line1), self.__quote(line2)
+        line1, line2 = codec.quote(line1), codec.quote(line2)
         req_string = "display %s %s %s"
         self.request(req_string % (line1, line2, str(duration)))
 
@@ -676,19 +688,3 @@ class Player(object):
     def unsync(self):
         """Unsync player"""
         self.request("sync -")
-
-    def __quote(self, text):
-        try:
-            import urllib.parse
-            return urllib.parse.quote(text, encoding=self.charset)
-        except ImportError:
-            import urllib
-            return urllib.quote(text)
-
-    def __unquote(self, text):
-        try:
-            import urllib.parse
-            return urllib.parse.unquote(text, encoding=self.charset)
-        except ImportError:
-            import urllib
-            return urllib.unquote(text)
@@ -0,0 +1,123 @@
+"""
+Parsing of the playlist in a "status" response.
+
+The response is read once, token by token. Each track becomes a
+PlaylistTrack which can be used like the dicts returned previously (get,
+[] and "in") but only stores the fields it has.
+"""
+from .codec import QUOTED_COLON, unquote
+
+# Marks the start of each track in the (still quoted) response
+TRACK_START = "playlist%20index"
+
+# Fields converted from text when a track is parsed
+FIELD_TYPES = {"position": int,
+               "id": int,
+               "duration": float,
+               "remote": int,
+               "coverart": int}
+
+
+class PlaylistTrack(object):
+    """A track in a player's playlist."""
+
+    __slots__ = ("position", "id", "title", "artist", "album", "duration",
+                 "coverid", "artwork_url", "remote", "extra")
+
+    FIELDS = __slots__[:-1]
+
+    def __init__(self, position=None):
+        for field in self.FIELDS:
+            setattr(self, field, None)
+        self.position = position
+        self.extra = None
+
+    def __repr__(self):
+        return "<PlaylistTrack {}: {}>".format(self.position, self.title)
+
+    def __eq__(self, other):
+        if isinstance(other, PlaylistTrack):
+            other = other.as_dict()
+        return self.as_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def set(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    __setitem__ = set
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        keys = [k for k in self.FIELDS if getattr(self, k) is not None]
+        if self.extra:
+            keys += list(self.extra)
+        return keys
+
+    def items(self):
+        return [(k, self.get(k)) for k in self.keys()]
+
+    def as_dict(self):
+        return dict(self.items())
+
+
+def iter_tracks(response):
+    """Yields a PlaylistTrack for each track in a quoted "status"
+       response.
+    """
+    track = None
+    types = FIELD_TYPES
+
+    for token in response.split(" "):
+        key, sep, value = token.partition(QUOTED_COLON)
+        if not sep:
+            continue
+
+        if key == TRACK_START:
+            if track is not None:
+                yield track
+            key = "position"
+            track = PlaylistTrack()
+
+        elif track is None:
+            # Player status before the first track
+            continue
+
+        else:
+            key = unquote(key)
+
+        value = unquote(value)
+
+        convert = types.get(key)
+        if convert is not None:
+            try:
+                value = convert(value)
+            except ValueError:
+                pass
+
+        track.set(key, value)
+
+    if track is not None:
+        yield track
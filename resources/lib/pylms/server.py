@@ -20,8 +20,17 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 """
 
 import telnetlib
-import urllib
+from time import time
+
+from . import codec
+from .linereader import LineReader
 from .player import Player
+from ..stats import STATS, command_key
+from ..syncgroups import SyncGroupIndex
+
+
+# Seconds to wait for a complete response
+REQUEST_TIMEOUT = 5
 
 
 class Server(object):
@@ -46,6 +55,7 @@ class Server(object):
         self.debug = False
         self.logger = None
         self.telnet = None
+        self.reader = None
         self.logged_in = False
         self.hostname = hostname
         self.port = port
@@ -57,6 +67,10 @@ class Server(object):
         self.charset = charset
         self.is_connected = False
 
+        # Sync groups are only requested once and then kept up to date from
+        # notifications
+        self.sync_index = SyncGroupIndex()
+
     def __repr__(self):
         return "<Server: host={} port={}>".format(self.hostname, self.port)
 
@@ -79,6 +93,10 @@ class Server(object):
         """
         self.telnet = telnetlib.Telnet(self.hostname, self.port, timeout=2)
 
+        # Responses are read straight from the socket rather than through
+        # telnetlib so that long lines aren't cut off by a timeout
+        self.reader = LineReader(self.telnet.sock)
+
     def login(self):
         """
         Login
@@ -91,28 +109,28 @@ class Server(object):
         Request
         """
         # self.logger.debug("Telnet: %s" % (command_string))
+        started = time()
         self.telnet.write(self.__encode(command_string + "\n"))
         # Include a timeout to stop unnecessary blocking
-        response = self.telnet.read_until(self.__encode("\n"),timeout=1)[:-1]
+        response = self.reader.read_line(timeout=REQUEST_TIMEOUT)
+        if response is None:
+            # The response will still arrive so make sure it's not taken as
+            # the response to the next request
+            self.reader.skip += 1
+            response = b""
+        result = self.parse_response(command_string, response,
+                                     preserve_encoding)
+        STATS.record("telnet " + command_key(command_string), time() - started)
+        return result
+
+    def parse_response(self, command_string, response,
+                       preserve_encoding=False):
+        """
+        Strip the echoed command from a response
+        """
+        result = codec.strip_echo(command_string, response)
         if not preserve_encoding:
-            response = self.__decode(self.__unquote(response))
-        else:
-            command_string_quoted = \
-                command_string[0:command_string.find(':')] + \
-                command_string[command_string.find(':'):].replace(
-                    ':', self.__quote(':'))
-        start = command_string.split(" ")[0]
-        if start in ["songinfo", "trackstat", "albums", "songs", "artists",
-                     "rescan", "rescanprogress"]:
-            if not preserve_encoding:
-                result = response[len(command_string)+1:]
-            else:
-                result = response[len(command_string_quoted)+1:]
-        else:
-            if not preserve_encoding:
-                result = response[len(command_string)-1:]
-            else:
-                result = response[len(command_string_quoted)-1:]
+            result = codec.decode(codec.unquote(result), self.charset)
         return result
 
     def request_with_results(self, command_string, preserve_encoding=False):
@@ -120,12 +138,21 @@ class Server(object):
         Request with results
         Return tuple (count, results, error_occurred)
         """
-        quotedColon = self.__quote(':')
         try:
-            #init
-            quotedColon = urllib.quote(':')
             #request command string
-            resultStr = ' '+self.request(command_string, True)
+            response = self.request(command_string, True)
+        except Exception as e:
+            return 0, [], True
+        return self.parse_results(response, preserve_encoding)
+
+    def parse_results(self, response, preserve_encoding=False):
+        """
+        Parse the response of a request with results
+        Return tuple (count, results, error_occurred)
+        """
+        quotedColon = codec.QUOTED_COLON
+        try:
+            resultStr = ' '+response
             #get number of results
             count = 0
             if resultStr.rfind('count%s' % quotedColon) >= 0:
@@ -154,7 +181,7 @@ class Server(object):
                         #save item
                         key, value = subResult.split(quotedColon, 1)
                         if not preserve_encoding:
-                            item[urllib.unquote(key)] = self.__unquote(value)
+                            item[codec.unquote(key)] = codec.unquote(value)
                         else:
                             item[key] = value
                     output.append(item)
@@ -202,11 +229,16 @@ class Server(object):
         self.player_count = self.request("player count ?")
         return int(self.player_count)
 
-    def get_sync_groups(self):
-        result = self.request("syncgroups ?")
-        syncgroups = [r[13:].split(",") for r in result.split()
-                                        if r.startswith("sync_members:")]
-        return syncgroups
+    def get_sync_groups(self, refresh=False):
+        """
+        Get Sync Groups (from the sync index unless 'refresh' is True)
+        """
+        if refresh or not self.sync_index.loaded:
+            result = self.request("syncgroups ?")
+            syncgroups = [r[13:].split(",") for r in result.split()
+                                            if r.startswith("sync_members:")]
+            self.sync_index.set_groups(syncgroups)
+        return self.sync_index.groups
 
 
     def search(self, term, mode='albums'):
@@ -255,23 +287,7 @@ class Server(object):
         return text.encode(self.charset)
 
     def __decode(self, bytes):
-        return bytes.decode(self.charset)
-
-    def __quote(self, text):
-        try:
-            import urllib.parse
-            return urllib.parse.quote(text, encoding=self.charset)
-        except ImportError:
-            import urllib
-            return urllib.quote(text)
-
-    def __unquote(self, text):
-        try:
-            import urllib.parse
-            return urllib.parse.unquote(text, encoding=self.charset)
-        except ImportError:
-            import urllib
-            return urllib.unquote(text)
+        return codec.decode(bytes, self.charset)
 
     def unquote(self, text):
-        return self.__unquote(text)
+        return codec.unquote(text)
@@ -0,0 +1,402 @@
+"""
+A single CLI connection shared by requests and notifications.
+
+Requests are sent straight away and return a Future. Responses are matched
+with requests in the order they were sent (the server answers each
+connection in order) and anything else is a notification. One thread reads
+the socket and one thread runs the notification callbacks, so callbacks can
+make requests over the same connection.
+
+Request timeouts are handled by the reading thread. Waiting on an Event
+(or a Queue) with a timeout polls on python 2, which would limit the
+request rate, so the dispatcher thread also waits without a timeout and is
+woken with a sentinel when it's stopped.
+"""
+from collections import deque
+from threading import Event, Lock, Thread
+from time import sleep, time
+import socket
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+from .callbackserver import CallbackServer
+from .codec import unquote
+from .linereader import LineReader, LineTooLong
+from ..stats import STATS, command_key
+
+# Seconds to wait for a response before giving up
+REQUEST_TIMEOUT = 5
+
+
+# Put on the notification queue to stop the dispatcher thread
+STOP = object()
+
+
+class TransportError(Exception):
+    pass
+
+
+class RequestTimeout(TransportError):
+    pass
+
+
+class ConnectionClosed(TransportError):
+    pass
+
+
+class Future(object):
+    """The result of a request which may not have arrived yet."""
+
+    def __init__(self):
+        self._done = Event()
+        self._result = None
+        self._error = None
+        self._callbacks = []
+        self._lock = Lock()
+
+    def done(self):
+        return self._done.is_set()
+
+    def set_result(self, result):
+        self._finish(result, None)
+
+    def set_exception(self, error):
+        self._finish(None, error)
+
+    def _finish(self, result, error):
+        with self._lock:
+            if self._done.is_set():
+                return
+            self._result = result
+            self._error = error
+            self._done.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        for callback in callbacks:
+            callback(self)
+
+    def result(self, timeout=None):
+        """Waits for the result. Raises the request's exception or
+           RequestTimeout if it doesn't arrive in time.
+        """
+        if timeout is None:
+            self._done.wait()
+        elif not self._done.wait(timeout):
+            raise RequestTimeout("No response after {}s".format(timeout))
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def add_done_callback(self, callback):
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def then(self, func):
+        """Returns a Future for func(result) of this Future."""
+        chained = Future()
+
+        def done(future):
+            try:
+                chained.set_result(func(future.result(0)))
+            except Exception as e:
+                chained.set_exception(e)
+
+        self.add_done_callback(done)
+        return chained
+
+
+class PendingRequest(object):
+    """A request waiting for its response.
+
+       A line is only taken as the response if it echoes every word of the
+       command before the "?" and, for a query, has no more words than the
+       command. Notifications which pass both (e.g. "<ref> mixer volume 45"
+       while "<ref> mixer volume ?" is waiting) carry the same answer as
+       the response.
+    """
+
+    __slots__ = ("tokens", "query_length", "future", "sent")
+
+    def __init__(self, command, future):
+        tokens = [unquote(x) for x in command.split(" ") if x]
+
+        # Queries are answered with the value in place of the "?"
+        self.query_length = None
+        if "?" in tokens:
+            self.query_length = len(tokens)
+            tokens = tokens[:tokens.index("?")]
+
+        # The password is hidden in the response to "login"
+        if tokens and tokens[0] == "login":
+            tokens = tokens[:1]
+            self.query_length = None
+
+        self.tokens = tokens
+        self.future = future
+        self.sent = time()
+
+    def matches(self, line):
+        n = len(self.tokens)
+        limit = n + 1 if self.query_length is None else self.query_length
+        words = [x for x in line.split(" ", limit) if x]
+
+        if self.query_length is not None and len(words) > self.query_length:
+            return False
+
+        return [unquote(x) for x in words[:n]] == self.tokens
+
+
+class CLITransport(object):
+    """Reads and writes lines on one connection to the server CLI."""
+
+    def __init__(self, hostname="localhost", port=9090, charset="utf8",
+                 on_notification=None, on_close=None,
+                 timeout=REQUEST_TIMEOUT):
+        self.hostname = hostname
+        self.port = port
+        self.charset = charset
+        self.timeout = timeout
+        self.on_notification = on_notification
+        self.on_close = on_close
+        self.sock = None
+        self.pending = deque()
+        self.lock = Lock()
+        self.closed = Event()
+        self.thread = None
+
+    def connect(self, timeout=2):
+        self.sock = socket.create_connection((self.hostname, self.port),
+                                             timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(None)
+        self.closed.clear()
+
+        self.thread = Thread(target=self._read)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.closed.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, socket.error):
+            pass
+
+    def send(self, command):
+        """Sends a command and returns a Future for the response line."""
+        future = Future()
+        line = (command + "\n").encode(self.charset)
+
+        with self.lock:
+            if self.closed.is_set():
+                future.set_exception(ConnectionClosed("Connection closed"))
+                return future
+
+            self.pending.append(PendingRequest(command, future))
+            try:
+                self.sock.sendall(line)
+            except socket.error as e:
+                self.pending.pop()
+                future.set_exception(ConnectionClosed(str(e)))
+
+        return future
+
+    def _expire(self):
+        """Fails requests which have waited too long for a response so that
+           they don't hold up the requests behind them.
+        """
+        expired = []
+        limit = time() - self.timeout
+
+        with self.lock:
+            while self.pending and self.pending[0].sent < limit:
+                expired.append(self.pending.popleft())
+
+        for request in expired:
+            request.future.set_exception(
+                RequestTimeout("No response after {}s".format(self.timeout)))
+
+    def _read(self):
+        reader = LineReader(self.sock)
+
+        while not self.closed.is_set():
+            try:
+                line = reader.read_line(timeout=0.5)
+            except LineTooLong as e:
+                # This is most likely the response to the oldest request
+                self._fail_oldest(e)
+                continue
+            except EOFError:
+                break
+
+            # Lines are passed on still encoded. Server.parse_response
+            # unquotes and decodes them.
+            if line is not None:
+                self._dispatch(line)
+
+            self._expire()
+
+        self._closed()
+
+    def _fail_oldest(self, error):
+        with self.lock:
+            request = self.pending.popleft() if self.pending else None
+
+        if request is not None:
+            request.future.set_exception(error)
+
+    def _dispatch(self, line):
+        request = None
+
+        with self.lock:
+            if self.pending and self.pending[0].matches(line):
+                request = self.pending.popleft()
+
+        if request is not None:
+            request.future.set_result(line)
+        elif self.on_notification:
+            self.on_notification(line)
+
+    def _closed(self):
+        self.closed.set()
+
+        with self.lock:
+            pending = list(self.pending)
+            self.pending.clear()
+
+        for request in pending:
+            request.future.set_exception(
+                ConnectionClosed("Connection closed"))
+
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+
+        if self.on_close:
+            self.on_close()
+
+
+class AsyncServer(CallbackServer):
+    """
+    Drop in replacement for CallbackServer which can also make requests over
+    the connection it uses for notifications.
+
+    request_async and request_with_results_async return Futures. request
+    and request_with_results (and so the Player methods) block until the
+    response arrives and can be called from any thread, including from
+    callbacks.
+    """
+
+    def __init__(self, timeout=REQUEST_TIMEOUT, **kwargs):
+        super(AsyncServer, self).__init__(**kwargs)
+        self.timeout = timeout
+        self.transport = None
+        self.queue = Queue()
+
+    def telnet_connect(self):
+        # Start with an empty queue so that nothing is left over from an
+        # earlier connection
+        self.queue = Queue()
+        self.transport = CLITransport(self.hostname, self.port,
+                                      charset=self.charset,
+                                      timeout=self.timeout,
+                                      on_notification=self.queue.put,
+                                      on_close=lambda: self.queue.put(None))
+        self.transport.connect()
+
+    def disconnect(self):
+        self.transport.close()
+        self.is_connected = False
+
+    def stop(self):
+        """Stops the dispatcher thread and closes the connection."""
+        self.abort = True
+        self.queue.put(STOP)
+
+    def request_async(self, command_string, preserve_encoding=False):
+        """
+        Request. Returns a Future for the result.
+        """
+        started = time()
+
+        def parse(response):
+            STATS.record("telnet " + command_key(command_string),
+                         time() - started)
+            return self.parse_response(command_string, response,
+                                       preserve_encoding)
+
+        return self.transport.send(command_string).then(parse)
+
+    def request_with_results_async(self, command_string,
+                                   preserve_encoding=False):
+        """
+        Request with results. Returns a Future for the tuple
+        (count, results, error_occurred).
+        """
+        return self.request_async(command_string, True).then(
+            lambda response: self.parse_results(response, preserve_encoding))
+
+    def request(self, command_string, preserve_encoding=False):
+        """
+        Request (blocking)
+        """
+        try:
+            return self.request_async(command_string,
+                                      preserve_encoding).result()
+        except TransportError:
+            # Behave like the telnet client which returns an empty response
+            # when it times out. A closed connection is reported to the
+            # callbacks by the dispatcher thread.
+            return self.parse_response(command_string, b"",
+                                       preserve_encoding)
+
+    def send_subscription(self, command):
+        # Callbacks can change the subscription so don't wait for the reply
+        self.request_async(command)
+
+    def run(self):
+
+        while not self.abort:
+            try:
+                self.connect()
+                self.subscribed = None
+                self.connected = True
+                self.check_event(CallbackServer.SERVER_CONNECT)
+                break
+            except:
+                sleep(5)
+
+        if self.abort:
+            return
+
+        self.update_subscription()
+
+        while not self.abort:
+            data = self.queue.get()
+
+            if data is STOP:
+                break
+
+            # A reply to a subscribe which arrived after it timed out
+            if data is not None and data.startswith(CallbackServer.ECHOES):
+                continue
+
+            # The connection has closed
+            if data is None:
+                self.connected = False
+                self.check_event(CallbackServer.SERVER_ERROR)
+                return self.run()
+
+            self.received = time()
+            self.check_event(data, self.received)
+
+        self.transport.close()
@@ -81,8 +81,9 @@ class ArtworkResolver(object):
     def getURL(self, track, size=(500, 500)):
         """Method for generating link to artwork for the selected track.
 
-          'track' is a dict object which must contain the "remote", "coverid"
-          and "coverart" tags as returned by the server.
+          'track' is a dict (or a dict-like track such as a pylms
+          PlaylistTrack) which must contain the "remote", "coverid" and
+          "coverart" tags as returned by the server.
 
           'size' is an optional parameter which can be used when creting links
           for remotely hosted images.
@@ -92,7 +93,7 @@ class ArtworkResolver(object):
         required = ["remote", "coverart"]
 
         # Check that we've received the right type of data
-        if type(track) != dict:
+        if not (hasattr(track, "get") and hasattr(track, "keys")):
             raise TypeError("track should be a dict")
 
         # Check if all the keys are present
@@ -0,0 +1,266 @@
+"""
+Push notifications from Logitech Media Server over HTTP.
+
+The server's cometd (Bayeux) endpoint on the web port pushes the result of a
+"serverstatus" or player "status" request each time it changes. The pushed
+status is complete so, unlike the telnet notifications, nothing needs to be
+requested after an event.
+
+Messages are received by long polling "/meta/connect". Subscriptions are
+sent as separate requests and their results arrive on the long poll.
+"""
+import json
+import socket
+import traceback
+import urllib2
+from itertools import count
+from threading import Thread
+from time import sleep, time
+
+from .simplelms import DETAILED_TAGS
+from ..syncgroups import SyncGroupIndex
+
+# Seconds the server may hold a long poll before replying (the server can
+# ask for a different value)
+POLL_TIMEOUT = 60
+
+# Seconds after which the server pushes a status even if it hasn't changed
+SUBSCRIBE_INTERVAL = 60
+
+# Seconds to wait before trying to connect again
+RETRY_INTERVAL = 5
+
+# Players included in the "serverstatus" subscription
+MAX_PLAYERS = 100
+
+
+class CometdError(Exception):
+    pass
+
+
+class CometdClient(Thread):
+    """
+    Receives the status of the server and of each of its players.
+
+    Takes the same callbacks as the telnet CallbackServer for SERVER_CONNECT
+    and SERVER_ERROR. SERVER_STATUS callbacks receive the "serverstatus"
+    result and PLAYER_STATUS callbacks receive a (ref, status) tuple with
+    the result of a "status" request for the player.
+
+    Every player in the server status is subscribed to automatically.
+    """
+
+    SERVER_STATUS = "serverstatus"
+    PLAYER_STATUS = "playerstatus"
+
+    SERVER_ERROR = "server_error"
+    SERVER_CONNECT = "server_connect"
+
+    def __init__(self, host="localhost", port=9000, amount=2,
+                 taglist=DETAILED_TAGS, timeout=POLL_TIMEOUT):
+        super(CometdClient, self).__init__()
+        self.url = "http://{h}:{p}/cometd".format(h=host, p=port)
+        self.amount = amount
+        self.taglist = taglist
+        self.timeout = timeout
+        self.callbacks = {}
+        self.client_id = None
+        self.ids = count(1)
+        self.players = set()
+        self.abort = False
+        self.connected = False
+        self.daemon = True
+
+        # Time the latest status was received
+        self.received = 0
+
+        # Sync groups are kept up to date from the player statuses
+        self.sync_index = SyncGroupIndex()
+
+        # Exceptions raised by callbacks are written to this logger (if
+        # it's set) so that they don't stop the client
+        self.logger = None
+
+    def add_callback(self, event, callback):
+        """Add a callback.
+
+           Takes two parameter:
+             event:    string of single event or list of events
+             callback: function to be run when the event happens
+        """
+        if type(event) == list:
+            for ev in event:
+                self.callbacks[ev] = callback
+
+        else:
+            self.callbacks[event] = callback
+
+    def remove_callback(self, event):
+        if type(event) == list:
+            for ev in event:
+                self.callbacks.pop(ev, None)
+
+        else:
+            self.callbacks.pop(event, None)
+
+    def check_event(self, event, data=None):
+        callback = self.callbacks.get(event)
+        if callback is None:
+            return
+
+        try:
+            callback(data)
+        except Exception:
+            if self.logger is not None:
+                self.logger.error(u"Callback for {} failed:\n{}".format(
+                    event, traceback.format_exc().decode("utf-8", "replace")))
+
+    def _post(self, messages, timeout):
+        req = urllib2.Request(self.url)
+        req.add_header('Content-Type', 'application/json')
+
+        try:
+            response = urllib2.urlopen(req, json.dumps(messages), timeout)
+            return json.loads(response.read())
+        except (urllib2.URLError, socket.error, ValueError) as e:
+            raise CometdError(str(e))
+
+    def _send(self, channel, timeout=10, **fields):
+        """Sends a message and returns the server's reply to it. Anything
+           else in the response is dispatched.
+        """
+        message = dict(fields, channel=channel, id=str(next(self.ids)))
+        if self.client_id:
+            message["clientId"] = self.client_id
+
+        reply = None
+        for msg in self._post([message], timeout):
+            if msg.get("channel") == channel and "data" not in msg:
+                reply = msg
+            else:
+                self._dispatch(msg)
+
+        if reply is None or not reply.get("successful"):
+            error = reply.get("error") if reply else "No reply"
+            raise CometdError("{} failed: {}".format(channel, error))
+
+        return reply
+
+    def _dispatch(self, message):
+        prefix = "/{}/slim/".format(self.client_id)
+        channel = message.get("channel", "")
+        data = message.get("data")
+
+        if data is None or not channel.startswith(prefix):
+            return
+
+        kind, _, ref = channel[len(prefix):].partition("/")
+        self.received = time()
+
+        if kind == CometdClient.SERVER_STATUS:
+            self._update_players(data)
+            self.check_event(CometdClient.SERVER_STATUS, data)
+
+        elif kind == CometdClient.PLAYER_STATUS and ref:
+            self._update_sync(ref, data)
+            self.check_event(CometdClient.PLAYER_STATUS, (ref, data))
+
+    def _slim_subscribe(self, player, command, response):
+        command = command + ["subscribe:{}".format(SUBSCRIBE_INTERVAL)]
+        self._send("/slim/subscribe",
+                   data={"request": [player, command],
+                         "response": "/{}/slim/{}".format(self.client_id,
+                                                          response),
+                         "priority": ""})
+
+    def subscribe_player(self, ref):
+        tags = "tags:{}".format("".join(self.taglist))
+        self._slim_subscribe(ref, ["status", "-", self.amount, tags],
+                             "{}/{}".format(CometdClient.PLAYER_STATUS, ref))
+        self.players.add(ref)
+
+    def unsubscribe_player(self, ref):
+        self.players.discard(ref)
+        self._send("/slim/unsubscribe",
+                   data={"unsubscribe": "/{}/slim/{}/{}".format(
+                       self.client_id, CometdClient.PLAYER_STATUS, ref)})
+
+    def _update_players(self, status):
+        """Subscribes to players which have appeared in the server status
+           and unsubscribes from players which have gone.
+        """
+        refs = set(p.get("playerid") for p in status.get("players_loop", [])
+                   if p.get("playerid"))
+
+        for ref in self.players - refs:
+            self.unsubscribe_player(ref)
+
+        for ref in refs - self.players:
+            self.subscribe_player(ref)
+
+    def _update_sync(self, ref, status):
+        master = status.get("sync_master")
+        if master:
+            for slave in status.get("sync_slaves", "").split(","):
+                if slave:
+                    self.sync_index.sync(master, slave)
+        else:
+            self.sync_index.unsync(ref)
+
+    def handshake(self):
+        self.client_id = None
+        self.players = set()
+
+        reply = self._send("/meta/handshake", version="1.0",
+                           supportedConnectionTypes=["long-polling"])
+        self.client_id = reply.get("clientId")
+        if not self.client_id:
+            raise CometdError("No client id in handshake")
+
+        timeout = reply.get("advice", {}).get("timeout")
+        if timeout:
+            self.timeout = timeout / 1000.0
+
+        self._send("/meta/subscribe",
+                   subscription="/{}/**".format(self.client_id))
+        self._slim_subscribe("", [CometdClient.SERVER_STATUS, 0,
+                                  MAX_PLAYERS],
+                             CometdClient.SERVER_STATUS)
+
+    def poll(self):
+        """Waits for the server to push the next messages."""
+        self._send("/meta/connect", timeout=self.timeout + 10,
+                   connectionType="long-polling")
+
+    def disconnect(self):
+        """Ends the session. The long poll returns straight away."""
+        self.abort = True
+        try:
+            self._post([{"channel": "/meta/disconnect",
+                         "clientId": self.client_id}], 2)
+        except CometdError:
+            pass
+
+    def run(self):
+
+        while not self.abort:
+            try:
+                self.handshake()
+            except CometdError:
+                sleep(RETRY_INTERVAL)
+                continue
+
+            self.connected = True
+            self.check_event(CometdClient.SERVER_CONNECT)
+
+            try:
+                while not self.abort:
+                    self.poll()
+
+            # Server is unavailable or has forgotten us so start again
+            except CometdError:
+                pass
+
+            self.connected = False
+            if not self.abort:
+                self.check_event(CometdClient.SERVER_ERROR)
@@ -1,26 +1,204 @@
 import json
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+from time import sleep, time
 
-from menuitems import (NextMenuItem,
+from ..stats import STATS
+from menuitems import (MENU_PAGE_SIZE,
+                       NextMenuItem,
                        PlaylistMenuItem,
                        SearchMenuItem,
                        AudioMenuItem)
 
 CUSTOM_MENU = "customhomemenu.json"
 
+# Number of menu responses to keep and how long (in seconds) they stay valid
+MENU_CACHE_SIZE = 50
+MENU_CACHE_AGE = 300
+
+# Seconds the selection has to stay on an item before its submenu is
+# prefetched
+PREFETCH_DELAY = 0.15
+
+
+class MenuCache(object):
+    """Small LRU cache for raw menu responses.
+
+       Entries are keyed by player ref and menu command and are discarded
+       once they are older than 'max_age' seconds.
+    """
+    def __init__(self, size=MENU_CACHE_SIZE, max_age=MENU_CACHE_AGE):
+        self.size = size
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def key(self, player, menucmd):
+        if isinstance(menucmd, basestring):
+            menucmd = menucmd.split()
+        return (str(player.ref), tuple(unicode(x) for x in menucmd))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+
+            stamp, value = entry
+            if time() - stamp > self.max_age:
+                return None
+
+            # Re-insert so the entry becomes the most recently used
+            self.entries[key] = entry
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time(), value)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class MenuPrefetcher(object):
+    """Fetches menus into the cache on a single background thread.
+
+       Only the most recent request is kept, and it's only fetched once no
+       other request has arrived for 'delay' seconds, so scrolling through a
+       menu doesn't start a request for every item passed.
+    """
+    def __init__(self, cache, delay=PREFETCH_DELAY):
+        self.cache = cache
+        self.delay = delay
+        self.lock = Lock()
+        self.wake = Event()
+        self.latest = None
+        self.thread = None
+
+    def request(self, handler, menucmd):
+        """Prefetches 'menucmd' (or the command returned by calling it)
+           with 'handler'.
+        """
+        with self.lock:
+            self.latest = (handler, menucmd)
+            if self.thread is None:
+                self.thread = Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+        self.wake.set()
+
+    def _take(self):
+        """Waits for the requests to stop and returns the latest."""
+        self.wake.wait()
+        while True:
+            self.wake.clear()
+            sleep(self.delay)
+            if not self.wake.is_set():
+                break
+
+        with self.lock:
+            job, self.latest = self.latest, None
+        return job
+
+    def _run(self):
+
+        while True:
+            job = self._take()
+            if job is None:
+                continue
+
+            handler, menucmd = job
+            try:
+                if callable(menucmd):
+                    menucmd = menucmd()
+                if menucmd:
+                    handler.fetch(menucmd)
+            except:
+                pass
+
+
 class LMSMenuHandler(object):
 
-    def __init__(self, player):
+    # Shared by all handlers so that the cache survives between menus
+    cache = MenuCache()
+    prefetcher = MenuPrefetcher(cache)
+
+    def __init__(self, player, page_size=MENU_PAGE_SIZE):
         self.player = player
-        self.rootmenu = ["menu", "items", 0, 1000, "direct:1"]
+        self.page_size = page_size
+        self.count = 0
+        self.base = None
+        self.rootmenu = ["menu", "items", 0, page_size, "direct:1"]
+
+    def _request(self, menucmd, use_cache=True):
+        key = self.cache.key(self.player, menucmd)
+
+        result = self.cache.get(key) if use_cache else None
+
+        if result is not None:
+            STATS.hit("menu")
+        else:
+            STATS.miss("menu")
+            result = self.player.request(menucmd)
+            if result is not None:
+                self.cache.put(key, result)
 
-    def _request(self, menucmd):
-        self.result = self.player.request(menucmd)
+        self.result = result
         return self.result
 
+    def prefetch(self, menucmd):
+        """Retrieves a menu in the background so that it is already cached
+           when the user selects it.
+
+           'menucmd' can be a function returning the command, which is called
+           once the selection has settled.
+        """
+        if menucmd:
+            self.prefetcher.request(self, menucmd)
+
+    def fetch(self, menucmd):
+        """Puts the first page of a menu in the cache if it isn't there."""
+        menucmd = self.set_range(menucmd, 0, self.page_size)
+        key = self.cache.key(self.player, menucmd)
+        if self.cache.get(key) is not None:
+            return
+
+        result = self.player.request(menucmd)
+        if result is not None:
+            self.cache.put(key, result)
+
     def changePlayer(self, player):
         self.player = player
 
+    def set_range(self, menucmd, start, count):
+        """Returns a copy of the menu command requesting 'count' items from
+           position 'start'.
+        """
+        if isinstance(menucmd, basestring):
+            menucmd = menucmd.split()
+
+        cmd = list(menucmd)
+
+        try:
+            idx = cmd.index("items")
+        except ValueError:
+            return cmd
+
+        # Replace the existing range if there is one, otherwise add it
+        if (len(cmd) > idx + 2 and str(cmd[idx+1]).isdigit()
+                and str(cmd[idx+2]).isdigit()):
+            cmd[idx+1:idx+3] = [start, count]
+        else:
+            cmd[idx+1:idx+1] = [start, count]
+
+        return cmd
+
     def getCustomMenu(self, raw):
+        self.count = int(raw.get("count", len(raw.get("item_loop", []))))
         processed = self._process_menu(raw)
         return processed
 
@@ -35,8 +213,28 @@ class LMSMenuHandler(object):
             json.dump(menu, dumpfile, indent=4)
 
     def getMenu(self, menucmd):
+        """Returns the first page of the menu. The total number of items
+           available on the server is stored in self.count.
+        """
+        self.base = None
+        return self.getMenuPage(menucmd, start=0)
+
+    def getMenuPage(self, menucmd, start=0, count=None):
+        """Returns 'count' items of the menu, starting at 'start'."""
+        if count is None:
+            count = self.page_size
+
+        raw = self._request(self.set_range(menucmd, start, count))
+
+        try:
+            self.count = int(raw.get("count", 0))
+        except (TypeError, ValueError):
+            self.count = 0
+
+        # The base actions are needed for items on any page
+        if self.base is None:
+            self.base = raw.get("base", None)
 
-        raw = self._request(menucmd)
         processed = self._process_menu(raw)
 
         return processed
@@ -44,20 +242,21 @@ class LMSMenuHandler(object):
     def _process_menu(self, raw_menu):
 
         processed = []
+        base = raw_menu.get("base", self.base)
 
-        for item in raw_menu.get("item_loop"):
+        for item in raw_menu.get("item_loop", []):
 
             menutype = item.get("type")
             style = item.get("style")
 
             kwargs = {"player": self.player,
                       "menuitem": item,
-                      "base": raw_menu.get("base", None)}
+                      "base": base}
 
             if menutype == "audio" or (menutype == "link" and style == "itemplay"):
                 entry = AudioMenuItem(**kwargs)
 
-            elif menutype == "playlist" or self.is_playable(item, raw_menu.get("base")):
+            elif menutype == "playlist" or self.is_playable(item, base):
                 entry = PlaylistMenuItem(**kwargs)
 
             elif menutype == "search":
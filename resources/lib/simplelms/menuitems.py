@@ -1,35 +1,56 @@
 import json
 
+# Number of menu items requested from the server in one go
+MENU_PAGE_SIZE = 50
+
 
 def menu_type(menu):
+    """Returns the type of menu item ("audio", "playlist", "search" or
+       "menu"). The type is fixed when the item is created.
+    """
+    return menu.menutype
 
-    if isinstance(menu, AudioMenuItem):
-        return "audio"
-    elif isinstance(menu, PlaylistMenuItem):
-        return "playlist"
-    elif isinstance(menu, SearchMenuItem):
-        return "search"
-    else:
-        return "menu"
 
 class LMSMenuItemBase(object):
+    """Lightweight wrapper around a menu item returned by the server.
+
+       The icon, command and command strings are only built when they're
+       first requested and are then stored on the item. The command strings
+       share one dict which isn't created until the first is built.
+    """
+    __slots__ = ("player", "menuitem", "base", "text", "_icon", "_cmd",
+                 "_cmds")
+
+    menutype = "menu"
 
     def __init__(self, player=None, menuitem=None, base=None):
 
         self.player = player
-        self.text = None
-        self.cmd = None
-        self.icon = None
-        self.action = None
         self.base = base
         self.menuitem = menuitem
-        self.params = []
-        self._process_item(menuitem)
-
-    def _process_item(self, menuitem):
-
         self.text = menuitem.get("text", "")
-        self.icon = self._get_icon(menuitem)
+        self._icon = None
+        self._cmd = None
+        self._cmds = None
+
+    def _cmd_string(self, name, builder):
+        """Returns the command string stored as 'name', calling 'builder' to
+           create it the first time.
+        """
+        if self._cmds is None:
+            self._cmds = {}
+
+        try:
+            return self._cmds[name]
+        except KeyError:
+            value = self._cmds[name] = builder()
+            return value
+
+    @property
+    def icon(self):
+        if self._icon is None:
+            self._icon = self._get_icon(self.menuitem)
+        return self._icon
 
     def _get_icon(self, menuitem):
 
@@ -61,7 +82,7 @@ class LMSMenuItemBase(object):
             cmd = act["cmd"] + self.format_dict_cmd(act.get("params", dict()))
             try:
                 idx = cmd.index("items")
-                cmd.insert(idx+1, 1000)
+                cmd.insert(idx+1, MENU_PAGE_SIZE)
                 cmd.insert(idx+1, 0)
             except ValueError:
                 pass
@@ -73,30 +94,36 @@ class LMSMenuItemBase(object):
     def _list_to_str(self, cmdlist):
         return " ".join(str(x) for x in cmdlist)
 
+    @property
+    def cmd(self):
+        return None
+
     @property
     def cmdstring(self):
-        if type(self.cmd) == list:
-            return " ".join(str(x) for x in self.cmd)
+        cmd = self.cmd
+        if type(cmd) == list:
+            return self._cmd_string("cmdstring",
+                                    lambda: self._list_to_str(cmd))
         else:
             return None
 
+
 class NextMenuItem(LMSMenuItemBase):
 
-    def __init__(self, player=None, menuitem=None, base=None):
-        super(NextMenuItem, self).__init__(player=player,
-                                           menuitem=menuitem,
-                                           base=base)
-        self.cmd = self.build_cmd(menuitem)
+    __slots__ = ()
+
+    @property
+    def cmd(self):
+        if self._cmd is None:
+            self._cmd = self.build_cmd(self.menuitem)
+        return self._cmd
 
 
 class SearchMenuItem(LMSMenuItemBase):
 
-    def __init__(self, player=None, menuitem=None, base=None):
-        super(SearchMenuItem, self).__init__(player=player,
-                                             menuitem=menuitem,
-                                             base=base)
-        self.search_text = None
+    __slots__ = ()
 
+    menutype = "search"
 
     def search(self, query):
         cmd = self.build_cmd(self.menuitem)
@@ -106,10 +133,17 @@ class SearchMenuItem(LMSMenuItemBase):
 
     @property
     def cmd_search(self):
-        return self._list_to_str(self.build_cmd(self.menuitem))
+        return self._cmd_string("search",
+                                lambda: self._list_to_str(
+                                    self.build_cmd(self.menuitem)))
+
 
 class PlaylistMenuItem(LMSMenuItemBase):
 
+    __slots__ = ()
+
+    menutype = "playlist"
+
     def cmd_from_action(self, mode):
         cmd = []
 
@@ -130,6 +164,11 @@ class PlaylistMenuItem(LMSMenuItemBase):
 
         return cmd
 
+    def _action_str(self, mode):
+        return self._cmd_string(mode,
+                                lambda: self._list_to_str(
+                                    self.cmd_from_action(mode)))
+
     def play(self):
         cmd = self.cmd_play
         self.player.request(cmd)
@@ -147,23 +186,23 @@ class PlaylistMenuItem(LMSMenuItemBase):
 
     @property
     def cmd_play(self):
-        return self._list_to_str(self.cmd_from_action("play"))
+        return self._action_str("play")
 
     @property
     def cmd_play_next(self):
-        return self._list_to_str(self.cmd_from_action("add-hold"))
+        return self._action_str("add-hold")
 
     @property
     def cmd_add(self):
-        cmd = self.cmd_from_action("add")
-        #cmd += self.format_dict_cmd(self.menuitem["params"])
-        return self._list_to_str(cmd)
+        return self._action_str("add")
 
     @property
     def show_items_cmd(self):
-        cmd = self.go()
-        return " ".join(str(x) for x in cmd)
+        return self._action_str("go")
 
 
 class AudioMenuItem(PlaylistMenuItem):
-    pass
+
+    __slots__ = ()
+
+    menutype = "audio"
@@ -4,9 +4,18 @@ This code uses the JSON interface.
 """
 import urllib2
 import json
+import socket
+from time import time
+
+from ..playliststore import PlaylistStore, PAGE_SIZE
+from ..stats import STATS, command_key
+from ..syncgroups import SyncGroupIndex
 
 DETAILED_TAGS = ["a", "c", "d", "j", "K", "l", "x"]
 
+# Seconds to wait for the server to answer a request
+REQUEST_TIMEOUT = 15
+
 
 class LMSConnectionError(Exception):
     pass
@@ -14,10 +23,16 @@ class LMSConnectionError(Exception):
 
 class LMSPlayer(object):
 
-    def __init__(self, ref, server):
+    def __init__(self, ref, server, name=None):
         self.server = server
         self.ref = ref
-        self.update()
+
+        # A player can be created without contacting the server if we
+        # already know its name
+        if name is None:
+            self.update()
+        else:
+            self.name = name
 
     @classmethod
     def from_index(cls, index, server):
@@ -31,7 +46,7 @@ class LMSPlayer(object):
         try:
             return self.ref == other.ref
         except AttributeError:
-            if type(other) == str:
+            if isinstance(other, basestring):
                 return self.ref == other
             else:
                 return False
@@ -155,18 +170,55 @@ class LMSPlayer(object):
 
     def playlist_get_info(self, taglist=None, start=None, amount=None):
         """Get info about the tracks in the current playlist"""
+        return list(self.playlist_iter_info(taglist=taglist, start=start,
+                                            amount=amount))
+
+    def playlist_iter_info(self, taglist=None, start=None, amount=None,
+                           page_size=None):
+        """Generator of the tracks in the current playlist. If page_size is
+        set, the tracks are requested in pages so that only one page of
+        responses is held at a time"""
         if amount is None:
             amount = self.playlist_track_count()
 
         if start is None:
             start = 0
 
+        page_size = page_size or amount
         tags = " tags:{}".format(",".join(taglist)) if taglist else ""
-        response = self.request('status %i %i %s' % (start, amount, tags))
-        try:
-            return response["playlist_loop"]
-        except:
-            return []
+        end = start + amount
+
+        while start < end:
+            count = min(page_size, end - start)
+            response = self.request('status %i %i %s' % (start, count, tags))
+            try:
+                tracks = response["playlist_loop"]
+            except:
+                tracks = []
+
+            for track in tracks:
+                yield track
+
+            # Stop at the end of the playlist
+            if len(tracks) < count:
+                break
+
+            start += count
+
+    def playlist_get_store(self, taglist=DETAILED_TAGS, start=None,
+                           amount=None, page_size=PAGE_SIZE):
+        """Get the tracks in the current playlist as a PlaylistStore"""
+        store = PlaylistStore(start or 0)
+        store.extend(self.playlist_iter_info(taglist=taglist, start=start,
+                                             amount=amount,
+                                             page_size=page_size))
+        return store
+
+    def get_status(self, amount=2, taglist=DETAILED_TAGS):
+        """Get the mode, volume, progress and the current (and following)
+        tracks in a single request"""
+        tags = " tags:{}".format(",".join(taglist)) if taglist else ""
+        return self.request("status - {}{}".format(amount, tags)) or {}
 
     def get_volume(self):
         """Get Player Volume"""
@@ -202,13 +254,18 @@ class LMSServer(object):
     Provides access to JSON interface.
     """
 
-    def __init__(self, host="localhost", port=9000):
+    def __init__(self, host="localhost", port=9000, timeout=REQUEST_TIMEOUT):
         self.host = host
         self.port = port
+        self.timeout = timeout
         self.id = 1
         self.web = "http://{h}:{p}/".format(h=host, p=port)
         self.url = "http://{h}:{p}/jsonrpc.js".format(h=host, p=port)
 
+        # Sync groups are only requested once and then kept up to date from
+        # notifications
+        self.sync_index = SyncGroupIndex()
+
     def request(self, player="-", params=None):
         """
         Send JSON request to server.
@@ -225,17 +282,26 @@ class LMSServer(object):
                 "method": "slim.request",
                 "params": cmd}
 
+        start = time()
+
         try:
-            response = urllib2.urlopen(req, json.dumps(data))
+            response = urllib2.urlopen(req, json.dumps(data), self.timeout)
             self.id += 1
             return json.loads(response.read())["result"]
 
         except urllib2.URLError:
             raise LMSConnectionError("Could not connect to server.")
 
+        # A stalled server times out while the response is being read
+        except socket.error:
+            raise LMSConnectionError("No response from server.")
+
         except:
             return None
 
+        finally:
+            STATS.record("jsonrpc " + command_key(params), time() - start)
+
     def get_players(self):
         self.players = []
         player_count = self.get_player_count()
@@ -252,10 +318,12 @@ class LMSServer(object):
 
         return count
 
-    def get_sync_groups(self):
-        groups = self.request(params="syncgroups ?")
-        syncgroups = [x.get("sync_members","").split(",") for x in groups.get("syncgroups_loop",dict())]
-        return syncgroups
+    def get_sync_groups(self, refresh=False):
+        if refresh or not self.sync_index.loaded:
+            groups = self.request(params="syncgroups ?")
+            syncgroups = [x.get("sync_members","").split(",") for x in groups.get("syncgroups_loop",dict())]
+            self.sync_index.set_groups(syncgroups)
+        return self.sync_index.groups
 
     def ping(self):
 
@@ -0,0 +1,121 @@
+"""Saves enough of the window's state to draw it straight away the next time
+   it's opened. The window then updates itself from the server as normal.
+"""
+import json
+from threading import Lock, Timer
+
+# Increase this if the format changes so that old snapshots are ignored
+VERSION = 1
+
+# Minimum time (in seconds) between writes while the window is open
+SAVE_INTERVAL = 5
+
+
+class Snapshot(object):
+    """Stores the last player, the player list, sync groups and some window
+       properties for a server.
+
+       Changes are written to 'path' at most once every 'interval' seconds.
+       save() writes any changes immediately.
+    """
+
+    def __init__(self, path, server, interval=SAVE_INTERVAL):
+        self.path = path
+        self.server = server
+        self.interval = interval
+        self.lock = Lock()
+        self.timer = None
+        self.dirty = False
+        self.data = {"version": VERSION,
+                     "server": server,
+                     "player": None,
+                     "players": [],
+                     "sync_groups": [],
+                     "properties": {}}
+
+    def load(self):
+        """Reads the snapshot. Returns False if there isn't a usable
+           snapshot for this server.
+        """
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+
+        if (not isinstance(data, dict) or data.get("version") != VERSION
+                or data.get("server") != self.server):
+            return False
+
+        with self.lock:
+            self.data.update(data)
+
+        return True
+
+    @property
+    def player(self):
+        return self.data["player"]
+
+    @property
+    def players(self):
+        """List of (ref, name) tuples."""
+        return [(p["ref"], p["name"]) for p in self.data["players"]]
+
+    @property
+    def sync_groups(self):
+        return self.data["sync_groups"]
+
+    @property
+    def properties(self):
+        return self.data["properties"]
+
+    def set_players(self, players, current):
+        self.update(players=[{"ref": str(p.ref), "name": p.name}
+                             for p in players],
+                    player=current)
+
+    def set_property(self, propname, value):
+        """Stores a window property. A value of None removes it."""
+        with self.lock:
+            props = self.data["properties"]
+            if props.get(propname) == value:
+                return
+            if value is None:
+                props.pop(propname, None)
+            else:
+                props[propname] = value
+        self._changed()
+
+    def update(self, **values):
+        with self.lock:
+            if all(self.data.get(k) == v for k, v in values.items()):
+                return
+            self.data.update(values)
+        self._changed()
+
+    def _changed(self):
+        with self.lock:
+            self.dirty = True
+            if self.timer is None:
+                self.timer = Timer(self.interval, self.save)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def save(self):
+        """Writes the snapshot if it has changed."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            if not self.dirty:
+                return
+
+            text = json.dumps(self.data)
+            self.dirty = False
+
+        try:
+            with open(self.path, "w") as f:
+                f.write(text)
+        except (IOError, OSError):
+            pass
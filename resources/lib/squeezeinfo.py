@@ -7,17 +7,21 @@ from urllib import quote_plus
 import xbmc, xbmcgui, xbmcaddon
 from kodi65.actionhandler import ActionHandler
 
+from .commandqueue import CommandQueue
 from .customhomemenu import CUSTOM_MENU
-from .image_cache import ImageCache
-from .pylms.callbackserver import CallbackServer
+from .logger import Logger
+from .playerstate import PlayerStateStore
+from .profiler import Profiler
+from .propertystore import PropertyStore
+from .snapshot import Snapshot
+from .stats import STATS
+from .tasks import TaskGraph
+from .volume import VolumeController
 from .simplelms.artworkresolver import ArtworkResolver
-from .simplelms.simplelms import LMSServer
+from .simplelms.simplelms import LMSServer, LMSPlayer
 from .simplelms.menu import LMSMenuHandler
 from .simplelms.menuitems import menu_type as lms_menu_type
 
-# Debugging level
-DEBUG_LEVEL = xbmc.LOGDEBUG
-
 # Initialise addon and get some basic info
 _A_ = xbmcaddon.Addon()
 _S_ = _A_.getSetting
@@ -29,12 +33,75 @@ ADDON_PROFILE = xbmc.translatePath(_A_.getAddonInfo('profile')).decode('utf-8')
 LMS_SERVER = _S_("server_ip")
 LMS_TELNET = int(_S_("telnet_port"))
 LMS_WEB = int(_S_("web_port"))
+USE_COMETD = _S_("use_cometd") == "true"
+SHOW_STATS = _S_("stats_properties") == "true"
+PROFILING = _S_("profiling") == "true"
+PROFILE_DURATION = int(_S_("profile_duration") or 60)
 
 # Define some paths and variable names for our images
 CACHE_PATH = os.path.join(ADDON_PROFILE, "cache")
 IMG_BACKGROUND = "backgrounds"
 IMG_ICON = "icons"
 IMG_PROGRESS = "swatch"
+STATS_FILE = os.path.join(ADDON_PROFILE, "stats.json")
+PROFILE_PATH = os.path.join(ADDON_PROFILE, "profiles")
+SNAPSHOT_FILE = os.path.join(ADDON_PROFILE, "snapshot.json")
+
+# Change in volume for each press of the volume keys
+VOLUME_STEP = 5
+
+# Properties which are changed before the server confirms a change of track
+# and put back if the command fails
+NOW_PLAYING_PROPERTIES = ["SQUEEZEINFO_NP_TITLE",
+                          "SQUEEZEINFO_NP_ARTIST",
+                          "SQUEEZEINFO_NP_ALBUM",
+                          "SQUEEZEINFO_NP_BACKGROUND",
+                          "SQUEEZEINFO_NP_ICON",
+                          "SQUEEZEINFO_CURRENT_TRACK"]
+
+# Properties which are saved so that the window can be drawn straight away
+# the next time it's opened
+SNAPSHOT_PROPERTIES = ["SQUEEZEINFO_HAS_PLAYER",
+                       "SQUEEZEINFO_PLAYER_NAME",
+                       "SQUEEZEINFO_PLAYER_VOLUME",
+                       "SQUEEZEINFO_HAS_PLAYLIST",
+                       "SQUEEZEINFO_HAS_NEXT_TRACK",
+                       "SQUEEZEINFO_CURRENT_TRACK",
+                       "SQUEEZEINFO_NP_TITLE",
+                       "SQUEEZEINFO_NP_ARTIST",
+                       "SQUEEZEINFO_NP_ALBUM",
+                       "SQUEEZEINFO_NP_BACKGROUND",
+                       "SQUEEZEINFO_NP_ICON",
+                       "SQUEEZEINFO_NEXT_TITLE",
+                       "SQUEEZEINFO_NEXT_ARTIST",
+                       "SQUEEZEINFO_NEXT_ALBUM",
+                       "SQUEEZEINFO_NEXT_ICON"]
+
+# Notification callbacks as (event, method) pairs. The events are names of
+# CallbackServer and CometdClient attributes.
+TELNET_CALLBACKS = [("PLAYLIST_CHANGED", "playlist_changed"),
+                    ("PLAYLIST_CHANGE_TRACK", "track_changed"),
+                    ("SERVER_ERROR", "no_server"),
+                    ("SERVER_CONNECT", "server_connect"),
+                    ("VOLUME_CHANGE", "vol_change"),
+                    ("PLAY_PAUSE", "play_pause"),
+                    ("CLIENT_ALL", "client_change"),
+                    ("PLAYLIST_STOP", "player_stopped"),
+                    ("SYNC", "sync_changed")]
+
+COMETD_CALLBACKS = [("SERVER_ERROR", "no_server"),
+                    ("SERVER_CONNECT", "server_connect"),
+                    ("SERVER_STATUS", "server_status"),
+                    ("PLAYER_STATUS", "player_status")]
+
+# Methods which are profiled when profiling is switched on: every callback
+# and the progress loop
+PROFILED_METHODS = sorted(set(name for _, name in
+                              TELNET_CALLBACKS + COMETD_CALLBACKS))
+PROFILED_METHODS.append("progress_step")
+
+# How often (in progress bar cycles) the statistics are saved
+STATS_INTERVAL = 240
 
 CONTROL_DEFAULT = 10
 CONTROL_PLAYLIST = 50
@@ -56,6 +123,9 @@ SUBMENUS = {CONTROL_AUDIO_SUBMENU:
                 [("Search", "search")]
             }
 
+# Load the next page of a menu when the selection is this close to the end
+MENU_PAGE_MARGIN = 10
+
 PLAYER_CONTROLS = [("previous", "Previous Track"),
                    ("playpause", "Play/Pause"),
                    ("stop", "Stop"),
@@ -66,18 +136,9 @@ PLAYER_CONTROLS = [("previous", "Previous Track"),
 ch = ActionHandler()
 
 
-def debug(message, level=DEBUG_LEVEL):
-    """Basic debug function for outputting info to the log.
-
-      Should not use anything higher than debug to avoid spamming the logfile.
-    """
-    # Make sure encoding is ok for log file
-    if isinstance (message, str):
-        message = message.decode("utf-8")
-
-    # Format the message and send to the logfile
-    message = u"{}: {}".format(ADDON_ID, message)
-    xbmc.log(msg=message.encode("utf-8"), level=level)
+# Debug messages are only formatted if debug logging is enabled
+LOG = Logger(ADDON_ID)
+debug = LOG.debug
 
 
 class SqueezeInfo(xbmcgui.WindowXML):
@@ -102,9 +163,37 @@ class SqueezeInfo(xbmcgui.WindowXML):
         self.show_playlist = False
         self.show_menu = False
         self.menu_history = []
+        self.menu_handler = None
+        self.menu_cmd = None
+        self.menu_loaded = 0
+
+        # Increased each time the menu is replaced so that pages loaded for
+        # an earlier menu (even one with the same command) are thrown away
+        self.menu_generation = 0
+        self.menu_lock = Lock()
         self.server_connected = False
         self.has_playlist = False
+        self.playlist = None
+
+        # Player whose tracks are in self.playlist, and the last playlist
+        # timestamp pushed by the cometd client for the current player
+        self.playlist_ref = None
+        self.playlist_stamp = None
         self.has_player = False
+        self.now_playing = None
+        self.players_lock = Lock()
+        self.startup = None
+
+        # State of every player so that we can switch players without
+        # waiting for the server
+        self.states = PlayerStateStore()
+
+        # Volume changes are shown straight away and sent in the background
+        self.volume_control = VolumeController()
+
+        # Player commands are sent in the background so that the remote
+        # doesn't wait for the server
+        self.commands = CommandQueue()
 
 
         # Set the location of the server
@@ -112,44 +201,140 @@ class SqueezeInfo(xbmcgui.WindowXML):
         self.telnet_port = LMS_TELNET
         self.web_port = LMS_WEB
 
+        # Last known state of the window for this server
+        self.snapshot = Snapshot(SNAPSHOT_FILE,
+                                 "{}:{}".format(self.hostname, self.web_port))
+
         # Get a basic server object for retrieving data
         self.cmdserver = LMSServer(host=self.hostname, port=self.web_port)
 
+        # Index of the sync groups. This is shared with the callback server
+        # which keeps it up to date.
+        self.sync_index = self.cmdserver.sync_index
+
         # Get the artwwork resolver to create urls for now playing tracks
         # The ImageCache processes images and saves to userdata folder
-        debug("Creating artwork resolver and cache")
+        # The image cache (and PIL) is only loaded when it's first used
+        debug("Creating artwork resolver")
         self.awr = ArtworkResolver(host=self.hostname, port=self.web_port)
-        self.cache = ImageCache()
+        self._cache = None
+
+        # The callback server is started once the window has been drawn
+        self.cbserver = None
+
+        # Wrap the hot paths if profiling has been switched on in the settings
+        self.profiler = None
+        if PROFILING:
+            self.start_profiler()
+
+    @property
+    def cache(self):
+        """The image cache. Created on first use as it imports PIL."""
+        if self._cache is None:
+            debug("Creating image cache")
+            from .image_cache import ImageCache
+            cache = ImageCache()
+
+            if self.profiler:
+                for name in ["getCachedImage", "save_images"]:
+                    setattr(cache, name,
+                            self.profiler.wrap(name, getattr(cache, name)))
+
+            self._cache = cache
+
+        return self._cache
+
+    def start_listener(self):
+        """Creates and starts the callback server which receives
+           asynchronous announcements from the server. Its connection can
+           also be used for requests.
+        """
+        if USE_COMETD:
+            return self.start_cometd_listener()
+
+        from .pylms.callbackserver import CallbackServer
+        from .pylms.transport import AsyncServer
 
-        # Create a callback server to receive asynchronous announcements from
-        # the server
         debug("Creating callback server")
-        self.cbserver = CallbackServer(hostname=self.hostname,
-                                       port=self.telnet_port)
+        self.cbserver = AsyncServer(hostname=self.hostname,
+                                    port=self.telnet_port)
         self.cbserver.daemon = True
+        self.cbserver.sync_index = self.sync_index
+        self.cbserver.logger = LOG
 
         # Define the events that we want to listen for and assign callbacks
         debug("Adding callbacks")
-        self.cbserver.add_callback(CallbackServer.PLAYLIST_CHANGED,
-                                   callback=self.track_changed)
-        self.cbserver.add_callback(CallbackServer.PLAYLIST_CHANGE_TRACK,
-                                   callback=self.track_changed)
-        self.cbserver.add_callback(CallbackServer.SERVER_ERROR,
-                                   callback=self.no_server)
-        self.cbserver.add_callback(CallbackServer.SERVER_CONNECT,
-                                   callback=self.server_connect)
-        self.cbserver.add_callback(CallbackServer.VOLUME_CHANGE,
-                                   callback=self.vol_change)
-        self.cbserver.add_callback(CallbackServer.PLAY_PAUSE,
-                                   callback=self.play_pause)
-        self.cbserver.add_callback(CallbackServer.CLIENT_ALL,
-                                   callback=self.client_change)
+        self.add_callbacks(CallbackServer, TELNET_CALLBACKS)
+
+        self.cbserver.start()
+
+    def start_cometd_listener(self):
+        """Creates and starts a cometd client which receives the status of
+           the server and every player over the web port, so the telnet
+           port isn't needed.
+        """
+        from .simplelms.cometd import CometdClient
+
+        debug("Creating cometd client")
+        self.cbserver = CometdClient(host=self.hostname, port=self.web_port)
+        self.cbserver.sync_index = self.sync_index
+        self.cbserver.logger = LOG
+
+        debug("Adding callbacks")
+        self.add_callbacks(CometdClient, COMETD_CALLBACKS)
+
+        self.cbserver.start()
+
+    def add_callbacks(self, client, callbacks):
+        """Registers each (event, method) pair in 'callbacks' with the
+           listener. 'client' is the listener's class, which defines the
+           events.
+        """
+        for event, name in callbacks:
+            callback = self.timed(getattr(self, name))
+            self.cbserver.add_callback(getattr(client, event),
+                                       callback=callback)
+
+    def start_profiler(self):
+        """Wraps the callbacks and progress loop (and the image cache when
+           it's created) so that they are profiled for PROFILE_DURATION
+           seconds.
+        """
+        debug("Profiling for {} seconds", PROFILE_DURATION)
+        self.profiler = Profiler(PROFILE_PATH, duration=PROFILE_DURATION)
+
+        for name in PROFILED_METHODS:
+            setattr(self, name, self.profiler.wrap(name, getattr(self, name)))
+
+        self.profiler.start()
+
+    def timed(self, callback):
+        """Wraps a callback so that the time from the notification being
+           received to the last window property set by the callback is
+           recorded. Nothing is recorded if the callback doesn't change the
+           window.
+        """
+        def timed_callback(event=None):
+            # Cometd statuses don't carry their receive time but they're
+            # passed on by the thread which has just set it
+            if hasattr(event, "received"):
+                received = event.received
+            else:
+                received = self.cbserver.received
+            before = self.properties.thread_last_write()
+            callback(event)
+            written = self.properties.thread_last_write()
+            if received and written != before and written >= received:
+                STATS.record("event to screen", written - received)
+
+        return timed_callback
 
     def onInit(self):
         # Once window has been initialised we can start setting properties
         debug("OnInit called")
         debug("OnInit - Setting windowID and properties")
         self.windowID = xbmcgui.getCurrentWindowId()
+        self.properties = PropertyStore(self.windowID)
         self.setProperty("SQUEEZEINFO_SERVER_CONNECTED", "true")
         self.setProperty("SQUEEZEINFO_HAS_PLAYER", "false")
         self.setProperty("SQUEEZEINFO_HAS_NEXT_TRACK", "false")
@@ -173,36 +358,9 @@ class SqueezeInfo(xbmcgui.WindowXML):
         self.build_player_controls()
         # self.submenubox.setVisibleCondition("String.IsEqual(Container(101).ListItem(0).Property(showsubmenu),true)")
 
-        # Let's see if the server is working
-        debug("OnInit - Getting server")
-        self.get_server()
-
-        # If the server's available then we need to see if there are any
-        # squeezeplayers
-        if self.server_connected:
-            debug("OnInit - getting players")
-            self.get_squeeze_players()
-        else:
-            debug("OnInit - no players")
-
-        # ...and if we've got a player then we should get the metadata
-        if self.player:
-            debug("Player found: get track info.")
-            self.get_info()
-
-            # Check if track is playing
-            debug("OnInit - getting player state")
-            try:
-
-                self.playing = self.player.get_mode() == "play"
-                debug("OnInit - player status: {}".format(self.playing))
-            except:
-                debug("OnInit - player state error - setting as False")
-                self.playing = False
-
         # Get the progress bar control reference
         self.progress = self.getControl(41)
-        debug("OnInit - Progress control: {}".format(self.progress))
+        debug("OnInit - Progress control: {}", self.progress)
         debug("OnInit - starting progress bar thread")
 
         # Start a thread to update the progress bar
@@ -210,9 +368,61 @@ class SqueezeInfo(xbmcgui.WindowXML):
         track_progress.daemon = True
         track_progress.start()
 
-        # Start the callback server to listen for events
-        debug("OnInit - starting callback server")
-        self.cbserver.start()
+        # Start up tasks run concurrently once the tasks they need have
+        # finished. The callback server connects while we find the players
+        # and artwork is processed last.
+        debug("OnInit - starting up")
+        self.startup = TaskGraph(LOG)
+        self.startup.add("listener", self.start_listener)
+        self.startup.add("server", self.get_server)
+        self.startup.add("players", self.get_squeeze_players,
+                         after=["server"])
+        self.startup.add("info", self.get_startup_info, after=["players"])
+        self.startup.add("artwork", self.update_artwork, after=["info"])
+
+        # Draw the window as it was when it was last closed. The startup
+        # tasks then update it from the server.
+        restored = self.restore_snapshot()
+        self.startup.start()
+        self.states.start()
+
+        # The window can be used as soon as we know which players there are
+        if not restored:
+            self.startup.wait("players")
+        debug("OnInit - players found")
+
+    def restore_snapshot(self):
+        """Method to set the players and window properties from the snapshot
+           saved last time.
+
+           Returns True if the snapshot was used.
+        """
+        if not self.snapshot.load() or not self.snapshot.players:
+            debug("No snapshot to restore")
+            return False
+
+        debug("Restoring snapshot")
+        self.players = [LMSPlayer(ref, self.cmdserver, name=name)
+                        for ref, name in self.snapshot.players]
+        self.cur_player = self.snapshot.player
+        self.player = self.get_cur_player()
+        self.sync_index.set_groups(self.snapshot.sync_groups, loaded=False)
+        self.has_player = True
+        self.states.set_players(self.players)
+
+        with self.properties.batch():
+            for propname, value in self.snapshot.properties.items():
+                self.setProperty(propname, value)
+
+        self.has_playlist = (self.properties.get("SQUEEZEINFO_HAS_PLAYLIST")
+                             == "true")
+        return True
+
+    def get_startup_info(self):
+        """Method to show the current track without waiting for artwork."""
+        if self.player:
+            debug("Player found: get track info.")
+            self.get_info(process_image=False)
 
     def onAction(self, action):
         # Let the action handler deal with this using decorators on methods
@@ -225,14 +435,20 @@ class SqueezeInfo(xbmcgui.WindowXML):
         pass
 
     def setProperty(self, propname, value):
-        """Simple method for setting window properties."""
-        debug(u"Setting property {} = {}".format(propname, value))
-        xbmcgui.Window(self.windowID).setProperty(propname, value)
+        """Simple method for setting window properties. Properties which
+           already have this value are not written again.
+        """
+        if self.properties.set(propname, value):
+            debug(u"Setting property {} = {}", propname, value)
+            if propname in SNAPSHOT_PROPERTIES:
+                self.snapshot.set_property(propname, value)
 
     def clearProperty(self, propname):
         """Simple method for clearing window properties."""
-        debug("Clearing property {}".format(propname))
-        xbmcgui.Window(self.windowID).clearProperty(propname)
+        debug("Clearing property {}", propname)
+        self.properties.clear(propname)
+        if propname in SNAPSHOT_PROPERTIES:
+            self.snapshot.set_property(propname, None)
 
     def set_default_focus(self):
         self.setFocusId(CONTROL_DEFAULT)
@@ -244,7 +460,7 @@ class SqueezeInfo(xbmcgui.WindowXML):
         """
         debug("Checking server connection...")
         connected = self.cmdserver.ping()
-        debug("Server is {}connected".format("" if connected else "not "))
+        debug("Server is {}connected", "" if connected else "not ")
         state = "true" if connected else "false"
         self.setProperty("SQUEEZEINFO_SERVER_CONNECTED", state)
         self.server_connected = connected
@@ -274,53 +490,99 @@ class SqueezeInfo(xbmcgui.WindowXML):
         """
         debug("Getting list of available players")
 
+        # Startup and the callback server can both ask for the players
+        with self.players_lock:
+            self._get_squeeze_players()
+
+    def _get_squeeze_players(self):
         # Server needs to be online. If it's not, try connecting one last time.
         if not self.server_connected:
             self.get_server()
 
         # If the server is online then get the players
         if self.server_connected:
-            self.players = self.cmdserver.get_players()
-            debug("{} available players: {}".format(len(self.players),
-                                                    self.players))
-
-            if self.players:
-                # Setting this property will cause the "Now Playing" bar to be
-                # displayed on the skin.
-                self.setProperty("SQUEEZEINFO_HAS_PLAYER", "true")
-                self.has_player = True
-                self.player = self.get_cur_player()
-                self.setProperty("SQUEEZEINFO_PLAYER_NAME", self.player.name)
-                self.set_vol_label()
-                self.get_sync_groups()
-
-            else:
-                # No players so we need to hide the "Now Playing" bar
-                self.setProperty("SQUEEZEINFO_HAS_PLAYER", "false")
-                self.has_player = False
+            self._set_players(self.cmdserver.get_players())
         else:
             debug("Can't connect to server. No players.")
             self.players = []
 
-    def get_info(self):
-        """Method to get track information from the current player."""
+            # Hide any players restored from the snapshot
+            self.setProperty("SQUEEZEINFO_HAS_PLAYER", "false")
+            self.has_player = False
+
+    def _set_players(self, players):
+        self.players = players
+        debug("{} available players: {}", len(self.players), self.players)
+
+        if self.players:
+            # Setting this property will cause the "Now Playing" bar to be
+            # displayed on the skin.
+            self.setProperty("SQUEEZEINFO_HAS_PLAYER", "true")
+            self.has_player = True
+            self.player = self.get_cur_player()
+            self.setProperty("SQUEEZEINFO_PLAYER_NAME", self.player.name)
+            self.set_vol_label()
+            self.get_sync_groups()
+
+        else:
+            # No players so we need to hide the "Now Playing" bar
+            self.setProperty("SQUEEZEINFO_HAS_PLAYER", "false")
+            self.has_player = False
+
+        self.states.set_players(self.players)
+        self.snapshot.set_players(self.players, self.cur_player)
+
+    def get_info(self, process_image=True):
+        """Method to get track information from the current player.
+
+           If 'process_image' is False, the background is only shown if it
+           has already been processed. update_artwork can then be used to
+           process it.
+        """
+        # Collect the properties and send them to the window in one go
+        with self.properties.batch():
+            self._get_info(process_image=process_image)
+
+    def update_artwork(self):
+        """Method to process and show the background for the current track."""
+        track = self.now_playing
+        if not track:
+            return
+
+        bg = self.get_metadata(track)[4]
+        if bg and track is self.now_playing:
+            self.setProperty("SQUEEZEINFO_NP_BACKGROUND", bg)
+
+    def _get_info(self, process_image=True):
         debug("Getting track info.")
         try:
-            debug("Retrieving playlist info for player {}...".format(self.player))
+            debug("Retrieving status for player {}...", self.player)
 
-            # Get the current and next track info
-            # (hard coded 2 tracks for now)
-            track = self.player.playlist_get_current_detail(amount=2)
-            debug("{} track(s) found.\n{}".format(len(track), track))
+            # Get the current and next track info, the mode and progress
+            # in one request
+            state = self.states.refresh(self.player.ref)
 
         # If we can't get track info then we need to exit this method
         except AttributeError:
             debug("get_info: AttributeError - exiting.")
             return
 
+        if state is None:
+            debug("get_info: player state not available - exiting.")
+            return
+
+        self.show_state(state, process_image=process_image)
+
+    def show_state(self, state, process_image=True):
+        """Method to show the now playing information from a player's
+           state.
+        """
+        track = state.tracks[:2]
+        debug("{} track(s) found.\n{}", len(track), track)
+
         # If there's at least one track then we can display the Now Playing info
         if len(track) > 0:
-            self.set_now_playing(track[0])
+            self.set_now_playing(track[0], process_image=process_image)
         else:
             self.setProperty("SQUEEZEINFO_HAS_PLAYLIST", "false")
             self.has_playlist = False
@@ -335,16 +597,24 @@ class SqueezeInfo(xbmcgui.WindowXML):
             self.setProperty("SQUEEZEINFO_HAS_NEXT_TRACK", "false")
 
         # Get track progress information
-        try:
-            e, d = self.player.get_track_elapsed_and_duration()
-        except:
-            e = d = 0.0
+        e, d = state.progress()
 
         # These variables can be written in other places so let's make sure it
         # only happens at one time with a Lock
         with self.lock:
             self.elapsed = e
             self.duration = d
+            self.playing = state.playing
+
+        # The status may be older than a volume change that hasn't reached
+        # the server yet
+        volume = self.volume_control.adjusting(state.ref)
+        if volume is None:
+            volume = state.volume
+
+        if volume is not None:
+            self.setProperty("SQUEEZEINFO_PLAYER_VOLUME",
+                             "{}%".format(volume))
 
         # If the now playing bar is currently hidden, we only want to show it
         # after the data has been populated.
@@ -358,7 +628,7 @@ class SqueezeInfo(xbmcgui.WindowXML):
         album = track.get("album", "Unknown Album")
         artist = track.get("artist", "Unknown Artist")
 
-        debug("Metadata: {}".format(track))
+        debug("Metadata: {}", track)
 
         # Use the ArtworkResolver to get the URL for the track.
         debug("Getting artwork url...")
@@ -373,7 +643,7 @@ class SqueezeInfo(xbmcgui.WindowXML):
         img_icon = url
         img_bg = url
 
-        debug("Artwork url: {}".format(url))
+        debug("Artwork url: {}", url)
 
         if process_image:
 
@@ -391,15 +661,27 @@ class SqueezeInfo(xbmcgui.WindowXML):
         # Return the necessary metadata
         return title, album, artist, img_icon, img_bg
 
-    def set_now_playing(self, track):
+    def set_now_playing(self, track, process_image=True):
         """Method to set window properties for the current track."""
         debug("Setting now playing track info")
-        title, album, artist, icon, bg = self.get_metadata(track)
+        self.now_playing = track
+        title, album, artist, icon, bg = self.get_metadata(track,
+                                                           process_image)
+
+        # Only show a background that's already been processed. The artwork
+        # task will process it later.
+        if not process_image:
+            try:
+                bg = self.cache.getCachedImage(bg, IMG_BACKGROUND,
+                                               create=False)
+            except:
+                bg = None
         pos = track.get("playlist index", -1)
         self.setProperty("SQUEEZEINFO_NP_TITLE", title)
         self.setProperty("SQUEEZEINFO_NP_ARTIST", artist)
         self.setProperty("SQUEEZEINFO_NP_ALBUM", album)
-        self.setProperty("SQUEEZEINFO_NP_BACKGROUND", bg)
+        if bg is not None:
+            self.setProperty("SQUEEZEINFO_NP_BACKGROUND", bg)
         self.setProperty("SQUEEZEINFO_NP_ICON", icon)
         self.setProperty("SQUEEZEINFO_CURRENT_TRACK", str(pos + 1))
 
@@ -414,111 +696,430 @@ class SqueezeInfo(xbmcgui.WindowXML):
 
     def getCallbackPlayer(self, event):
         """Return the player reference from the callback event."""
-        player = self.cur_player if event is None else event.split(" ")[0]
-        debug("Callback player ref: {}".format(player))
+        player = event.ref if event is not None and event.ref else \
+            self.cur_player
+        debug("Callback player ref: {}", player)
         return player
 
     def cur_or_sync(self, ref):
         """Method to determine if the event player is our player or in a sync
            group with our player.
         """
-        if ref == self.cur_player:
-            debug("Event matches current player")
+        if self.sync_index.synced(ref, self.cur_player):
+            debug("Event from current player or player in sync group")
             return True
 
-        else:
-            debug("Checking event in sync groups")
-            for gr in self.sync_groups:
-                if ref in gr and self.cur_player in gr:
-                    debug("Event from player in sync group")
-                    return True
-
         debug("Event doesn't match player or sync group")
         return False
 
     def get_sync_groups(self):
-        """Method to retrieve sync groups defined on the server."""
+        """Method to retrieve sync groups defined on the server. The groups
+           are only requested once and then updated by notifications.
+        """
         try:
-            self.sync_groups = self.cmdserver.get_sync_groups()
+            sync_groups = self.cmdserver.get_sync_groups()
         except:
-            self.sync_groups = []
+            sync_groups = []
 
-        debug("Sync groups: {}".format(self.sync_groups))
+        debug("Sync groups: {}", sync_groups)
+        self.snapshot.update(sync_groups=sync_groups)
+
+    def sync_changed(self, event=None):
+        """Method to trigger actions when players are synced or unsynced.
+           The sync index has already been updated by the callback server.
+        """
+        debug("sync_changed: {}", event)
+        self.snapshot.update(sync_groups=self.sync_index.groups)
+
+        # The current player may now be playing something else
+        if self.cur_player in [event.ref] + event.args:
+            self.get_info()
 
     def track_changed(self, event=None):
         """Method to trigger actions when a new track is triggered on server."""
         debug("track_changed")
         debug(event)
-        if self.cur_or_sync(self.getCallbackPlayer(event)):
+        ref = self.getCallbackPlayer(event)
+        if self.cur_or_sync(ref):
             self.get_info()
+        else:
+            self.states.invalidate(ref)
+
+    def playlist_changed(self, event=None):
+        """Method to trigger actions when tracks are added to or removed from
+           a playlist.
+        """
+        ref = self.getCallbackPlayer(event)
+        if self.cur_or_sync(ref):
+            self.drop_playlist()
+        self.track_changed(event)
 
     def no_server(self, event=None):
         """Method to trigger actions when server becomes unavailable."""
-        debug("no_server: {}".format(event))
+        debug("no_server: {}", event)
         self.setProperty("SQUEEZEINFO_SERVER_CONNECTED", "false")
 
     def server_connect(self, event=None):
         """Method to trigger actions when server becomes available."""
-        debug("server_connect: {}".format(event))
+        debug("server_connect: {}", event)
         self.setProperty("SQUEEZEINFO_SERVER_CONNECTED", "true")
+
+        # The startup tasks will find the players if they're still running
+        if self.startup and not self.startup.done("players"):
+            return
+
+        # Sync groups may have changed while we were disconnected
+        self.sync_index.clear()
+
         self.get_squeeze_players()
 
+    def server_status(self, status):
+        """Method to update the list of players from the server status
+           pushed by the cometd client.
+        """
+        players = [(p["playerid"], p.get("name", p["playerid"]))
+                   for p in status.get("players_loop", [])
+                   if p.get("playerid")]
+
+        # The startup tasks will find the players if they're still running
+        if self.startup and not self.startup.done("players"):
+            return
+
+        refs = set(ref for ref, _ in players)
+        if refs == set(p.ref for p in self.players):
+            return
+
+        debug("server_status: players changed {}", players)
+
+        with self.players_lock, self.properties.batch():
+            for player in list(self.players):
+                if player.ref not in refs:
+                    self.remove_player(player.ref)
+
+            for ref, name in players:
+                self.add_player(ref, name=name)
+
+    def player_status(self, event):
+        """Method to show a player's status pushed by the cometd client. The
+           status is complete so nothing needs to be requested.
+        """
+        ref, status = event
+        state = self.states.update(ref, status)
+
+        # The timestamp changes when tracks are added or removed
+        if ref == self.cur_player:
+            stamp = status.get("playlist_timestamp")
+            if stamp != self.playlist_stamp:
+                if self.playlist_stamp is not None:
+                    self.drop_playlist()
+                self.playlist_stamp = stamp
+
+        if state is not None and ref == self.cur_player:
+            with self.properties.batch():
+                self.show_state(state)
+
     def play_pause(self, event=None):
         """Method to trigger actions when player state changes."""
-        debug("play_pause: {}".format(event))
-        if self.cur_or_sync(self.getCallbackPlayer(event)):
-            if event.split()[3] == "1":
-                self.playing = False
-            else:
-                self.playing = True
-            debug("Player playing state now: {}".format(self.playing))
+        debug("play_pause: {}", event)
+        ref = self.getCallbackPlayer(event)
+        paused = event.arg(0) == "1"
+        self.states.set_mode(ref, "pause" if paused else "play")
+
+        if self.cur_or_sync(ref):
+            self.playing = not paused
+            debug("Player playing state now: {}", self.playing)
+
+    def player_stopped(self, event=None):
+        """Method to trigger actions when a player stops."""
+        debug("player_stopped: {}", event)
+        ref = self.getCallbackPlayer(event)
+        self.states.set_mode(ref, "stop")
+
+        if self.cur_or_sync(ref):
+            self.playing = False
 
     def client_change(self, event=None):
-        """Method to trigger actions when client connects or disconnects."""
-        debug("client_change: {}".format(event))
-        self.get_squeeze_players()
-        if self.players:
-            self.get_info()
+        """Method to trigger actions when client connects or disconnects.
+
+           Only the player in the notification is added, removed or
+           refreshed. All the players are requested again if the
+           notification doesn't match the players we know about.
+        """
+        debug("client_change: {}", event)
+        if event is None or not event.ref or len(event.command) < 2:
+            return
+
+        # The startup tasks will find the players if they're still running
+        if self.startup and not self.startup.done("players"):
+            return
+
+        # Player discovery failed at startup so try it again
+        if self.players is None:
+            self.get_squeeze_players()
+            return
+
+        ref, change = event.ref, event.command[1]
+
+        with self.properties.batch():
+            with self.players_lock:
+                if change == "new":
+                    consistent = self.add_player(ref)
+                elif change == "forget":
+                    consistent = self.remove_player(ref)
+                else:
+                    consistent = ref in self.players
+                    self.states.invalidate(ref)
+
+                # Check that we haven't missed a player arriving or leaving
+                if consistent and change in ["new", "forget"]:
+                    count = self.cmdserver.get_player_count()
+                    consistent = len(self.players) == count
+
+                if not consistent:
+                    debug("client_change: rediscovering players")
+                    self._get_squeeze_players()
+
+            if self.players and (not consistent or ref == self.cur_player):
+                self.get_info()
+
+    def add_player(self, ref, name=None):
+        """Method to add a single player to the list of players. Call with
+           players_lock held.
+
+           Returns False if the player couldn't be added.
+        """
+        if ref in self.players:
+            return True
+
+        try:
+            player = LMSPlayer(ref, self.cmdserver, name=name)
+        except:
+            return False
+
+        self.players.append(player)
+        self.player_list_changed()
+        return True
+
+    def remove_player(self, ref):
+        """Method to remove a single player from the list of players. Call
+           with players_lock held.
+
+           Returns False if the player wasn't in the list.
+        """
+        if ref not in self.players:
+            return False
+
+        self.players = [p for p in self.players if p.ref != ref]
+        self.player_list_changed()
+        return True
+
+    def player_list_changed(self):
+        # The current player only changes if ours has gone
+        if self.has_player and self.cur_player in self.players:
+            self.states.set_players(self.players)
+            self.snapshot.set_players(self.players, self.cur_player)
+        else:
+            self._set_players(self.players)
 
     def vol_change(self, event=None):
         """Method to trigger actions when volume changes."""
-        if self.getCallbackPlayer(event) == self.cur_player:
-            self.set_vol_label()
+        ref = self.getCallbackPlayer(event)
+        volume = self.volume_control.reconcile(ref, event.arg(0, ""))
+
+        # Relative changes (e.g. "+5") don't tell us the new volume
+        if volume is None:
+            self.states.set_volume(ref, event.arg(0, ""))
+            if ref == self.cur_player:
+                self.set_vol_label()
+            return
+
+        self.states.set_volume(ref, str(volume))
+        if ref == self.cur_player:
+            self.setProperty("SQUEEZEINFO_PLAYER_VOLUME",
+                             "{}%".format(volume))
 
     def change_player(self, step):
         self.setProperty("SQUEEZEINFO_CHANGE_PLAYER", "false")
         sleep(0.05)
-        debug("Changing player. Index step {}".format(step))
+        debug("Changing player. Index step {}", step)
         index = self.players.index(self.cur_player)
         index = (index + step) % len(self.players)
         self.player = self.players[index]
         self.cur_player = str(self.player.ref)
-        debug("New player: {}".format(self.player.name))
+        self.snapshot.update(player=self.cur_player)
+        self.drop_playlist()
+        self.playlist_stamp = None
+        debug("New player: {}", self.player.name)
         debug("Updating screen...")
         self.setProperty("SQUEEZEINFO_PLAYER_NAME", self.player.name)
-        self.setProperty("SQUEEZEINFO_CHANGE_PLAYER", "true")
-        self.get_info()
+
+        # If we already know the player's state we don't need to wait for
+        # the server. The background is processed separately if needed.
+        state = self.states.get(self.player.ref)
+        if state:
+            with self.properties.batch():
+                self.show_state(state, process_image=False)
+            self.setProperty("SQUEEZEINFO_CHANGE_PLAYER", "true")
+            artwork = Thread(target=self.update_artwork)
+            artwork.daemon = True
+            artwork.start()
+        else:
+            self.setProperty("SQUEEZEINFO_CHANGE_PLAYER", "true")
+            self.get_info()
 
     def set_vol_label(self):
-        label = "{}%".format(self.player.get_volume())
-        self.setProperty("SQUEEZEINFO_PLAYER_VOLUME", label)
+        volume = self.volume_control.reconcile(self.player.ref,
+                                               str(self.player.get_volume()))
+        if volume is not None:
+            self.setProperty("SQUEEZEINFO_PLAYER_VOLUME",
+                             "{}%".format(volume))
 
     def vol_up(self):
         """Method to increase current player's volume."""
-        try:
-            self.player.volume_up()
-            self.set_vol_label()
-
-        except:
-            pass
+        self.change_volume(VOLUME_STEP)
 
     def vol_down(self):
         """Method to decrease current player's volume."""
+        self.change_volume(-VOLUME_STEP)
+
+    def change_volume(self, delta):
+        """Method to change the current player's volume. The label changes
+           straight away and the server is updated in the background.
+        """
+        if not self.player:
+            return
+
+        state = self.states.get(self.player.ref)
+        known = state.volume if state else None
+        volume = self.volume_control.step(self.player, delta, known)
+
+        if volume is not None:
+            self.states.set_volume(self.player.ref, str(volume))
+            self.setProperty("SQUEEZEINFO_PLAYER_VOLUME",
+                             "{}%".format(volume))
+
+    def send_command(self, command, rollback=None):
+        """Queues a command for the current player. The window should already
+           show the result; 'rollback' is called if the command fails.
+        """
+        def failed(error):
+            debug("Command failed: {} ({})", command, error)
+            if rollback is not None:
+                rollback(error)
+
+        self.commands.submit(self.player, command, failed)
+
+    def save_state(self):
+        """Returns a function which puts the now playing information and play
+           state back as they are now.
+        """
+        ref = self.cur_player
+        now_playing = self.now_playing
+        values = [(name, self.properties.get(name))
+                  for name in NOW_PLAYING_PROPERTIES]
+
+        with self.lock:
+            playing, elapsed = self.playing, self.elapsed
+
+        def restore(error=None):
+            if ref != self.cur_player:
+                return
+
+            with self.lock:
+                self.playing = playing
+                self.elapsed = elapsed
+
+            self.now_playing = now_playing
+            with self.properties.batch():
+                for name, value in values:
+                    if value is None:
+                        self.clearProperty(name)
+                    else:
+                        self.setProperty(name, value)
+
+            # The server may have done some of what was asked
+            self.states.invalidate(ref)
+
+        return restore
+
+    def toggle_pause(self):
+        """Method to pause or resume the current player."""
+        rollback = self.save_state()
+
+        with self.lock:
+            self.playing = not self.playing
+            playing = self.playing
+
+        self.states.set_mode(self.cur_player, "play" if playing else "pause")
+        self.send_command("pause", rollback)
+
+    def stop_player(self):
+        """Method to stop the current player."""
+        rollback = self.save_state()
+
+        with self.lock:
+            self.playing = False
+
+        self.states.set_mode(self.cur_player, "stop")
+        self.send_command("stop", rollback)
+
+    def skip_tracks(self, offset):
+        """Method to move 'offset' tracks through the playlist."""
         try:
-            self.player.volume_down()
-            self.set_vol_label()
-        except:
-            pass
+            current = int(self.properties.get("SQUEEZEINFO_CURRENT_TRACK"))
+            position = current - 1 + offset
+        except (TypeError, ValueError):
+            position = None
+
+        self.change_track("playlist jump {:+d}".format(offset), position)
+
+    def play_index(self, index):
+        """Method to play the track at a position in the playlist."""
+        self.change_track("playlist index {}".format(index), index)
+
+    def change_track(self, command, position):
+        """Shows the track at 'position' as now playing and sends 'command'
+           to the server.
+        """
+        rollback = self.save_state()
+
+        if position is not None and position >= 0:
+            self.show_track(position)
+
+        self.send_command(command, rollback)
+
+    def find_track(self, position):
+        """Returns the track at a position in the current player's playlist
+           if we already have it, otherwise None.
+        """
+        playlist = self.playlist
+        if playlist is not None and self.playlist_ref == self.cur_player:
+            idx = position - playlist.start
+            if 0 <= idx < len(playlist):
+                return playlist[idx]
+
+        state = self.states.get(self.cur_player)
+        for track in state.tracks if state else []:
+            if track.get("playlist index") == position:
+                return track
+
+        return None
+
+    def show_track(self, position):
+        """Shows a track as now playing before the server has changed track.
+           Only the track number is changed if we don't have the track.
+        """
+        track = self.find_track(position)
+
+        with self.properties.batch():
+            if track is not None:
+                self.set_now_playing(dict(track), process_image=False)
+            else:
+                self.setProperty("SQUEEZEINFO_CURRENT_TRACK",
+                                 str(position + 1))
+
+        with self.lock:
+            self.elapsed = 0.0
 
     def get_text(self, heading):
         text = xbmcgui.Dialog().input(heading, type=xbmcgui.INPUT_ALPHANUM)
@@ -537,7 +1138,7 @@ class SqueezeInfo(xbmcgui.WindowXML):
             self.show_playlist = True
             self.setProperty("SQUEEZEINFO_SHOW_PLAYLIST", "true")
             listbox = self.getControl(50)
-            debug("Listbox control: {}".format(listbox))
+            debug("Listbox control: {}", listbox)
             sleep(0.6)
             self.setFocus(listbox)
 
@@ -579,6 +1180,22 @@ class SqueezeInfo(xbmcgui.WindowXML):
             sleep(0.1)
             self.setFocusId(CONTROL_MENU)
 
+    def prefetch_menu(self):
+        """Starts retrieving the submenu of the highlighted menu item so that
+           it's ready if the user selects it. The item is read once the
+           selection has stopped moving.
+        """
+        LMSMenuHandler(self.player).prefetch(self.selected_menu_cmd)
+
+    def selected_menu_cmd(self):
+        """Returns the command for the highlighted menu item's submenu, if it
+           has one.
+        """
+        item = self.getControl(CONTROL_MENU).getSelectedItem()
+        if item and item.getProperty("Type") in ["menu", "playlist"]:
+            return item.getProperty("cmd")
+        return None
+
     def submenu_action(self, controlid):
         menu = self.getControl(CONTROL_MENU)
         menuitem = menu.getSelectedItem()
@@ -589,7 +1206,7 @@ class SqueezeInfo(xbmcgui.WindowXML):
 
         if controlid == CONTROL_AUDIO_SUBMENU:
             cmd = menuitem.getProperty(action)
-            self.player.request(cmd)
+            self.send_command(cmd)
 
         elif controlid == CONTROL_SEARCH_SUBMENU:
             text = self.get_text("Enter search terms...")
@@ -616,11 +1233,14 @@ class SqueezeInfo(xbmcgui.WindowXML):
 
         listbox.reset()
 
-        pl_items = self.player.playlist_get_detail()
+        ref = self.cur_player
+        playlist = self.player.playlist_get_store()
+        self.playlist = playlist
+        self.playlist_ref = ref
 
         items = []
 
-        for i, plitm in enumerate(pl_items):
+        for i, plitm in enumerate(playlist):
             item = xbmcgui.ListItem()
             title, _, artist, icon, _ = self.get_metadata(plitm,
                                                           process_image=False)
@@ -633,6 +1253,13 @@ class SqueezeInfo(xbmcgui.WindowXML):
         pos = self.player.playlist_get_position()
         listbox.selectItem(pos)
 
+    def drop_playlist(self):
+        """Forgets the playlist view's tracks once they may be out of date.
+           They're requested again when the view is next opened.
+        """
+        self.playlist = None
+        self.playlist_ref = None
+
     def set_menu(self, menucmd=None):
         handle = LMSMenuHandler(self.player)
         menubox = self.getControl(CONTROL_MENU)
@@ -643,8 +1270,56 @@ class SqueezeInfo(xbmcgui.WindowXML):
             self.menu_history.append(menucmd)
             menu = handle.getMenu(menucmd=menucmd)
 
-        menubox.reset()
+        with self.menu_lock:
+            self.menu_generation += 1
+            self.menu_handler = handle
+            self.menu_cmd = menucmd
+            self.menu_loaded = len(menu)
+
+            menubox.reset()
+            menubox.addItems(self._menu_listitems(menu))
+
+        self.setProperty("SQUEEZEINFO_MENU_COUNT", str(handle.count))
+        self.prefetch_menu()
+
+    def load_menu_page(self):
+        """Adds the next page of items to the menu if the selection is close
+           to the end of the items loaded so far.
+        """
+        menubox = self.getControl(CONTROL_MENU)
+
+        with self.menu_lock:
+            handle = self.menu_handler
+            menucmd = self.menu_cmd
+            start = self.menu_loaded
+            generation = self.menu_generation
+
+            if (not menucmd or handle is None or start >= handle.count or
+                    menubox.getSelectedPosition() < start - MENU_PAGE_MARGIN):
+                return
+
+            # Stop another key press loading the same page
+            self.menu_loaded = handle.count
+
+        def load():
+            try:
+                menu = handle.getMenuPage(menucmd, start=start)
+            except:
+                menu = []
+
+            with self.menu_lock:
+                # The menu may have been replaced in the meantime
+                if self.menu_generation != generation:
+                    return
+                self.menu_loaded = start + len(menu)
+                if menu:
+                    menubox.addItems(self._menu_listitems(menu))
+
+        loader = Thread(target=load)
+        loader.daemon = True
+        loader.start()
 
+    def _menu_listitems(self, menu):
         items = []
 
         for item in menu:
@@ -690,7 +1365,7 @@ class SqueezeInfo(xbmcgui.WindowXML):
             l_item.setIconImage(item.icon)
             items.append(l_item)
 
-        menubox.addItems(items)
+        return items
 
     def _build_submenu(self, control, items):
         submenu = self.getControl(control)
@@ -716,6 +1391,32 @@ class SqueezeInfo(xbmcgui.WindowXML):
             control.addItem(l)
         control.setVisibleCondition("true")
 
+    def save_stats(self):
+        """Saves the performance statistics to the addon profile and, if
+           enabled, shows them as window properties.
+        """
+        try:
+            STATS.save(STATS_FILE)
+        except (IOError, OSError):
+            debug("Unable to save statistics")
+
+        if not SHOW_STATS:
+            return
+
+        snapshot = STATS.snapshot()
+
+        with self.properties.batch():
+            for name, hist in snapshot["latency"].items():
+                prop = "SQUEEZEINFO_STATS_" + name.upper().replace(" ", "_")
+                self.setProperty(prop, "{}/{}ms".format(hist["p50_ms"],
+                                                        hist["p95_ms"]))
+
+            for name, cache in snapshot["caches"].items():
+                prop = "SQUEEZEINFO_STATS_CACHE_" + name.upper()
+                ratio = cache["ratio"]
+                self.setProperty(prop, "" if ratio is None
+                                 else "{:.0%}".format(ratio))
+
     def show_progress(self):
         """Method to increase progress bar state. Should be run as a thread to
            prevent blocking.
@@ -724,50 +1425,59 @@ class SqueezeInfo(xbmcgui.WindowXML):
         # No debugs here to avoid massive spamming
 
         i = 0
+        j = 0
 
         # start a loop which stops when Kodi exits
         while not (xbmc.abortRequested or self.abort):
 
-            # Every 20 cycles we make request to the server to check..
-            if not (i % 20):
-                try:
-                    # ... playing status
-                    self.playing = self.player.get_mode() == "play"
-                except:
-                    self.playing = False
+            self.progress_step(i)
 
-                try:
-                    # ... track position
-                    e, d = self.player.get_track_elapsed_and_duration()
-                except:
-                    e = d = 0.0
+            # Increment our counters
+            i = (i + 1) % 20
+            j = (j + 1) % STATS_INTERVAL
 
-                with self.lock:
-                    self.elapsed = e
-                    self.duration = d
+            if not j:
+                self.save_stats()
 
-            # Otherwise, just manually increase progress bar
-            else:
-                if self.playing:
-                    with self.lock:
-                        self.elapsed += 0.25
+            # And sleep...
+            sleep(0.25)
 
+        if not self.abort:
+            self.exit("*")
+
+    def progress_step(self, i):
+        """Updates the progress bar. Every 20th step the state is checked
+           with the server.
+        """
+        # Every 20 cycles we make request to the server to check the playing
+        # status and track position
+        if not (i % 20):
             try:
-                percent = float(self.elapsed/self.duration) * 100
+                state = self.states.refresh(self.player.ref)
+                playing = state.playing
+                e, d = state.progress()
             except:
-                percent = 0
+                playing = False
+                e = d = 0.0
 
-            # Draw the new progress bar state
-            self.progress.setPercent(percent)
+            with self.lock:
+                self.playing = playing
+                self.elapsed = e
+                self.duration = d
 
-            # Increment our counter
-            i = (i + 1) % 20
+        # Otherwise, just manually increase progress bar
+        else:
+            if self.playing:
+                with self.lock:
+                    self.elapsed += 0.25
 
-            # And sleep...
-            sleep(0.25)
+        try:
+            percent = float(self.elapsed/self.duration) * 100
+        except:
+            percent = 0
 
-        if not self.abort:
-            self.exit("*")
+        # Draw the new progress bar state
+        self.progress.setPercent(percent)
 
     ############ ACTIONS #######################################################
 
@@ -776,14 +1486,25 @@ class SqueezeInfo(xbmcgui.WindowXML):
     @ch.action("parentdir", CONTROL_DEFAULT)
     @ch.action("previousmenu", CONTROL_DEFAULT)
     def exit(self, controlid):
-        self.cbserver.abort = True
-        self.cbserver.join()
+        self.states.stop()
+        self.volume_control.stop()
+        self.save_stats()
+        self.snapshot.save()
+        if self.profiler:
+            self.profiler.stop()
+        if self.cbserver:
+            if USE_COMETD:
+                # Ends the long poll so that the thread can finish
+                self.cbserver.disconnect()
+            else:
+                self.cbserver.stop()
+            self.cbserver.join()
         if not self.abort:
             self.abort = True
         del self.cbserver
         del self.cmdserver
         del self.awr
-        del self.cache
+        self._cache = None
         del self.player
         self.close()
 
@@ -833,7 +1554,7 @@ class SqueezeInfo(xbmcgui.WindowXML):
     def click_playlist(self, controlid):
         listbox = self.getControl(controlid)
         index = listbox.getSelectedPosition()
-        self.player.playlist_play_index(index)
+        self.play_index(index)
 
     ## Squeezemenu #############################################################
 
@@ -841,6 +1562,12 @@ class SqueezeInfo(xbmcgui.WindowXML):
     def show_submenu(self, controlid):
         self.display_submenu()
 
+    @ch.action("up", CONTROL_MENU)
+    @ch.action("down", CONTROL_MENU)
+    def menu_hover(self, controlid):
+        self.prefetch_menu()
+        self.load_menu_page()
+
     @ch.action("previousmenu", CONTROL_MENU)
     def close_menu(self, controlid):
         self.menu_history = []
@@ -889,7 +1616,7 @@ class SqueezeInfo(xbmcgui.WindowXML):
             self.vol_up()
 
     @ch.action("down", CONTROL_PLAYER_CONTROL)
-    def pl_vol_up(self, controlid):
+    def pl_vol_down(self, controlid):
         control = self.getControl(controlid)
         action = control.getSelectedItem().getProperty("action")
         if action == "volume":
@@ -904,16 +1631,16 @@ class SqueezeInfo(xbmcgui.WindowXML):
             return
 
         if action == "previous":
-            self.player.prev()
+            self.skip_tracks(-1)
 
         elif action == "playpause":
-            self.player.toggle()
+            self.toggle_pause()
 
         elif action == "stop":
-            self.player.stop()
+            self.stop_player()
 
         elif action == "next":
-            self.player.next()
+            self.skip_tracks(1)
 
     @ch.action("parentdir", CONTROL_PLAYER_CONTROL)
     @ch.action("previousmenu", CONTROL_PLAYER_CONTROL)
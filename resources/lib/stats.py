@@ -0,0 +1,180 @@
+"""Lightweight instrumentation for the script.
+
+   Timings are collected into latency histograms and cache lookups into hit
+   and miss counters. A snapshot can be saved as JSON and formatted as text
+   so that it can be shown from outside the window.
+
+   This module doesn't import any Kodi modules so it can be used by the LMS
+   client libraries too.
+"""
+import json
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import time
+
+# Upper bounds (in milliseconds) of the histogram buckets. Anything larger
+# goes in a final overflow bucket.
+BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+def command_key(command):
+    """Returns a short name for a CLI command e.g. "mixer volume" for
+       "00:04:20:12:34:56 mixer volume ?".
+    """
+    if not isinstance(command, (list, tuple)):
+        command = command.split(" ")
+
+    tokens = [x if isinstance(x, basestring) else str(x)
+              for x in command[:3]]
+
+    # Drop the player reference
+    if tokens and (":" in tokens[0] or tokens[0] in ["-", ""]):
+        tokens = tokens[1:]
+
+    if len(tokens) > 1 and tokens[1].isalpha():
+        return " ".join(tokens[:2])
+
+    return tokens[0] if tokens else ""
+
+
+class Histogram(object):
+    """Latency histogram with fixed buckets."""
+
+    __slots__ = ("count", "total", "min", "max", "counts")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.counts = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+        self.counts[bisect_left(BUCKETS, ms)] += 1
+
+    def percentile(self, pc):
+        """Returns the bucket bound (in ms) containing the 'pc' percentile."""
+        if not self.count:
+            return 0
+
+        target = self.count * pc / 100.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {"count": self.count,
+                "mean_ms": self.total / self.count if self.count else 0,
+                "min_ms": self.min or 0,
+                "max_ms": self.max or 0,
+                "p50_ms": self.percentile(50),
+                "p95_ms": self.percentile(95),
+                "p99_ms": self.percentile(99),
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["inf"],
+                                    self.counts))}
+
+
+class Stats(object):
+    """Collection of histograms and cache counters."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.enabled = True
+        self.histograms = {}
+        self.caches = {}
+        self.started = time()
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.add(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        start = time()
+        try:
+            yield
+        finally:
+            self.record(name, time() - start)
+
+    def hit(self, name):
+        self._count(name, 0)
+
+    def miss(self, name):
+        self._count(name, 1)
+
+    def _count(self, name, idx):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            counts = self.caches.get(name)
+            if counts is None:
+                counts = self.caches[name] = [0, 0]
+            counts[idx] += 1
+
+    def ratio(self, name):
+        """Returns the hit ratio for a cache (or None if it's unused)."""
+        hits, misses = self.caches.get(name, (0, 0))
+        total = hits + misses
+        return float(hits) / total if total else None
+
+    def snapshot(self):
+        with self.lock:
+            return {"uptime": time() - self.started,
+                    "latency": dict((k, v.as_dict())
+                                    for k, v in self.histograms.items()),
+                    "caches": dict((k, {"hits": v[0],
+                                        "misses": v[1],
+                                        "ratio": self.ratio(k)})
+                                   for k, v in self.caches.items())}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.caches.clear()
+            self.started = time()
+
+
+def format_snapshot(snapshot):
+    """Returns a snapshot as readable text."""
+    lines = ["Uptime: {:.0f}s".format(snapshot.get("uptime", 0)), "",
+             "{:<30} {:>6} {:>6} {:>6} {:>6} {:>8}".format(
+                 "Latency (ms)", "count", "p50", "p95", "p99", "max")]
+
+    for name, hist in sorted(snapshot.get("latency", {}).items()):
+        lines.append("{:<30} {:>6} {:>6} {:>6} {:>6} {:>8.1f}".format(
+            name, hist["count"], hist["p50_ms"], hist["p95_ms"],
+            hist["p99_ms"], hist["max_ms"]))
+
+    lines += ["", "{:<16} {:>6} {:>6}  {}".format("Caches", "hits",
+                                                   "misses", "ratio")]
+    for name, cache in sorted(snapshot.get("caches", {}).items()):
+        ratio = cache["ratio"]
+        lines.append("{:<16} {:>6} {:>6}  {}".format(
+            name, cache["hits"], cache["misses"],
+            "-" if ratio is None else "{:.0%}".format(ratio)))
+
+    return "\n".join(lines)
+
+
+# Shared instance used throughout the script
+STATS = Stats()
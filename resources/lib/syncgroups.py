@@ -0,0 +1,112 @@
+"""Index of the players in each sync group.
+
+   The index is loaded from a "syncgroups ?" request and then kept up to date
+   from "sync" and "client forget" notifications so that the server doesn't
+   need to be asked again.
+
+   This module doesn't import any Kodi modules so it can be used by the LMS
+   client libraries too.
+"""
+from threading import Lock
+
+# Notifications which change the sync groups
+SYNC_EVENTS = ["sync", "client"]
+
+
+class SyncGroupIndex(object):
+    """Maps each synced player to the list of players in its group."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.members = {}
+        self.loaded = False
+
+    @property
+    def groups(self):
+        """List of sync groups, each of which is a list of player refs."""
+        with self.lock:
+            groups = []
+            seen = set()
+            for group in self.members.values():
+                if id(group) not in seen:
+                    seen.add(id(group))
+                    groups.append(list(group))
+            return groups
+
+    def set_groups(self, groups, loaded=True):
+        """Replaces the groups in the index. If 'loaded' is False, the groups
+           will still be requested from the server when they're next needed.
+        """
+        with self.lock:
+            self.members = {}
+            for group in groups:
+                group = [str(ref) for ref in group if ref]
+                if len(group) > 1:
+                    for ref in group:
+                        self.members[ref] = group
+            self.loaded = loaded
+
+    def clear(self):
+        """Empties the index so that it's loaded again."""
+        with self.lock:
+            self.members = {}
+            self.loaded = False
+
+    def group(self, ref):
+        """Returns the players synced with 'ref' (including itself)."""
+        return list(self.members.get(ref, [ref]))
+
+    def synced(self, ref, other):
+        """Returns True if the two players are the same or in the same sync
+           group.
+        """
+        if ref == other:
+            return True
+        group = self.members.get(ref)
+        return group is not None and group is self.members.get(other)
+
+    def sync(self, master, slave):
+        """Adds 'slave' to the group containing 'master'."""
+        if master == slave:
+            return
+
+        with self.lock:
+            self._remove(slave)
+            group = self.members.get(master)
+            if group is None:
+                group = self.members[master] = [master]
+            group.append(slave)
+            self.members[slave] = group
+
+    def unsync(self, ref):
+        with self.lock:
+            self._remove(ref)
+
+    def _remove(self, ref):
+        group = self.members.pop(ref, None)
+        if group is None:
+            return
+
+        group.remove(ref)
+
+        # A group of one isn't a group
+        if len(group) == 1:
+            del self.members[group[0]]
+
+    def handle(self, tokens):
+        """Updates the index from an unquoted notification split into
+           tokens e.g. ["00:04:20:12:34:56", "sync", "-"].
+        """
+        if len(tokens) < 3:
+            return
+
+        ref, command, arg = tokens[:3]
+
+        if command == "sync":
+            if arg == "-":
+                self.unsync(ref)
+            elif arg != "?":
+                self.sync(ref, arg)
+
+        elif command == "client" and arg == "forget":
+            self.unsync(ref)
@@ -0,0 +1,59 @@
+"""Runs a set of tasks concurrently while respecting their dependencies."""
+import traceback
+from collections import OrderedDict
+from threading import Event, Thread
+
+
+class TaskGraph(object):
+    """Each task runs in its own thread as soon as the tasks it depends on
+       have finished. A task still runs if one of its dependencies raised an
+       exception, so tasks should check for the state they need.
+
+       Exceptions are kept in 'errors' and, if a logger is given, written to
+       the log with their traceback.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        self.tasks = OrderedDict()
+        self.finished = {}
+        self.errors = {}
+
+    def add(self, name, func, after=None):
+        """Adds a task called 'name' which runs 'func' once the tasks named
+           in 'after' have finished.
+        """
+        self.tasks[name] = (func, after or [])
+        self.finished[name] = Event()
+
+    def _run(self, name):
+        func, after = self.tasks[name]
+
+        for dependency in after:
+            self.finished[dependency].wait()
+
+        try:
+            func()
+        except Exception as e:
+            self.errors[name] = e
+            if self.logger is not None:
+                self.logger.error(u"Task {} failed:\n{}".format(
+                    name, traceback.format_exc().decode("utf-8", "replace")))
+        finally:
+            self.finished[name].set()
+
+    def start(self):
+        for name in self.tasks:
+            thread = Thread(target=self._run, args=(name,))
+            thread.daemon = True
+            thread.start()
+        return self
+
+    def done(self, name):
+        return self.finished[name].is_set()
+
+    def wait(self, name=None, timeout=None):
+        """Waits for a task (or all tasks if no name is given) to finish."""
+        names = [name] if name else list(self.tasks)
+        for task in names:
+            self.finished[task].wait(timeout)
@@ -0,0 +1,199 @@
+"""Changes a player's volume without waiting for the server.
+
+   Each key press changes a local volume which can be shown straight away.
+   A background thread sends the latest volume to the server as an absolute
+   "mixer volume N", at most once every 'interval' seconds, so holding a key
+   down sends a few commands rather than one (plus a volume query) for every
+   repeat.
+
+   "mixer volume" notifications are used to correct the local volume once
+   the user has stopped changing it.
+
+   This module doesn't import any Kodi modules so it can be used by the LMS
+   client libraries too.
+"""
+from threading import Event, Lock, Thread
+from time import sleep, time
+
+# Minimum number of seconds between volume commands sent to the server
+SEND_INTERVAL = 0.2
+
+# Seconds after the last command during which notifications which don't
+# match the local volume are assumed to be for earlier commands
+SETTLE_TIME = 1.0
+
+
+def _clamp(volume):
+    return max(0, min(100, volume))
+
+
+class VolumeController(object):
+    """Holds the volume of the player being controlled and sends changes to
+       the server in the background.
+    """
+
+    def __init__(self, interval=SEND_INTERVAL, settle=SETTLE_TIME):
+        self.interval = interval
+        self.settle = settle
+        self.lock = Lock()
+        self.wake = Event()
+        self.abort = False
+        self.thread = None
+
+        self.player = None
+        self.ref = None
+        self.volume = None
+
+        # Change to send when the volume isn't known
+        self.delta = 0
+
+        # Whether there's a change which hasn't been sent yet and when the
+        # last change was sent
+        self.pending = False
+        self.last_send = 0
+
+        # Changes for players which are no longer being controlled
+        self.outbox = []
+
+        # Last volume reported for each player
+        self.known = {}
+
+    def start(self):
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.abort = True
+        self.wake.set()
+
+    def _select(self, player, volume):
+        """Switches to a different player. Any change for the previous player
+           is still sent. If 'volume' isn't known the last reported volume is
+           used.
+        """
+        if self.ref is not None and self.ref == str(player.ref):
+            return
+
+        if self.pending:
+            self.outbox.append(self._take())
+
+        if volume is None:
+            volume = self.known.get(str(player.ref))
+
+        self.player = player
+        self.ref = str(player.ref)
+        self.volume = volume
+        self.delta = 0
+
+    def step(self, player, delta, volume=None):
+        """Changes the volume of 'player' by 'delta'. 'volume' is the
+           player's volume if it's known (only used when the player changes).
+
+           Returns the new volume or None if it isn't known yet.
+        """
+        with self.lock:
+            self._select(player, volume)
+
+            if self.volume is None:
+                self.delta += delta
+            else:
+                self.volume = _clamp(self.volume + delta)
+
+            self.pending = True
+            new_volume = self.volume
+
+        if self.thread is None:
+            self.start()
+        self.wake.set()
+
+        return new_volume
+
+    def _adjusting(self):
+        return self.pending or time() - self.last_send < self.settle
+
+    def adjusting(self, ref):
+        """Returns the local volume if the user is changing the volume of
+           'ref', otherwise None.
+        """
+        with self.lock:
+            if str(ref) == self.ref and self._adjusting():
+                return self.volume
+            return None
+
+    def reconcile(self, ref, volume):
+        """Updates the local volume from a "mixer volume" notification.
+
+           Returns the volume to show. While the volume is being changed
+           that's the local volume, as the notification is for an earlier
+           command. Returns None if the volume isn't known (the notification
+           is for a relative change).
+        """
+        volume = int(volume) if str(volume).isdigit() else None
+
+        with self.lock:
+            if volume is not None:
+                self.known[str(ref)] = volume
+
+            if str(ref) != self.ref:
+                return volume
+
+            if self._adjusting() and self.volume is not None:
+                return self.volume
+
+            # Changes made before the volume was known haven't been sent
+            # yet so they're added to it
+            if volume is not None and self.delta:
+                volume = _clamp(volume + self.delta)
+                self.delta = 0
+
+            self.volume = volume
+            return volume
+
+    def _take(self):
+        """Returns the pending change as (player, volume, delta). Call with
+           the lock held.
+        """
+        change = (self.player, self.volume, self.delta)
+        self.pending = False
+        self.delta = 0
+        self.last_send = time()
+        return change
+
+    def _send(self, player, volume, delta):
+        try:
+            if volume is not None:
+                player.set_volume(volume)
+            elif delta > 0:
+                player.volume_up(delta)
+            elif delta < 0:
+                player.volume_down(-delta)
+        except Exception:
+            # The server's unavailable. The volume is corrected from the
+            # next notification or status.
+            pass
+
+    def _run(self):
+
+        while not self.abort:
+            self.wake.wait()
+            self.wake.clear()
+
+            if self.abort:
+                break
+
+            # Leave at least 'interval' seconds between commands. Key
+            # repeats in the meantime are added to the same command.
+            wait = self.last_send + self.interval - time()
+            if wait > 0:
+                sleep(wait)
+
+            with self.lock:
+                changes, self.outbox = self.outbox, []
+                if self.pending:
+                    changes.append(self._take())
+
+            # The lock isn't held while waiting for the server so key
+            # presses are never held up
+            for change in changes:
+                self._send(*change)
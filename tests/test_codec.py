@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from resources.lib.pylms import codec
+
+
+class CodecTest(unittest.TestCase):
+
+    def test_unquote_round_trip(self):
+        for text in [u"plain", u"a b:c/d", u"100% sure", u"Täst – ünïcode",
+                     u"%41 literal", u""]:
+            quoted = codec.quote(text)
+            self.assertEqual(codec.decode(codec.unquote(quoted)), text)
+
+    def test_unquote_matches_urllib(self):
+        from urllib import unquote
+        for text in ["a%20b", "%3A%3a", "bad%zz", "end%", "%e2%80%93"]:
+            self.assertEqual(codec.unquote(text), unquote(text))
+
+    def test_unquote_unicode(self):
+        self.assertEqual(codec.unquote(u"a%20b"), u"a b")
+
+    def test_echo_length(self):
+        self.assertEqual(codec.echo_length("player count ?"), 2)
+        self.assertEqual(codec.echo_length("login user secret"), 2)
+        self.assertEqual(codec.echo_length("status 0 10 tags:al"), 4)
+        self.assertEqual(codec.echo_length(""), 0)
+
+    def test_strip_echo(self):
+        self.assertEqual(codec.strip_echo("player count ?",
+                                          b"player count 3"), b"3")
+        self.assertEqual(codec.strip_echo("status 0 1",
+                                          b"status 0 1 mode%3Aplay"),
+                         b"mode%3Aplay")
+        self.assertEqual(codec.strip_echo("title ?", b"title"), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
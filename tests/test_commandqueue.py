@@ -0,0 +1,152 @@
+import threading
+import time
+import unittest
+
+from resources.lib.commandqueue import (CANCEL, Command, CommandError,
+                                        CommandQueue, PlayerQueue, merge)
+
+
+def tokens(command):
+    return tuple(command.split())
+
+
+class MergeTest(unittest.TestCase):
+
+    def merge(self, first, second):
+        return merge(tokens(first), tokens(second))
+
+    def test_jumps_are_summed(self):
+        self.assertEqual(self.merge("playlist jump +1", "playlist jump +1"),
+                         tokens("playlist jump +2"))
+        self.assertEqual(self.merge("playlist jump +1", "playlist index -3"),
+                         tokens("playlist jump -2"))
+
+    def test_jumps_cancel(self):
+        self.assertEqual(self.merge("playlist jump +2", "playlist jump -2"),
+                         CANCEL)
+
+    def test_index_replaces_jump(self):
+        self.assertEqual(self.merge("playlist jump +3", "playlist index 7"),
+                         tokens("playlist index 7"))
+        self.assertEqual(self.merge("playlist index 2", "playlist index 7"),
+                         tokens("playlist index 7"))
+
+    def test_jump_after_index_is_kept(self):
+        self.assertIsNone(self.merge("playlist index 2", "playlist jump +1"))
+
+    def test_idempotent(self):
+        self.assertEqual(self.merge("pause 1", "pause 1"), tokens("pause 1"))
+        self.assertEqual(self.merge("stop", "stop"), tokens("stop"))
+
+    def test_toggles_cancel(self):
+        self.assertEqual(self.merge("pause", "pause"), CANCEL)
+
+    def test_unrelated(self):
+        self.assertIsNone(self.merge("pause 1", "pause 0"))
+        self.assertIsNone(self.merge("stop", "playlist jump +1"))
+
+
+class PlayerQueueTest(unittest.TestCase):
+
+    def test_merged_rollbacks(self):
+        queue = PlayerQueue(None)
+        queue.add(Command("playlist jump +1", 1))
+        queue.add(Command("playlist jump +1", 2))
+        self.assertEqual(len(queue.pending), 1)
+        self.assertEqual(queue.pending[0].tokens, tokens("playlist jump +2"))
+        self.assertEqual(queue.pending[0].rollbacks, [1, 2])
+
+    def test_cancel_removes_command(self):
+        queue = PlayerQueue(None)
+        queue.add(Command("stop"))
+        queue.add(Command("pause"))
+        queue.add(Command("pause"))
+        self.assertEqual([c.tokens for c in queue.pending], [("stop",)])
+
+    def test_rollback_newest_first(self):
+        calls = []
+        command = Command("playlist jump +1", lambda e: calls.append(1))
+        command.rollbacks.append(lambda e: calls.append(2))
+        command.rollback(None)
+        self.assertEqual(calls, [2, 1])
+
+
+class FakePlayer(object):
+    """Blocks each request until it's released and fails if 'fail' is set."""
+
+    ref = "aa:bb"
+
+    def __init__(self):
+        self.sent = []
+        self.release = threading.Semaphore(0)
+        self.started = threading.Semaphore(0)
+        self.fail = False
+
+    def request(self, command):
+        self.started.release()
+        self.release.acquire()
+        self.sent.append(" ".join(command))
+        return None if self.fail else ""
+
+
+class CommandQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = CommandQueue()
+        self.player = FakePlayer()
+
+    def wait_idle(self):
+        while self.queue.queues[self.player.ref].running:
+            time.sleep(0.01)
+
+    def test_order_and_merging(self):
+        self.queue.submit(self.player, "stop")
+        self.player.started.acquire()
+
+        for _ in range(4):
+            self.queue.submit(self.player, "playlist jump +1")
+        self.queue.submit(self.player, "pause 1")
+        self.assertEqual(self.queue.pending(self.player.ref),
+                         [tokens("playlist jump +4"), tokens("pause 1")])
+
+        for _ in range(3):
+            self.player.release.release()
+        self.wait_idle()
+        self.assertEqual(self.player.sent,
+                         ["stop", "playlist jump +4", "pause 1"])
+
+    def test_failure_rolls_back_newest_first(self):
+        calls = []
+
+        def rollback(name):
+            return lambda error: calls.append((name, type(error)))
+
+        self.queue.submit(self.player, "stop", rollback("stop"))
+        self.player.started.acquire()
+        self.queue.submit(self.player, "playlist jump +1", rollback("a"))
+        self.queue.submit(self.player, "playlist jump +1", rollback("b"))
+        self.queue.submit(self.player, "pause 1", rollback("pause"))
+
+        self.player.fail = True
+        self.player.release.release()
+        self.wait_idle()
+
+        self.assertEqual(self.player.sent, ["stop"])
+        self.assertEqual(calls, [("pause", CommandError),
+                                 ("b", CommandError),
+                                 ("a", CommandError),
+                                 ("stop", CommandError)])
+        self.assertEqual(self.queue.pending(self.player.ref), [])
+
+    def test_new_worker_after_idle(self):
+        self.player.release.release()
+        self.queue.submit(self.player, "stop")
+        self.wait_idle()
+        self.player.release.release()
+        self.queue.submit(self.player, "play")
+        self.wait_idle()
+        self.assertEqual(self.player.sent, ["stop", "play"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import socket
+import unittest
+
+from resources.lib.pylms.linereader import LineReader, LineTooLong
+
+
+class LineReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sock, self.peer = socket.socketpair()
+
+    def tearDown(self):
+        self.sock.close()
+        self.peer.close()
+
+    def test_lines_split_across_reads(self):
+        reader = LineReader(self.sock, chunk_size=4)
+        self.peer.sendall(b"first line\nsecond")
+        self.assertEqual(reader.read_line(1), b"first line")
+
+        self.peer.sendall(b" line\r\n")
+        self.assertEqual(reader.read_line(1), b"second line")
+
+    def test_several_lines_in_one_read(self):
+        reader = LineReader(self.sock)
+        self.peer.sendall(b"a\nb\nc\n")
+        self.assertEqual([reader.read_line(1) for _ in range(3)],
+                         [b"a", b"b", b"c"])
+
+    def test_timeout(self):
+        reader = LineReader(self.sock)
+        self.peer.sendall(b"no newline")
+        self.assertIsNone(reader.read_line(0.05))
+
+    def test_skip(self):
+        reader = LineReader(self.sock)
+        reader.skip = 2
+        self.peer.sendall(b"late reply\nother late reply\nwanted\n")
+        self.assertEqual(reader.read_line(1), b"wanted")
+
+    def test_line_too_long(self):
+        reader = LineReader(self.sock, max_line=16, chunk_size=8)
+        self.peer.sendall(b"x" * 40)
+        with self.assertRaises(LineTooLong):
+            reader.read_line(1)
+
+        # The rest of the long line is thrown away
+        self.peer.sendall(b"x" * 10 + b"\nshort\n")
+        self.assertEqual(reader.read_line(1), b"short")
+
+    def test_closed(self):
+        reader = LineReader(self.sock)
+        self.peer.sendall(b"last\n")
+        self.peer.close()
+        self.assertEqual(reader.read_line(1), b"last")
+        with self.assertRaises(EOFError):
+            reader.read_line(1)
+
+
+if __name__ == "__main__":
+    unittest.main()
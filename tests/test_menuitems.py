@@ -0,0 +1,50 @@
+import unittest
+
+from resources.lib.simplelms.menuitems import (AudioMenuItem, NextMenuItem,
+                                               SearchMenuItem)
+
+TRACK = {"text": "Track",
+         "actions": {"play": {"cmd": ["playlistcontrol"],
+                              "params": {"cmd": "load", "track_id": 1}},
+                     "go": {"cmd": ["trackinfo", "items"],
+                            "params": {"track_id": 1}}}}
+
+BASE = {"actions": {"add": {"cmd": ["playlistcontrol"],
+                            "params": {"cmd": "add"}}}}
+
+
+class MenuItemTest(unittest.TestCase):
+
+    def test_action_strings(self):
+        item = AudioMenuItem(menuitem=TRACK, base=BASE)
+        self.assertEqual(item.cmd_play.split()[0], "playlistcontrol")
+        self.assertIn("cmd:load", item.cmd_play)
+        self.assertEqual(item.cmd_add, "playlistcontrol cmd:add")
+
+    def test_strings_are_memoized(self):
+        item = AudioMenuItem(menuitem=TRACK, base=BASE)
+        self.assertIsNone(item._cmds)
+        first = item.cmd_play
+        item.menuitem = {}
+        self.assertIs(item.cmd_play, first)
+
+    def test_search_string(self):
+        item = SearchMenuItem(menuitem={
+            "actions": {"go": {"cmd": ["search", "items"],
+                               "params": {"term": "__TAGGEDINPUT__"}}}})
+        self.assertEqual(item.cmd_search,
+                         "search items 0 50 term:__TAGGEDINPUT__")
+        self.assertIs(item.cmd_search, item.cmd_search)
+
+    def test_cmdstring(self):
+        item = NextMenuItem(menuitem=TRACK)
+        self.assertEqual(item.cmdstring, "trackinfo items 0 50 track_id:1")
+        self.assertIs(item.cmdstring, item.cmdstring)
+
+    def test_slots(self):
+        item = AudioMenuItem(menuitem=TRACK, base=BASE)
+        self.assertFalse(hasattr(item, "__dict__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from resources.lib.pylms.notification import Notification
+
+REF = "00%3A04%3A20%3A12%3A34%3A56"
+
+
+class NotificationTest(unittest.TestCase):
+
+    def test_player_notification(self):
+        n = Notification.parse(REF + " mixer volume 45")
+        self.assertEqual(n.ref, u"00:04:20:12:34:56")
+        self.assertEqual(n.command, ["mixer", "volume"])
+        self.assertEqual(n.name, "mixer volume")
+        self.assertEqual(n.args, ["45"])
+        self.assertEqual(n.arg(0), "45")
+        self.assertIsNone(n.arg(1))
+
+    def test_server_notification(self):
+        n = Notification.parse("rescan done")
+        self.assertIsNone(n.ref)
+        self.assertEqual(n.command, ["rescan", "done"])
+
+    def test_decoding(self):
+        n = Notification.parse(REF + " playlist newsong T%C3%A9st%20x 3")
+        self.assertEqual(n.args, [u"Tést x", "3"])
+
+    def test_colon_in_positional_argument(self):
+        n = Notification.parse(REF + " playlist newsong live%3A%201999 3")
+        self.assertEqual(n.args, [u"live: 1999", "3"])
+        self.assertEqual(n.tags, {})
+
+    def test_tagged_command(self):
+        n = Notification.parse(REF + " status - 2 tags%3Aal subscribe%3A30")
+        self.assertEqual(n.args, ["-", "2"])
+        self.assertEqual(n.tags, {"tags": "al", "subscribe": "30"})
+
+    def test_keys(self):
+        n = Notification.parse(REF + " playlist pause 1")
+        self.assertEqual(n.keys(), ["playlist pause 1", "playlist pause",
+                                    "playlist"])
+        self.assertEqual(n.keys(2), ["playlist pause", "playlist"])
+
+    def test_local_event(self):
+        n = Notification.parse("server_connect")
+        self.assertIsNone(n.ref)
+        self.assertEqual(n.keys(), ["server_connect"])
+
+    def test_text(self):
+        n = Notification.parse(REF + " playlist newsong T%C3%A9st 3")
+        self.assertEqual(unicode(n), u"00:04:20:12:34:56 playlist newsong "
+                                     u"Tést 3")
+        self.assertIsInstance(str(n), str)
+
+
+if __name__ == "__main__":
+    unittest.main()
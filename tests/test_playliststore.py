@@ -0,0 +1,88 @@
+import unittest
+
+from resources.lib.playliststore import PlaylistStore
+
+
+def track(i, duration=60.0, **extra):
+    data = {"id": i, "title": "Track {}".format(i), "artist": "Artist",
+            "album": "Album {}".format(i // 10), "duration": duration,
+            "coverart": 1, "remote": 0}
+    data.update(extra)
+    return data
+
+
+class PlaylistStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = PlaylistStore(start=5)
+        self.store.extend(track(i, duration=10.0 * (i + 1))
+                          for i in range(20))
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.store), 20)
+        item = self.store[3]
+        self.assertEqual(item["playlist index"], 8)
+        self.assertEqual(item["title"], "Track 3")
+        self.assertEqual(item["duration"], 40.0)
+        self.assertEqual(item["coverart"], 1)
+        self.assertEqual(item["remote"], 0)
+        self.assertEqual(self.store[-1]["id"], 19)
+
+    def test_missing_and_extra_fields(self):
+        store = PlaylistStore()
+        store.append({"title": "No id", "url": "http://x"})
+        item = store[0]
+        self.assertNotIn("id", item)
+        self.assertNotIn("duration", item)
+        self.assertEqual(item["url"], "http://x")
+
+    def test_large_remote_id(self):
+        store = PlaylistStore()
+        store.append(track(-140361262446544))
+        self.assertEqual(store[0]["id"], -140361262446544)
+
+    def test_text_is_stored_once(self):
+        self.assertEqual(len(self.store.tables["artist"]), 1)
+        self.assertEqual(len(self.store.tables["album"]), 2)
+
+    def test_index_error(self):
+        with self.assertRaises(IndexError):
+            self.store[20]
+
+    def test_slice(self):
+        part = self.store[2:5]
+        self.assertEqual(len(part), 3)
+        self.assertEqual(part.start, 7)
+        self.assertEqual([t["id"] for t in part], [2, 3, 4])
+        self.assertEqual(part[0]["playlist index"], 7)
+
+        # Slices share the text tables
+        self.assertIs(part.tables, self.store.tables)
+
+        self.assertEqual(len(self.store[15:40]), 5)
+        self.assertEqual(len(self.store[5:2]), 0)
+
+    def test_slice_step(self):
+        with self.assertRaises(ValueError):
+            self.store[::2]
+
+    def test_durations(self):
+        total = sum(10.0 * (i + 1) for i in range(20))
+        self.assertEqual(self.store.total_duration, total)
+        self.assertEqual(self.store.duration(0, 2), 30.0)
+        self.assertEqual(self.store.duration(18), 390.0)
+        self.assertEqual(self.store.duration(5, 5), 0.0)
+        self.assertEqual(self.store.remaining(18, elapsed=50.0), 340.0)
+        self.assertEqual(self.store.remaining(19, elapsed=500.0), 0.0)
+
+    def test_durations_after_append(self):
+        self.assertEqual(self.store.duration(19), 200.0)
+        self.store.append(track(20, duration=5.0))
+        self.assertEqual(self.store.duration(19), 205.0)
+
+    def test_slice_durations(self):
+        self.assertEqual(self.store[2:5].total_duration, 120.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+from StringIO import StringIO
+
+from resources.lib.simplelms import simplelms
+from resources.lib.stats import STATS, command_key
+
+
+class CommandKeyTest(unittest.TestCase):
+
+    def test_player_command(self):
+        self.assertEqual(command_key("00:04:20:12:34:56 mixer volume ?"),
+                         "mixer volume")
+        self.assertEqual(command_key("00:04:20:12:34:56 status - 2"),
+                         "status")
+
+    def test_server_command(self):
+        self.assertEqual(command_key("player count ?"), "player count")
+        self.assertEqual(command_key(["-", "serverstatus", "0", "99"]),
+                         "serverstatus")
+
+    def test_unicode_argument(self):
+        self.assertEqual(command_key([u"playlist", u"play", u"Bj\xf6rk"]),
+                         u"playlist play")
+
+
+class JSONRPCStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.urlopen = simplelms.urllib2.urlopen
+        simplelms.urllib2.urlopen = self.fake_urlopen
+        STATS.reset()
+
+    def tearDown(self):
+        simplelms.urllib2.urlopen = self.urlopen
+        STATS.reset()
+
+    def fake_urlopen(self, request, data, timeout):
+        return StringIO(json.dumps({"result": {}}))
+
+    def test_key_is_command_words(self):
+        server = simplelms.LMSServer()
+        server.request("00:04:20:12:34:56",
+                       [u"status", u"-", u"2", u"tags:a"])
+        server.request("00:04:20:12:34:56", "status - 10 tags:al")
+        self.assertEqual(list(STATS.snapshot()["latency"]),
+                         ["jsonrpc status"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import threading
+import time
+import unittest
+
+from resources.lib.volume import VolumeController
+
+
+class FakePlayer(object):
+
+    def __init__(self, ref="aa:bb"):
+        self.ref = ref
+        self.sent = []
+        self.event = threading.Event()
+
+    def set_volume(self, volume):
+        self.sent.append(("set", volume))
+        self.event.set()
+
+    def volume_up(self, delta):
+        self.sent.append(("up", delta))
+        self.event.set()
+
+    def volume_down(self, delta):
+        self.sent.append(("down", delta))
+        self.event.set()
+
+    def wait(self, timeout=1.0):
+        self.event.wait(timeout)
+        self.event.clear()
+
+
+class VolumeControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = VolumeController(interval=0.1, settle=0.2)
+        self.player = FakePlayer()
+
+    def tearDown(self):
+        self.controller.stop()
+
+    def settle(self, controller=None):
+        controller = controller or self.controller
+        while controller.adjusting(self.player.ref) is not None:
+            time.sleep(0.02)
+
+    def test_step_returns_new_volume(self):
+        self.assertEqual(self.controller.step(self.player, 5, 40), 45)
+        self.assertEqual(self.controller.step(self.player, -10), 35)
+
+    def test_step_clamps(self):
+        self.assertEqual(self.controller.step(self.player, 5, 98), 100)
+        self.assertEqual(self.controller.step(self.player, -200), 0)
+
+    def test_repeats_are_coalesced(self):
+        for _ in range(10):
+            self.controller.step(self.player, 1, 50)
+        self.settle()
+        self.assertLess(len(self.player.sent), 10)
+        self.assertEqual(self.player.sent[-1], ("set", 60))
+
+    def test_unknown_volume_sends_relative_change(self):
+        self.assertIsNone(self.controller.step(self.player, 5))
+        self.controller.step(self.player, 5)
+        self.player.wait()
+        self.settle()
+        self.assertEqual(self.player.sent, [("up", 10)])
+
+    def test_known_volume_is_used_on_select(self):
+        self.controller.reconcile(self.player.ref, "30")
+        self.assertEqual(self.controller.step(self.player, 5), 35)
+
+    def test_stale_notification_is_ignored_while_adjusting(self):
+        self.controller.step(self.player, 5, 40)
+        self.assertEqual(self.controller.reconcile(self.player.ref, "40"), 45)
+        self.assertEqual(self.controller.adjusting(self.player.ref), 45)
+
+    def test_notification_is_accepted_after_settle(self):
+        self.controller.step(self.player, 5, 40)
+        self.settle()
+        self.assertIsNone(self.controller.adjusting(self.player.ref))
+        self.assertEqual(self.controller.reconcile(self.player.ref, "30"), 30)
+        self.assertEqual(self.controller.volume, 30)
+
+    def test_pending_delta_is_added_on_reconcile(self):
+        # Keep the change from being sent so it's still pending
+        self.controller.thread = threading.current_thread()
+        self.controller.step(self.player, 5)
+        self.assertEqual(self.controller.reconcile(self.player.ref, "50"), 55)
+        self.assertEqual(self.controller.delta, 0)
+
+    def test_other_player(self):
+        self.controller.step(self.player, 5, 40)
+        self.assertEqual(self.controller.reconcile("cc:dd", "70"), 70)
+        self.assertIsNone(self.controller.reconcile("cc:dd", "+5"))
+
+    def test_change_is_sent_when_player_changes(self):
+        other = FakePlayer("cc:dd")
+        self.controller.thread = threading.current_thread()
+        self.controller.step(self.player, 5, 40)
+        self.controller.step(other, 5, 20)
+        self.assertEqual(self.controller.outbox,
+                         [(self.player, 45, 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()